@@ -1,12 +1,34 @@
+import time
+_module_load_started = time.perf_counter() # For the startup timing report in /stats
 import os
 import logging # Import logging
-from flask import Flask, render_template, jsonify, request, session # Import session
-from google.oauth2 import service_account # Use service_account credentials
-from googleapiclient.discovery import build
+from flask import Flask, render_template, jsonify, request, session, Response, g, redirect # Import session
+# The rest of the Google client stack (service_account, discovery) is imported on first use; see lazy_import
 from googleapiclient.errors import HttpError
 from dotenv import load_dotenv # Import load_dotenv
 import json # Import json for parsing errors
-from waitress import serve # Import serve
+import bisect
+import array
+import collections
+import concurrent.futures
+import contextlib
+import gzip
+import itertools
+import re
+import selectors
+import socket
+import sqlite3
+import weakref
+import threading # Shared caches are accessed from waitress worker threads
+import datetime
+import importlib
+import random
+import sys
+import urllib.parse
+try:
+    import brotli # Optional: enables 'br' response compression
+except ImportError:
+    brotli = None
 
 load_dotenv() # Load environment variables from .env file
 
@@ -25,7 +47,107 @@ SCOPES = [
 # Define default columns and max rows for the range
 DEFAULT_START_COLUMN_LETTER = 'A'
 DEFAULT_END_COLUMN_LETTER = 'YZ' # Fetch up to column YZ (650th column)
-DEFAULT_MAX_ROWS = 500 # Fetch up to 500 rows initially
+# Large sheets are fetched in fixed-size row chunks, a few chunks in flight at once
+ROW_CHUNK_SIZE = int(os.getenv('ROW_CHUNK_SIZE', '500'))
+FETCH_PARALLELISM = int(os.getenv('FETCH_PARALLELISM', '4'))
+MAX_SHEET_ROWS = int(os.getenv('MAX_SHEET_ROWS', '50000')) # Safety cap for a full-sheet load
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', '500')) # Rows per /load-data page when paging with cursor
+NDJSON_ROWS_PER_LINE = int(os.getenv('NDJSON_ROWS_PER_LINE', '100')) # Rows per line of a format=ndjson response
+
+# gzip/brotli for JSON responses, negotiated via Accept-Encoding
+RESPONSE_COMPRESSION = os.getenv('RESPONSE_COMPRESSION', '1') not in ('0', 'false')
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))
+# Sheet layout: row 1 is a title row, row 2 holds the column headers, data starts on row 3
+HEADER_SHEET_ROW = 2
+FIRST_DATA_SHEET_ROW = 3
+# Columns used by the /load-data row filters: column D holds the reviewer (проверяющий),
+# and score totals are the columns headed '∑'
+REVIEWER_COLUMN_INDEX = 3
+SUM_COLUMN_HEADER = '∑'
+
+# Load credentials, refresh the token and build the Sheets service on a background thread at
+# import time, so the first request after a cold start doesn't pay for it
+FAST_START = os.getenv('FAST_START', '1') not in ('0', 'false')
+
+# Send Sheets API calls somewhere other than Google, e.g. the fake server in bench/ (empty: Google)
+SHEETS_API_ROOT_URL = os.getenv('SHEETS_API_ROOT_URL', '')
+
+# Per-request log lines (request parameters, fetch and parse summaries) are logged at this level;
+# QUIET_REQUEST_LOGS=1 moves them to DEBUG so busy instances only log warnings and startup
+REQUEST_LOG_LEVEL = logging.DEBUG if os.getenv('QUIET_REQUEST_LOGS', '0') in ('1', 'true') else logging.INFO
+
+# Refresh the access token this many seconds before it expires, so requests never
+# stall on a token refresh (or race each other to do it)
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv('TOKEN_REFRESH_MARGIN_SECONDS', '300'))
+TOKEN_REFRESH_TIMEOUT_SECONDS = float(os.getenv('TOKEN_REFRESH_TIMEOUT_SECONDS', '10')) # Per call to the token endpoint
+
+# In-process cache of parsed /load-data snapshots
+SNAPSHOT_CACHE_TTL_SECONDS = float(os.getenv('SNAPSHOT_CACHE_TTL_SECONDS', '60'))
+SNAPSHOT_CACHE_MAX_ENTRIES = int(os.getenv('SNAPSHOT_CACHE_MAX_ENTRIES', '32'))
+SNAPSHOT_CACHE_MAX_BYTES = int(os.getenv('SNAPSHOT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Windowed /load-data results (start_row/end_row/cols without a cached snapshot), kept for the snapshot TTL
+WINDOW_CACHE_MAX_ENTRIES = int(os.getenv('WINDOW_CACHE_MAX_ENTRIES', '128'))
+# Optional on-disk store of parsed snapshots and sheet metadata (use /tmp on Vercel), so a fresh
+# process can answer /load-data from the last stored snapshot while it refetches in the background
+SNAPSHOT_STORE_DIR = os.getenv('SNAPSHOT_STORE_DIR', '') # Empty disables the store
+SNAPSHOT_STORE_MAX_BYTES = int(os.getenv('SNAPSHOT_STORE_MAX_BYTES', str(256 * 1024 * 1024))) # Compressed size on disk
+SNAPSHOT_STORE_MAX_AGE_SECONDS = float(os.getenv('SNAPSHOT_STORE_MAX_AGE_SECONDS', '86400')) # Older entries are never served
+# Sheet titles/ids rarely change; cache them so writes don't need a metadata round trip
+METADATA_CACHE_TTL_SECONDS = float(os.getenv('METADATA_CACHE_TTL_SECONDS', '300'))
+# Row fingerprints of this many recent snapshot versions per sheet are kept for /load-data?since=
+SNAPSHOT_HISTORY_VERSIONS = int(os.getenv('SNAPSHOT_HISTORY_VERSIONS', '8'))
+
+# Outbound Sheets API scheduling. Read and write requests have separate quotas; the
+# defaults match the per-user limit, which is the one a single service account hits first.
+# A rate of 0 turns pacing off for that quota (429s are still retried with backoff)
+SHEETS_READ_REQUESTS_PER_MINUTE = float(os.getenv('SHEETS_READ_REQUESTS_PER_MINUTE', '60'))
+SHEETS_WRITE_REQUESTS_PER_MINUTE = float(os.getenv('SHEETS_WRITE_REQUESTS_PER_MINUTE', '60'))
+SHEETS_QUOTA_BURST = int(os.getenv('SHEETS_QUOTA_BURST', '30')) # Requests allowed back to back before pacing
+SHEETS_MAX_RETRIES = int(os.getenv('SHEETS_MAX_RETRIES', '5')) # Retries after a 429/5xx response
+SHEETS_BACKOFF_BASE_SECONDS = float(os.getenv('SHEETS_BACKOFF_BASE_SECONDS', '1'))
+SHEETS_BACKOFF_MAX_SECONDS = float(os.getenv('SHEETS_BACKOFF_MAX_SECONDS', '32'))
+
+# Keep-alive connections for Sheets API calls, pooled across threads. With SHEETS_HTTP2 on and
+# httpx[http2] installed, one shared HTTP/2 client is used instead of a pool of httplib2 objects
+SHEETS_HTTP_POOL_SIZE = int(os.getenv('SHEETS_HTTP_POOL_SIZE', '8'))
+SHEETS_HTTP_TIMEOUT_SECONDS = float(os.getenv('SHEETS_HTTP_TIMEOUT_SECONDS', '60'))
+SHEETS_HTTP2 = os.getenv('SHEETS_HTTP2', '1') not in ('0', 'false')
+
+# Optional write-behind mode: /save-note and /ban-cell answer as soon as the write is stored in
+# a local SQLite queue, and a background thread flushes queued writes in batches
+WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND', '0') in ('1', 'true')
+WRITE_BEHIND_DB_PATH = os.getenv('WRITE_BEHIND_DB_PATH', 'write_queue.sqlite3')
+WRITE_BEHIND_FLUSH_MS = int(os.getenv('WRITE_BEHIND_FLUSH_MS', '500'))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv('WRITE_BEHIND_MAX_ATTEMPTS', '8'))
+WRITE_BEHIND_RETENTION_SECONDS = float(os.getenv('WRITE_BEHIND_RETENTION_SECONDS', '3600')) # Keep finished entries for status polls
+
+# waitress worker threads when run directly (waitress itself defaults to 4)
+SERVER_THREADS = int(os.getenv('SERVER_THREADS', '16'))
+
+# /events (Server-Sent Events). When run directly, /events redirects to a stream server on
+# EVENTS_PORT that holds every stream on one selector thread ('' or 0 turns it off). Without it
+# (e.g. on Vercel) each open stream occupies a worker thread, so only EVENTS_MAX_HELD_STREAMS
+# streams (by default half of SERVER_THREADS) are held open, for up to EVENTS_HOLD_SECONDS;
+# every other client gets its backlog at once and reconnects after EVENTS_RETRY_MS, resuming
+# from Last-Event-ID.
+EVENTS_PORT = int(os.getenv('EVENTS_PORT', '3001') or '0')
+EVENTS_PUBLIC_URL = os.getenv('EVENTS_PUBLIC_URL') # Stream server URL as clients see it, e.g. behind a proxy
+EVENTS_MAX_CONNECTIONS = int(os.getenv('EVENTS_MAX_CONNECTIONS', '1000'))
+EVENTS_MAX_BUFFERED_BYTES = int(os.getenv('EVENTS_MAX_BUFFERED_BYTES', str(256 * 1024))) # Per stream; slower readers are dropped
+EVENTS_MAX_HELD_STREAMS = int(os.getenv('EVENTS_MAX_HELD_STREAMS', str(max(1, SERVER_THREADS // 2))))
+EVENTS_HOLD_SECONDS = float(os.getenv('EVENTS_HOLD_SECONDS', '20'))
+EVENTS_RETRY_MS = int(os.getenv('EVENTS_RETRY_MS', '3000'))
+EVENTS_BUFFER_SIZE = int(os.getenv('EVENTS_BUFFER_SIZE', '2000')) # Events kept for resuming clients
+EVENTS_MAX_CELL_EVENTS = int(os.getenv('EVENTS_MAX_CELL_EVENTS', '200')) # Bigger upstream changes become one 'reload'
+
+# /load-sheets: max sheet rows requested in one multi-range spreadsheets.get, and how many such
+# requests run at once across all /load-sheets calls (on their own pool, so big batch loads
+# can't hold up /load-data's chunk fetches)
+BATCH_LOAD_MAX_ROWS = int(os.getenv('BATCH_LOAD_MAX_ROWS', '5000'))
+BATCH_LOAD_PARALLELISM = int(os.getenv('BATCH_LOAD_PARALLELISM', '2'))
+
+# Bulk note writes: max updateCells requests sent in one batchUpdate call
+BULK_NOTES_MAX_REQUESTS_PER_BATCH = int(os.getenv('BULK_NOTES_MAX_REQUESTS_PER_BATCH', '500'))
 # --- End Configuration ---
 
 app = Flask(__name__)
@@ -37,6 +159,172 @@ if app.secret_key == 'dev-secret-key-replace-me-in-prod':
     logging.warning("Using default FLASK_SECRET_KEY. Set a proper secret key in your environment for production!")
 # --- End Secret Key ---
 
+# --- Startup Timing ---
+_startup_timings = {'imports': {}} # Reported once at the first response and in /stats
+
+
+def lazy_import(module_name):
+    """Imports a module on first use, recording how long the import took."""
+    if module_name in sys.modules:
+        # import_module (not sys.modules) so we wait if another thread is mid-import
+        return importlib.import_module(module_name)
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    _startup_timings['imports'].setdefault(module_name, round(time.perf_counter() - started, 4))
+    return module
+
+
+@app.after_request
+def record_first_response(response):
+    if 'first_response_seconds' not in _startup_timings:
+        _startup_timings['first_response_seconds'] = round(time.perf_counter() - _module_load_started, 4)
+        logging.info(f"Startup timings: {_startup_timings}")
+    return response
+# --- End Startup Timing ---
+
+# --- Metrics ---
+class Histogram:
+    """Prometheus-style cumulative histogram with one set of buckets per label combination."""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {} # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets): # Larger values only show up in the +Inf bucket
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self._series.items()):
+            labels = format_metric_labels(self.label_names, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {series[-1]}')
+            labels = f"{{{labels}}}" if labels else ''
+            lines.append(f"{self.name}_sum{labels} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """Prometheus-style counter per label combination."""
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series = collections.Counter()
+
+    def inc(self, amount=1, *label_values):
+        self._series[label_values] += amount
+
+    def total(self):
+        return sum(self._series.values())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._series.items()):
+            labels = format_metric_labels(self.label_names, label_values)
+            lines.append(f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}")
+        return lines
+
+
+def format_metric_labels(label_names, label_values):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in zip(label_names, label_values))
+
+
+class Metrics:
+    """Request, upstream call and parsing metrics for /metrics. All updates take one lock."""
+
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.route_latency = Histogram('sheet_editor_request_duration_seconds',
+                                       'Time to produce a response (streamed bodies excluded), by route.',
+                                       ('route', 'method'), self.LATENCY_BUCKETS)
+        self.response_size = Histogram('sheet_editor_response_size_bytes', 'Response body size (non-streamed), by route.',
+                                       ('route',), self.SIZE_BUCKETS)
+        self.responses = Counter('sheet_editor_responses_total', 'Responses by route and HTTP status.', ('route', 'status'))
+        self.upstream_latency = Histogram('sheet_editor_sheets_api_duration_seconds',
+                                          'Sheets API call duration (each attempt), by API method.',
+                                          ('api_method',), self.LATENCY_BUCKETS)
+        self.upstream_responses = Counter('sheet_editor_sheets_api_responses_total',
+                                          'Sheets API responses by API method and HTTP status.', ('api_method', 'status'))
+        self.parsed_rows = Counter('sheet_editor_parsed_rows_total', 'Sheet rows parsed from GridData.')
+        self.parsed_cells = Counter('sheet_editor_parsed_cells_total', 'Cells parsed from GridData.')
+        self.parse_seconds = Counter('sheet_editor_parse_seconds_total', 'Time spent parsing GridData.')
+
+    def observe_request(self, route, method, status, seconds, size_bytes):
+        with self._lock:
+            self.route_latency.observe(seconds, route, method)
+            self.responses.inc(1, route, status)
+            if size_bytes is not None:
+                self.response_size.observe(size_bytes, route)
+
+    def observe_upstream(self, api_method, status, seconds):
+        with self._lock:
+            self.upstream_latency.observe(seconds, api_method)
+            self.upstream_responses.inc(1, api_method, status)
+
+    def observe_parse(self, rows, cells, seconds):
+        with self._lock:
+            self.parsed_rows.inc(rows)
+            self.parsed_cells.inc(cells)
+            self.parse_seconds.inc(seconds)
+
+    def render(self, gauges, counters):
+        """Prometheus text exposition of every metric plus `gauges` and `counters` ({name: (help, value)})
+        read from the other components' stats."""
+        with self._lock:
+            lines = []
+            for metric in (self.route_latency, self.response_size, self.responses, self.upstream_latency,
+                           self.upstream_responses, self.parsed_rows, self.parsed_cells, self.parse_seconds):
+                lines.extend(metric.render())
+            parse_seconds = self.parse_seconds.total()
+            cells = self.parsed_cells.total()
+        gauges['sheet_editor_parse_cells_per_second'] = (
+            'Average GridData parsing throughput since start.', round(cells / parse_seconds) if parse_seconds else 0)
+        for metric_type, values in (('gauge', gauges), ('counter', counters)):
+            for name, (help_text, value) in values.items():
+                if value is not None:
+                    lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {value}"])
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        size_bytes = None if response.is_streamed else response.calculate_content_length()
+        metrics.observe_request(route, request.method, response.status_code, time.perf_counter() - started, size_bytes)
+    return response
+# --- End Metrics ---
+
 # --- Utility to get column letter ---
 def get_col_letter(col_index_zero_based):
     """Converts 0-based column index to A1 notation letter (A, B, ..., Z, AA, AB)."""
@@ -45,10 +333,45 @@ def get_col_letter(col_index_zero_based):
         letter = chr(65 + (col_index_zero_based % 26)) + letter
         col_index_zero_based = col_index_zero_based // 26 - 1
     return letter
+
+
+# Letters of columns A..ZZ (covers DEFAULT_END_COLUMN_LETTER), so the parsing loops don't rebuild them per note
+COLUMN_LETTERS = [get_col_letter(col_index) for col_index in range(26 + 26 * 26)]
+
+
+def column_letter(col_index_zero_based):
+    """get_col_letter via the COLUMN_LETTERS table."""
+    if col_index_zero_based < len(COLUMN_LETTERS):
+        return COLUMN_LETTERS[col_index_zero_based]
+    return get_col_letter(col_index_zero_based)
+
+_A1_CELL_REF = re.compile(r'\$?([A-Za-z]+)\$?([1-9][0-9]*)')
+
+
+def parse_a1_notation(a1_notation):
+    """Parses 'SheetName!C5' into (sheet_name, row_index, col_index), both 0-based.
+
+    Raises ValueError for anything that is not a single-cell reference.
+    """
+    # Basic parsing, assumes standard format like SheetName!LetterNumber
+    parts = a1_notation.split('!')
+    if len(parts) != 2:
+         raise ValueError("Invalid A1 notation format")
+    sheet_name = parts[0]
+    match = _A1_CELL_REF.fullmatch(parts[1].strip())
+    if not match:
+         raise ValueError("Could not parse column/row from A1 notation")
+    col_letter, row_num_str = match.groups()
+    row_index = int(row_num_str) - 1 # Convert to 0-based index
+    col_index = 0
+    for char in col_letter:
+        col_index = col_index * 26 + (ord(char.upper()) - 65 + 1)
+    col_index -= 1
+    return sheet_name, row_index, col_index
 # --- End Utility ---
 
 # --- Authentication Helper ---
-def get_credentials():
+def load_credentials():
     """Loads service account credentials from ENV var or file."""
     creds = None
     google_credentials_json_str = os.getenv('GOOGLE_CREDENTIALS_JSON')
@@ -58,6 +381,7 @@ def get_credentials():
         try:
             # Parse the JSON string from the environment variable
             credentials_info = json.loads(google_credentials_json_str)
+            service_account = lazy_import('google.oauth2.service_account')
             creds = service_account.Credentials.from_service_account_info(
                 credentials_info, scopes=SCOPES)
             logging.info("Credentials loaded successfully from env var.")
@@ -70,6 +394,7 @@ def get_credentials():
     else:
         logging.info(f"GOOGLE_CREDENTIALS_JSON not set. Attempting to load from file: {SERVICE_ACCOUNT_FILE}")
         try:
+            service_account = lazy_import('google.oauth2.service_account')
             creds = service_account.Credentials.from_service_account_file(
                 SERVICE_ACCOUNT_FILE, scopes=SCOPES)
             logging.info("Credentials loaded successfully from file.")
@@ -82,6 +407,546 @@ def get_credentials():
     return creds
 # --- End Auth Helper ---
 
+# --- Shared Service Provider ---
+class SheetsServiceProvider:
+    """Process-wide cache of the service account credentials and Sheets API services.
+
+    Credentials are parsed once and shared. Every access token refresh goes through
+    refresh_token(), one at a time and never under the provider lock: a token that is
+    still valid but close to expiry is refreshed on a background thread, an expired one
+    by the first request that needs it while the others wait for that refresh. The
+    discovery document is loaded once, and each waitress worker thread gets its own
+    service object because the underlying httplib2 transport is not thread-safe.
+    """
+
+    def __init__(self, refresh_margin_seconds=TOKEN_REFRESH_MARGIN_SECONDS, refresh_timeout=TOKEN_REFRESH_TIMEOUT_SECONDS):
+        self.refresh_margin = datetime.timedelta(seconds=refresh_margin_seconds)
+        self.refresh_timeout = refresh_timeout
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock() # Held for the duration of a token refresh
+        self._background_refresh = False
+        self._local = threading.local()
+        self._creds = None
+        self._creds_generation = 0 # Bumped whenever credentials are (re)loaded
+        self._discovery_doc = None
+        self._next_refresh_attempt = 0.0 # monotonic time; backs off after a failed refresh
+        self._counters = {
+            'credential_hits': 0,
+            'credential_loads': 0,
+            'token_refreshes': 0,
+            'token_refresh_failures': 0,
+            'service_hits': 0,
+            'service_builds': 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _token_needs_refresh(self, creds):
+        if not creds.token or creds.expiry is None:
+            return True
+        # google-auth stores expiry as a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return creds.expiry - now <= self.refresh_margin
+
+    def refresh_token(self, creds, stale_token=None):
+        """Refreshes the access token of creds. Single-flight: a caller that finds a refresh in
+        progress waits for it, then returns without refreshing again.
+
+        stale_token is the token the server just rejected; the refresh is skipped if creds
+        already holds a different one. Without it, the refresh is skipped unless the token
+        is near expiry. After a failure, refreshes are skipped for 30 seconds. Raises if the
+        token endpoint fails or doesn't answer within refresh_timeout.
+        """
+        with self._refresh_lock:
+            if stale_token is not None:
+                if creds.token != stale_token:
+                    return # Another thread already replaced the rejected token
+            elif not self._token_needs_refresh(creds):
+                return # Refreshed while we waited
+            if time.monotonic() < self._next_refresh_attempt:
+                return
+            google_auth_httplib2 = lazy_import('google_auth_httplib2')
+            httplib2 = lazy_import('httplib2')
+            try:
+                creds.refresh(google_auth_httplib2.Request(httplib2.Http(timeout=self.refresh_timeout)))
+            except Exception as e:
+                with self._lock:
+                    self._counters['token_refresh_failures'] += 1
+                    self._next_refresh_attempt = time.monotonic() + 30
+                logging.warning(f"Token refresh failed: {e}")
+                raise
+            with self._lock:
+                self._counters['token_refreshes'] += 1
+            logging.info(f"Refreshed service account access token (expires {creds.expiry}).")
+
+    def _refresh_quietly(self, creds):
+        try:
+            self.refresh_token(creds)
+        except Exception:
+            pass # Counted and logged by refresh_token; the request goes ahead with the old token
+
+    def _refresh_in_background(self, creds):
+        with self._lock:
+            if self._background_refresh:
+                return
+            self._background_refresh = True
+
+        def run():
+            try:
+                self._refresh_quietly(creds)
+            finally:
+                with self._lock:
+                    self._background_refresh = False
+
+        threading.Thread(target=run, name='sheets-token-refresh', daemon=True).start()
+
+    def get_credentials(self):
+        """Returns the shared credentials, loading them on first use. None on failure."""
+        with self._lock:
+            if self._creds is None:
+                creds = load_credentials()
+                if not creds:
+                    return None # Don't cache failures; next request retries the load
+                self._creds = creds
+                self._creds_generation += 1
+                self._counters['credential_loads'] += 1
+            else:
+                self._counters['credential_hits'] += 1
+            creds = self._creds
+            needs_refresh = self._token_needs_refresh(creds) and time.monotonic() >= self._next_refresh_attempt
+        if needs_refresh:
+            if creds.valid:
+                self._refresh_in_background(creds) # Still usable meanwhile
+            else:
+                self._refresh_quietly(creds)
+        return creds
+
+    @staticmethod
+    def _trim_discovery_doc(doc):
+        """Reduces every schema in a discovery document to its top-level property names.
+
+        The client only reads schemas to build method docstrings (which pretty-prints
+        every nested schema, ~0.3s per service object for Sheets v4) and to look for
+        page token fields, which are top-level properties. Requests don't change.
+        """
+        trimmed = dict(doc)
+        trimmed['schemas'] = {
+            name: {'id': name, 'type': 'object', 'properties': {prop: {'type': 'any'} for prop in schema.get('properties', {})}}
+            for name, schema in doc.get('schemas', {}).items()
+        }
+        return trimmed
+
+    def _get_discovery_doc(self):
+        with self._lock:
+            if self._discovery_doc is None:
+                discovery_cache = lazy_import('googleapiclient.discovery_cache')
+                doc = discovery_cache.get_static_doc('sheets', 'v4')
+                self._discovery_doc = self._trim_discovery_doc(json.loads(doc)) if doc else None
+                if self._discovery_doc is not None and SHEETS_API_ROOT_URL:
+                    root_url = SHEETS_API_ROOT_URL.rstrip('/') + '/'
+                    self._discovery_doc['rootUrl'] = root_url
+                    self._discovery_doc['baseUrl'] = root_url + self._discovery_doc.get('servicePath', '')
+            return self._discovery_doc
+
+    def get_service(self):
+        """Returns a Sheets API service for the calling thread, or None if auth fails."""
+        creds = self.get_credentials()
+        if not creds:
+            return None
+        service = getattr(self._local, 'service', None)
+        if service is not None and self._local.generation == self._creds_generation:
+            self._count('service_hits')
+            return service
+
+        discovery_doc = self._get_discovery_doc()
+        discovery = lazy_import('googleapiclient.discovery')
+        if discovery_doc is not None:
+            service = discovery.build_from_document(discovery_doc, credentials=creds)
+        else:
+            # Older client libraries without bundled documents fetch it over the network
+            service = discovery.build('sheets', 'v4', credentials=creds)
+        self._local.service = service
+        self._local.generation = self._creds_generation
+        self._count('service_builds')
+        logging.info(f"Built Sheets API service for thread {threading.current_thread().name}.")
+        return service
+
+    def prewarm(self):
+        """Loads credentials, refreshes the token and builds a service on a background thread."""
+        def run():
+            started = time.perf_counter()
+            try:
+                if self.get_service() is None:
+                    return
+            except Exception as e:
+                logging.warning(f"Sheets service prewarm failed: {e}")
+                return
+            _startup_timings['prewarm_seconds'] = round(time.perf_counter() - started, 4)
+
+        threading.Thread(target=run, name='sheets-prewarm', daemon=True).start()
+
+    @property
+    def credentials_generation(self):
+        return self._creds_generation
+
+    def invalidate(self):
+        """Drops the cached credentials so the next call reloads them (e.g. after a key rotation)."""
+        with self._lock:
+            self._creds = None
+            self._next_refresh_attempt = 0.0
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+class _GuardedCredentials:
+    """Wraps the shared credentials for AuthorizedHttp and _HttpxTransport so their refreshes
+    (token expired, or a 401 response) go through SheetsServiceProvider.refresh_token."""
+
+    def __init__(self, credentials, provider):
+        self._credentials = credentials
+        self._provider = provider
+
+    def before_request(self, request, method, url, headers):
+        if not self._credentials.valid:
+            self._provider.refresh_token(self._credentials)
+        self._credentials.apply(headers)
+
+    def refresh(self, request):
+        self._provider.refresh_token(self._credentials, stale_token=self._credentials.token)
+
+    def __getattr__(self, name):
+        return getattr(self._credentials, name)
+
+
+sheets_provider = SheetsServiceProvider()
+if FAST_START:
+    sheets_provider.prewarm()
+
+
+def get_credentials():
+    """Returns the process-wide service account credentials (None on failure)."""
+    return sheets_provider.get_credentials()
+# --- End Shared Service Provider ---
+
+# --- Pooled HTTP Transport ---
+class _HttpxTransport:
+    """httplib2.Http-style request() over a shared httpx.Client, as googleapiclient expects."""
+
+    def __init__(self, client, credentials, pool):
+        self.client = client
+        self.credentials = credentials
+        self.pool = pool
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=None, connection_type=None):
+        httplib2 = lazy_import('httplib2')
+        headers = dict(headers or {})
+        for attempt in range(2):
+            self.credentials.before_request(None, method, uri, headers)
+            response = self.client.request(method, uri, content=body, headers=headers)
+            if response.status_code != 401 or attempt:
+                break
+            # The token was revoked or expired early; refresh once and resend
+            self.credentials.refresh(None)
+        self.pool.count_httpx_response(response)
+        # httpx already decoded the body, so don't pass on its encoding and length
+        info = {k.lower(): v for k, v in response.headers.items() if k.lower() not in ('content-encoding', 'content-length')}
+        info['status'] = str(response.status_code)
+        resp = httplib2.Response(info)
+        resp.reason = response.reason_phrase
+        return resp, response.content
+
+
+class HttpTransportPool:
+    """Keep-alive HTTP transports for Sheets API calls, shared by every thread.
+
+    httplib2.Http isn't thread-safe, so each pooled transport is lent to one thread at a
+    time, most recently returned first so warm connections get reused; at most `size`
+    exist and callers wait when all are busy. With http2 on and httpx + h2 installed, a
+    single thread-safe httpx.Client (HTTP/2 where the server offers it) is used instead.
+    """
+
+    def __init__(self, size=SHEETS_HTTP_POOL_SIZE, timeout=SHEETS_HTTP_TIMEOUT_SECONDS, http2=SHEETS_HTTP2):
+        self.size = size
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._idle = [] # (creds_generation, AuthorizedHttp), most recently used last
+        self._created = 0
+        self._client = None
+        self._counters = {'requests': 0, 'connections_opened': 0, 'waits': 0, 'transports_created': 0}
+        self._http_versions = collections.Counter()
+        self._httpx_streams = weakref.WeakSet()
+        if http2:
+            try:
+                httpx = lazy_import('httpx')
+                lazy_import('h2')
+                self._client = httpx.Client(
+                    http2=True, timeout=timeout,
+                    limits=httpx.Limits(max_connections=size, max_keepalive_connections=size))
+                if REQUEST_LOG_LEVEL < logging.INFO:
+                    logging.getLogger('httpx').setLevel(logging.WARNING) # It logs every request at INFO
+            except ImportError:
+                logging.info("httpx[http2] not installed; using pooled httplib2 connections for Sheets API calls.")
+        self.backend = 'httpx' if self._client is not None else 'httplib2'
+
+    def count_httpx_response(self, response):
+        # httpcore exposes the connection's network stream; a stream we haven't seen is a new connection
+        stream = response.extensions.get('network_stream')
+        with self._cond:
+            self._http_versions[response.http_version] += 1
+            if stream is not None and stream not in self._httpx_streams:
+                self._httpx_streams.add(stream)
+                self._counters['connections_opened'] += 1
+
+    def _checkout(self):
+        with self._cond:
+            if not self._idle and self._created >= self.size:
+                self._counters['waits'] += 1
+                while not self._idle:
+                    self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+            self._counters['transports_created'] += 1
+        return None # Caller creates a new transport
+
+    def _checkin(self, generation, http):
+        with self._cond:
+            self._idle.append((generation, http))
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def transport(self):
+        """Lends a transport (an object with httplib2's request()) carrying the current credentials."""
+        creds = _GuardedCredentials(sheets_provider.get_credentials(), sheets_provider)
+        generation = sheets_provider.credentials_generation
+        with self._cond:
+            self._counters['requests'] += 1
+        if self._client is not None:
+            yield _HttpxTransport(self._client, creds, self)
+            return
+        google_auth_httplib2 = lazy_import('google_auth_httplib2')
+        pooled = self._checkout()
+        if pooled is None:
+            http = google_auth_httplib2.AuthorizedHttp(creds, http=lazy_import('httplib2').Http(timeout=self.timeout))
+        elif pooled[0] != generation:
+            # Credentials were reloaded since; keep the connections, swap the credentials
+            http = google_auth_httplib2.AuthorizedHttp(creds, http=pooled[1].http)
+        else:
+            http = pooled[1]
+        raw_http = http.http
+        open_before = {id(connection) for connection in raw_http.connections.values()}
+        try:
+            yield http
+        finally:
+            opened = sum(1 for connection in raw_http.connections.values() if id(connection) not in open_before)
+            with self._cond:
+                self._counters['connections_opened'] += opened
+            self._checkin(generation, http)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._counters, backend=self.backend, size=self.size, idle=len(self._idle),
+                         http_versions=dict(self._http_versions))
+        if stats['requests']:
+            stats['connection_reuse_ratio'] = round(1 - stats['connections_opened'] / stats['requests'], 3)
+        return stats
+
+
+http_pool = HttpTransportPool()
+# --- End Pooled HTTP Transport ---
+
+# --- Sheets API Scheduler ---
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per second, holding at most `capacity`. A rate of 0
+    or less means no limit."""
+
+    def __init__(self, rate, capacity):
+        self.rate = max(0.0, rate)
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self.waiting = 0 # Callers currently blocked in acquire()
+        self.max_waiting = 0
+        self.waits = 0 # Acquisitions that had to wait
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Takes one token, waiting for it if necessary. Returns the seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        started = time.monotonic()
+        with self._cond:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    self._cond.wait((1 - self._tokens) / self.rate)
+            finally:
+                self.waiting -= 1
+            waited = time.monotonic() - started
+            if waited > 0.001:
+                self.waits += 1
+                self.total_wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            return waited
+
+    def drain(self):
+        """Empties the bucket, e.g. after the API reported the quota as exhausted."""
+        with self._cond:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'rate_per_second': self.rate,
+                'capacity': self.capacity,
+                'queue_depth': self.waiting,
+                'max_queue_depth': self.max_waiting,
+                'waits': self.waits,
+                'total_wait_seconds': round(self.total_wait_seconds, 3),
+                'max_wait_seconds': round(self.max_wait_seconds, 3),
+            }
+
+
+class _InflightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SheetsApiScheduler:
+    """Runs every outbound Sheets API call.
+
+    Calls are paced by a token bucket per quota (reads and writes are metered separately),
+    429 and 5xx responses are retried with exponential backoff and full jitter (honouring
+    Retry-After), and identical reads already in flight are shared rather than repeated.
+    """
+
+    RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, read_per_minute=SHEETS_READ_REQUESTS_PER_MINUTE,
+                 write_per_minute=SHEETS_WRITE_REQUESTS_PER_MINUTE, burst=SHEETS_QUOTA_BURST,
+                 max_retries=SHEETS_MAX_RETRIES, backoff_base=SHEETS_BACKOFF_BASE_SECONDS,
+                 backoff_max=SHEETS_BACKOFF_MAX_SECONDS):
+        self.read_bucket = TokenBucket(read_per_minute / 60.0, burst)
+        self.write_bucket = TokenBucket(write_per_minute / 60.0, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._counters = {
+            'calls': 0,
+            'coalesced': 0,
+            'retries': 0,
+            'failures': 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def singleflight(self, key, fn):
+        """Calls fn(), unless a call with the same key is already running, in which case
+        waits for it and returns its result (or raises its exception)."""
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InflightCall()
+            else:
+                self._counters['coalesced'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def _backoff_delay(self, attempt, retry_after):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        try:
+            delay = max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            pass # Missing, or an HTTP date; plain backoff is close enough
+        return delay
+
+    def _execute_with_retries(self, http_request, bucket):
+        attempt = 0
+        while True:
+            bucket.acquire()
+            self._count('calls')
+            api_method = getattr(http_request, 'methodId', None) or http_request.method
+            started = time.perf_counter()
+            try:
+                with http_pool.transport() as http:
+                    result = http_request.execute(http=http)
+                metrics.observe_upstream(api_method, 200, time.perf_counter() - started)
+                return result
+            except HttpError as err:
+                status = err.resp.status
+                metrics.observe_upstream(api_method, status, time.perf_counter() - started)
+                if status not in self.RETRYABLE_STATUSES or attempt >= self.max_retries:
+                    self._count('failures')
+                    raise
+                if status == 429:
+                    bucket.drain() # Everyone else waiting on this quota slows down too
+                delay = self._backoff_delay(attempt, err.resp.get('retry-after'))
+            attempt += 1
+            self._count('retries')
+            logging.warning(f"Sheets API {http_request.method} returned {status}; retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+    def execute(self, http_request):
+        """Executes a googleapiclient HttpRequest under the scheduler and returns its result.
+
+        GET requests are reads; identical ones (same URI) that overlap share one upstream call.
+        """
+        if http_request.method == 'GET':
+            return self.singleflight(('GET', http_request.uri),
+                                     lambda: self._execute_with_retries(http_request, self.read_bucket))
+        return self._execute_with_retries(http_request, self.write_bucket)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['inflight'] = len(self._inflight)
+        stats['read_quota'] = self.read_bucket.stats()
+        stats['http_pool'] = http_pool.stats()
+        stats['write_quota'] = self.write_bucket.stats()
+        return stats
+
+
+sheets_scheduler = SheetsApiScheduler()
+QUOTA_EXCEEDED_MESSAGE = "Google Sheets API quota exceeded. Please wait a minute and try again."
+# --- End Sheets API Scheduler ---
+
 def get_sheet_data(spreadsheet_id, range_name):
     """Fetches data from the Google Sheet using an API Key.
 
@@ -89,7 +954,7 @@ def get_sheet_data(spreadsheet_id, range_name):
         spreadsheet_id: The ID of the Google Spreadsheet.
         range_name: The A1 notation of the range to retrieve (e.g., 'Sheet1!A1:S150').
     """
-    logging.info(f"Attempting to get sheet data for ID: {spreadsheet_id}, Range: {range_name}")
+    logging.log(REQUEST_LOG_LEVEL, f"Attempting to get sheet data for ID: {spreadsheet_id}, Range: {range_name}")
 
     if not SERVICE_ACCOUNT_FILE:
         logging.error("Service account file not found in environment variables.")
@@ -97,15 +962,15 @@ def get_sheet_data(spreadsheet_id, range_name):
         return None, "Server configuration error: Missing Service Account File."
 
     try:
-        logging.info(f"Building Google Sheets API service (v4) with Service Account.")
-        creds = get_credentials()
-        service = build('sheets', 'v4', credentials=creds)
+        service = sheets_provider.get_service()
+        if not service:
+            return None, "Server authentication error."
         sheet = service.spreadsheets()
-        logging.info(f"Executing sheet.values().get() for spreadsheetId={spreadsheet_id}, range={range_name}")
-        result = sheet.values().get(spreadsheetId=spreadsheet_id,
-                                    range=range_name).execute()
+        logging.log(REQUEST_LOG_LEVEL, f"Executing sheet.values().get() for spreadsheetId={spreadsheet_id}, range={range_name}")
+        result = sheets_scheduler.execute(sheet.values().get(spreadsheetId=spreadsheet_id,
+                                                             range=range_name))
         values = result.get('values', [])
-        logging.info(f"Successfully fetched {len(values)} rows from {spreadsheet_id}/{range_name}")
+        logging.log(REQUEST_LOG_LEVEL, f"Successfully fetched {len(values)} rows from {spreadsheet_id}/{range_name}")
         return values, None # Return data and no error
     except HttpError as err:
         logging.error(f"Google Sheets API error occurred: {err}", exc_info=True) # Log stack trace
@@ -114,11 +979,11 @@ def get_sheet_data(spreadsheet_id, range_name):
         try:
             # Decode safely
             decoded_content = error_content.decode('utf-8', errors='ignore')
-            logging.info(f"Raw error content from API: {decoded_content}")
+            logging.log(REQUEST_LOG_LEVEL, f"Raw error content from API: {decoded_content}")
             # Use json.loads if possible, fall back to eval cautiously or just use the string
             try:
                 error_details = json.loads(decoded_content)
-                logging.info(f"Parsed JSON error details: {error_details}")
+                logging.log(REQUEST_LOG_LEVEL, f"Parsed JSON error details: {error_details}")
                 if isinstance(error_details, dict) and 'error' in error_details:
                     error_details_msg += f" Details: {error_details['error'].get('message', '{}')}"
             except json.JSONDecodeError:
@@ -179,7 +1044,31 @@ def load_data():
          start_row_num = None
          end_row_num = None
 
-    logging.info(f"Request: /load-data | ID: '{spreadsheet_id}', Sheet: '{sheet_name}', StartRow: {start_row_num}, EndRow: {end_row_num}")
+    # Cursor paging: cursor is the 1-based data row to start from, page_size how many rows to return.
+    # It overrides start_row/end_row; the response carries next_cursor (null on the last page).
+    cursor = request.args.get('cursor', type=int)
+    if cursor is not None:
+        if cursor < 1:
+            return jsonify({"error": "cursor must be a positive integer."}), 400
+        page_size = request.args.get('page_size', default=DEFAULT_PAGE_SIZE, type=int)
+        if page_size is None or page_size < 1:
+            return jsonify({"error": "page_size must be a positive integer."}), 400
+        start_row_num = cursor
+        end_row_num = cursor + page_size - 1
+    # Offset paging: offset is a 0-based position among the rows that pass the row filters (within
+    # start_row/end_row), page_size how many of them to return. The response carries total_rows
+    # (rows passing the filters) and next_offset (null on the last page).
+    offset = request.args.get('offset', type=int)
+    if offset is not None:
+        if cursor is not None:
+            return jsonify({"error": "Use either cursor or offset, not both."}), 400
+        if offset < 0:
+            return jsonify({"error": "offset must be a non-negative integer."}), 400
+        page_size = request.args.get('page_size', default=DEFAULT_PAGE_SIZE, type=int)
+        if page_size is None or page_size < 1:
+            return jsonify({"error": "page_size must be a positive integer."}), 400
+
+    logging.log(REQUEST_LOG_LEVEL, f"Request: /load-data | ID: '{spreadsheet_id}', Sheet: '{sheet_name}', StartRow: {start_row_num}, EndRow: {end_row_num}, Cursor: {cursor}, Offset: {offset}")
 
     if not spreadsheet_id or not sheet_name:
         # Error logging handled inside the check
@@ -187,17 +1076,133 @@ def load_data():
         if not sheet_name: logging.warning("Request missing Sheet Name.")
         return jsonify({"error": "Missing required parameters (id, sheet)."}), 400
 
-    # Fetch data including notes using the new function
-    header, all_rows, notes, data_row_sheet_indices, error_msg = get_sheet_data_with_notes(spreadsheet_id, sheet_name)
+    try:
+        columns = parse_column_selection(request.args.get('cols'))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid cols parameter: {e}"}), 400
 
-    if error_msg:
-        logging.error(f"Error from get_sheet_data_with_notes: {error_msg}")
-        return jsonify({"error": error_msg}), 500
+    # Row filters: reviewer= keeps one reviewer's rows; hide_zero_sum=1 drops rows whose '∑'
+    # columns (limited to sum_cols, if given) are all zero
+    reviewer = request.args.get('reviewer') or None
+    hide_zero_sum = request.args.get('hide_zero_sum') in ('1', 'true')
+    try:
+        sum_cols = parse_column_selection(request.args.get('sum_cols'))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid sum_cols parameter: {e}"}), 400
+    row_filtered = reviewer is not None or hide_zero_sum
+    # Delta refresh: since=<version from an earlier response> returns only the rows that changed.
+    # The delta covers every filtered row; offset/page_size only shape the full response sent when
+    # the version is unknown.
+    since = request.args.get('since', type=int) if cursor is None else None
+
+    force_refresh = request.args.get('refresh') in ('1', 'true')
+    windowed = start_row_num is not None or end_row_num is not None or columns is not None
+    snapshot = None if force_refresh else snapshot_cache.get((spreadsheet_id, sheet_name))
+
+    if request.args.get('format') == 'ndjson':
+        # Streaming mode: the body is generated while the sheet is fetched and parsed
+        logging.log(REQUEST_LOG_LEVEL, f"Streaming NDJSON for ID: '{spreadsheet_id}', Sheet: '{sheet_name}' (cached: {snapshot is not None})")
+        return Response(iter_load_data_ndjson(spreadsheet_id, sheet_name, snapshot, start_row_num, end_row_num, columns,
+                                              reviewer, sum_cols if hide_zero_sum else None, hide_zero_sum,
+                                              offset, page_size if offset is not None else None),
+                        mimetype='application/x-ndjson')
+
+    if windowed and snapshot is None and not row_filtered and since is None and offset is None:
+        # Nothing cached: push the row/column window down to the Sheets API
+        service = sheets_provider.get_service()
+        if not service:
+            return jsonify({"error": "Server authentication error."}), 500
+        try:
+            row_limit = get_sheet_row_limit(service, spreadsheet_id, sheet_name)
+        except HttpError as err:
+            logging.error(f"API error getting sheet metadata: {err}", exc_info=True)
+            return jsonify({"error": f"API Error ({err.resp.status}): Could not get sheet data. Check permissions, Sheet ID, and Sheet Name."}), 500
+        except ValueError as e:
+            return jsonify({"error": f"Error: {e}"}), 500
+        first_sheet_row = FIRST_DATA_SHEET_ROW + (start_row_num - 1 if start_row_num is not None else 0)
+        last_sheet_row = FIRST_DATA_SHEET_ROW + end_row_num - 1 if end_row_num is not None else row_limit
+        last_sheet_row = min(last_sheet_row, row_limit)
+        window_key = (spreadsheet_id, sheet_name, first_sheet_row, last_sheet_row, tuple(columns) if columns else None)
+        cached_window = None if force_refresh else window_cache.get(window_key)
+        if first_sheet_row > last_sheet_row:
+            header, filtered_rows, notes, filtered_row_indices, reviewers, error_msg = [], [], {}, [], [], None
+            cached_header = header_cache.get((spreadsheet_id, sheet_name))
+            if cached_header is not None:
+                header, header_notes, reviewers = cached_header
+                notes = dict(header_notes)
+        elif cached_window is not None:
+            header, filtered_rows, notes, filtered_row_indices, reviewers = cached_window
+            error_msg = None
+        else:
+            # Taken before fetching, so a write made meanwhile keeps the result out of the cache
+            generation = snapshot_cache.generation((spreadsheet_id, sheet_name))
+            header, filtered_rows, notes, filtered_row_indices, reviewers, error_msg = get_sheet_window(
+                spreadsheet_id, sheet_name, first_sheet_row, last_sheet_row, columns)
+            if not error_msg:
+                window_cache.put(window_key, generation, (header, filtered_rows, notes, filtered_row_indices, reviewers))
+        if error_msg:
+            logging.error(f"Error from get_sheet_window: {error_msg}")
+            return jsonify({"error": error_msg}), 500
+        logging.log(REQUEST_LOG_LEVEL, f"Returning windowed JSON. Header length: {len(header)}, Rows: {len(filtered_rows)}, Notes: {len(notes)}")
+        # No snapshot was built, so there is no version to send deltas against
+        response = {"header": header, "rows": filtered_rows, "notes": notes, "data_row_sheet_indices": filtered_row_indices,
+                    "reviewers": reviewers, "version": None}
+        if columns is not None:
+            response["columns"] = columns
+        if cursor is not None:
+            # Without a snapshot the exact data length is unknown; the grid's rowCount bounds it
+            more_rows = end_row_num + FIRST_DATA_SHEET_ROW - 1 < row_limit
+            response["next_cursor"] = end_row_num + 1 if more_rows else None
+        return render_load_data_response(response, sheet_name)
+
+    # Fetch data including notes, served from the snapshot cache when fresh
+    if snapshot is None:
+        snapshot, error_msg = get_sheet_snapshot(spreadsheet_id, sheet_name, force_refresh=force_refresh)
+        if error_msg:
+            logging.error(f"Error from get_sheet_data_with_notes: {error_msg}")
+            return jsonify({"error": error_msg}), 500
+    header, all_rows, data_row_sheet_indices = snapshot.header, snapshot.rows, snapshot.data_row_sheet_indices
+
+    if since is not None:
+        fingerprint = snapshot_cache.fingerprint((spreadsheet_id, sheet_name), since)
+        changes = snapshot.changes_since(fingerprint) if fingerprint is not None else None
+        if changes is not None:
+            sum_columns = resolve_sum_columns(header, sum_cols) if hide_zero_sum else ()
+            response = build_delta_response(snapshot, since, changes, start_row_num, end_row_num, reviewer, sum_columns)
+            if offset is not None:
+                # Lets a paging client tell whether rows entered the filtered view, shifting the offsets
+                _, response["total_rows"] = snapshot.window_positions(
+                    reviewer, sum_columns, max(0, start_row_num - 1) if start_row_num is not None else 0, end_row_num, 0, 0)
+            if columns is not None:
+                response["rows"] = project_columns(response["rows"], columns)
+                response["notes"] = snapshot.notes_for_rows(response["data_row_sheet_indices"], columns)
+                response["columns"] = columns
+            return render_load_data_response(response, sheet_name)
+        logging.log(REQUEST_LOG_LEVEL, f"Version {since} of {sheet_name} is unknown or its header changed; sending the full sheet.")
 
     # --- Apply Row Filtering (if applicable) ---
     filtered_rows = [] # Initialize filtered_rows
     filtered_row_indices = []
-    if all_rows and (start_row_num is not None or end_row_num is not None):
+    total_rows = None
+    if offset is not None:
+        # One page of the filtered rows; the filtered positions are cached on the snapshot, so
+        # paging costs O(page_size) after the first request for a filter
+        slice_start = max(0, start_row_num - 1) if start_row_num is not None else 0
+        sum_columns = resolve_sum_columns(header, sum_cols) if hide_zero_sum else ()
+        positions, total_rows = snapshot.window_positions(reviewer, sum_columns, slice_start, end_row_num, offset, page_size)
+        filtered_rows = [all_rows[position] for position in positions]
+        filtered_row_indices = [data_row_sheet_indices[position] for position in positions]
+        logging.log(REQUEST_LOG_LEVEL, f"Applied paging: offset={offset}, page_size={page_size}, reviewer={reviewer!r}, sum columns={list(sum_columns)}. Returning {len(filtered_rows)} of {total_rows} rows")
+    elif row_filtered:
+        # Reviewer/zero-sum filters are answered from the snapshot's indexes, within the row window
+        slice_start = max(0, start_row_num - 1) if start_row_num is not None else 0
+        slice_end = min(len(all_rows), end_row_num) if end_row_num is not None else len(all_rows)
+        sum_columns = resolve_sum_columns(header, sum_cols) if hide_zero_sum else ()
+        positions = snapshot.filter_positions(reviewer, sum_columns, slice_start, slice_end)
+        filtered_rows = [all_rows[position] for position in positions]
+        filtered_row_indices = [data_row_sheet_indices[position] for position in positions]
+        logging.log(REQUEST_LOG_LEVEL, f"Applied filter: reviewer={reviewer!r}, sum columns={list(sum_columns)}, rows {slice_start}-{slice_end-1}. Resulting rows: {len(filtered_rows)}")
+    elif all_rows and (start_row_num is not None or end_row_num is not None):
         # Adjust to 0-based index for slicing (start_row_num=1 maps to index 0)
         slice_start = (start_row_num - 1) if start_row_num is not None else 0
         slice_end = end_row_num if end_row_num is not None else len(all_rows)
@@ -209,43 +1214,334 @@ def load_data():
         if slice_start < slice_end:
             filtered_rows = all_rows[slice_start:slice_end]
             filtered_row_indices = data_row_sheet_indices[slice_start:slice_end]
-            logging.info(f"Applied filter: start_row={start_row_num}, end_row={end_row_num}. Resulting rows: {len(filtered_rows)} (Indices {slice_start}-{slice_end-1})")
+            logging.log(REQUEST_LOG_LEVEL, f"Applied filter: start_row={start_row_num}, end_row={end_row_num}. Resulting rows: {len(filtered_rows)} (Indices {slice_start}-{slice_end-1})")
         else:
             filtered_rows = []
             filtered_row_indices = []
-            logging.info(f"Applied filter: start_row={start_row_num}, end_row={end_row_num}. No rows selected after bounds check.")
+            logging.log(REQUEST_LOG_LEVEL, f"Applied filter: start_row={start_row_num}, end_row={end_row_num}. No rows selected after bounds check.")
     else:
         # No filtering requested or no data_rows to filter
         filtered_rows = all_rows
         filtered_row_indices = data_row_sheet_indices
         if all_rows:
-            logging.info(f"No row filtering applied. Using all {len(filtered_rows)} data rows.")
+            logging.log(REQUEST_LOG_LEVEL, f"No row filtering applied. Using all {len(filtered_rows)} data rows.")
     # --- End Filtering ---
+    notes = response_notes(snapshot, filtered_row_indices, columns)
 
     # Return PADDED header and the (potentially filtered) rows
-    logging.info(f"Returning JSON. Padded header length: {len(header)}, Filtered rows count: {len(filtered_rows)}, Notes count: {len(notes)}")
-    return jsonify({"header": header, "rows": filtered_rows, "notes": notes, "data_row_sheet_indices": filtered_row_indices})
+    logging.log(REQUEST_LOG_LEVEL, f"Returning JSON. Padded header length: {len(header)}, Filtered rows count: {len(filtered_rows)}, Notes count: {len(notes)}")
+    response = {"header": header, "rows": filtered_rows, "notes": notes, "data_row_sheet_indices": filtered_row_indices,
+                "reviewers": snapshot.reviewers(), "version": snapshot.version}
+    if columns is not None:
+        response["rows"] = project_columns(filtered_rows, columns)
+        response["columns"] = columns
+    if cursor is not None:
+        response["next_cursor"] = end_row_num + 1 if end_row_num < len(all_rows) else None
+        response["total_rows"] = len(all_rows)
+    if offset is not None:
+        response["offset"] = offset
+        response["total_rows"] = total_rows
+        response["next_offset"] = offset + page_size if offset + page_size < total_rows else None
+    return render_load_data_response(response, sheet_name)
+
+def build_delta_response(snapshot, since, changes, start_row_num, end_row_num, reviewer=None, sum_columns=()):
+    """Builds a /load-data?since= payload from snapshot.changes_since() output.
+
+    Changed rows inside the row window that pass the filters go in "rows" (with their notes
+    in "notes"); changed rows that no longer pass, and rows that were removed, are listed in
+    "removed_row_sheet_indices". The client drops every note on the listed rows, then applies
+    "notes".
+    """
+    changed_positions, removed_sheet_rows = changes
+    first_position = max(0, start_row_num - 1) if start_row_num is not None else 0
+    end_position = end_row_num if end_row_num is not None else float('inf')
+    rows, row_indices, removed = [], [], []
+    for position in changed_positions:
+        if not first_position <= position < end_position:
+            continue
+        sheet_row_num = snapshot.data_row_sheet_indices[position]
+        if row_matches_filters(snapshot.rows[position], reviewer, sum_columns):
+            rows.append(snapshot.rows[position])
+            row_indices.append(sheet_row_num)
+        else:
+            removed.append(sheet_row_num)
+    removed.extend(sheet_row_num for sheet_row_num in removed_sheet_rows
+                   if first_position <= sheet_row_num - FIRST_DATA_SHEET_ROW < end_position)
+    notes = snapshot.notes_for_rows(row_indices)
+    logging.log(REQUEST_LOG_LEVEL, f"Returning delta since version {since}: {len(rows)} changed rows, {len(removed)} removed rows")
+    return {"delta": True, "since": since, "version": snapshot.version, "header": snapshot.header,
+            "rows": rows, "data_row_sheet_indices": row_indices, "removed_row_sheet_indices": removed,
+            "notes": notes, "reviewers": snapshot.reviewers()}
+
+# --- Compact Wire Format for /load-data ---
+def _encode_column(values):
+    """Encodes one column: {"const": v} if every value is equal, {"dict": [...], "codes": [...]}
+    when distinct values repeat enough to pay off, otherwise {"values": [...]}."""
+    if not values:
+        return {"values": []}
+    codes_by_value = {}
+    codes = []
+    for value in values:
+        code = codes_by_value.get(value)
+        if code is None:
+            code = codes_by_value[value] = len(codes_by_value)
+        codes.append(code)
+    if len(codes_by_value) == 1:
+        return {"const": values[0]}
+    if len(codes_by_value) * 2 <= len(values):
+        return {"dict": list(codes_by_value), "codes": codes}
+    return {"values": values}
+
+
+def run_length_encode(numbers):
+    """Encodes consecutive runs as [start, length] pairs: [3, 4, 5, 9] -> [[3, 3], [9, 1]]."""
+    runs = []
+    for number in numbers:
+        if runs and runs[-1][0] + runs[-1][1] == number:
+            runs[-1][1] += 1
+        else:
+            runs.append([number, 1])
+    return runs
+
+
+def encode_compact_payload(response, sheet_name):
+    """Re-encodes a /load-data JSON payload in the columnar "compact-v1" format.
+
+    - columns: one entry per column index in column_indices (see _encode_column);
+    - notes: [sheet_row, col_index, text] triples instead of "Sheet!A1" keys;
+    - data_row_sheet_indices: [start, length] runs.
+    Everything else (header, cursor fields) is passed through unchanged.
+    """
+    rows = response["rows"]
+    column_indices = response.get("columns")
+    if column_indices is None:
+        width = max([len(response["header"])] + [len(row) for row in rows]) if rows else len(response["header"])
+        column_indices = list(range(width))
+    columns = []
+    for position in range(len(column_indices)):
+        columns.append(_encode_column([row[position] if position < len(row) else '' for row in rows]))
+
+    notes = []
+    for a1_notation, note in response["notes"].items():
+        try:
+            _, row_index, col_index = parse_a1_notation(a1_notation)
+        except ValueError:
+            continue
+        notes.append([row_index + 1, col_index, note])
+
+    payload = {key: value for key, value in response.items()
+               if key not in ("rows", "notes", "data_row_sheet_indices", "columns")}
+    payload.update({
+        "format": "compact-v1",
+        "sheet": sheet_name,
+        "row_count": len(rows),
+        "column_indices": column_indices,
+        "columns": columns,
+        "notes": notes,
+        "data_row_sheet_indices": run_length_encode(response["data_row_sheet_indices"]),
+    })
+    return payload
+
+
+def render_load_data_response(response, sheet_name):
+    """Serializes a /load-data payload in the format the client asked for (format=json|compact)."""
+    if request.args.get('format') == 'compact':
+        return jsonify(encode_compact_payload(response, sheet_name))
+    return jsonify(response)
+
+
+@app.after_request
+def compress_response(response):
+    """Compresses larger buffered responses with brotli or gzip when the client accepts it."""
+    if (not RESPONSE_COMPRESSION or response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers):
+        return response
+    if not (response.mimetype.startswith('text/') or response.mimetype == 'application/json'):
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESSION_MIN_BYTES:
+        return response
+    encoding = request.accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=5)
+    elif encoding == 'gzip':
+        compressed = gzip.compress(data, compresslevel=6)
+    else:
+        return response
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
+# --- End Compact Wire Format ---
+
+# --- NDJSON Streaming for /load-data ---
+def _ndjson_line(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def iter_load_data_ndjson(spreadsheet_id, sheet_name, snapshot, start_row_num, end_row_num, columns,
+                          reviewer=None, sum_cols=None, hide_zero_sum=False, offset=None, page_size=None):
+    """Generates a /load-data?format=ndjson body, one JSON object per line:
+
+        {"type": "header", "header": [...]}
+        {"type": "rows", "rows": [...], "data_row_sheet_indices": [...]}   (repeated)
+        {"type": "notes", "notes": {...}}
+        {"type": "end", "row_count": N, "max_cols": M, "reviewers": [...], "version": V}
+
+    or {"type": "error", "error": "..."} in place of the remaining lines if a fetch fails.
+    start_row_num/end_row_num (1-based data rows), columns, the reviewer/zero-sum filters and
+    offset/page_size work the same way as in the JSON response, and "notes" carries the same
+    notes (see response_notes); when paging, "end" also carries offset, total_rows and next_offset. Without a cached snapshot,
+    rows are sent unpadded as soon as they are parsed, and max_cols gives the final width; the
+    assembled snapshot is cached at the end.
+    """
+    first_position = start_row_num if start_row_num is not None else 1
+    last_position = end_row_num if end_row_num is not None else float('inf')
+    batch_rows, batch_indices = [], []
+    row_count = 0
+    paged = offset is not None
+    page_end = offset + page_size if paged else float('inf')
+    sent_row_indices = [] # Sheet rows sent, whose notes go in the "notes" line
+
+    def page_fields(total_rows):
+        if not paged:
+            return {}
+        return {"offset": offset, "total_rows": total_rows,
+                "next_offset": page_end if page_end < total_rows else None}
+
+    def flush():
+        line = _ndjson_line({"type": "rows",
+                             "rows": project_columns(batch_rows, columns) if columns is not None else batch_rows,
+                             "data_row_sheet_indices": batch_indices})
+        batch_rows.clear()
+        batch_indices.clear()
+        return line
+
+    if snapshot is not None:
+        yield _ndjson_line({"type": "header", "header": snapshot.header})
+        sum_columns = resolve_sum_columns(snapshot.header, sum_cols) if hide_zero_sum else ()
+        positions, total_rows = snapshot.window_positions(reviewer, sum_columns, first_position - 1, end_row_num,
+                                                          offset or 0, page_size)
+        for position in positions:
+            batch_rows.append(snapshot.rows[position])
+            batch_indices.append(snapshot.data_row_sheet_indices[position])
+            sent_row_indices.append(snapshot.data_row_sheet_indices[position])
+            row_count += 1
+            if len(batch_rows) >= NDJSON_ROWS_PER_LINE:
+                yield flush()
+        if batch_rows:
+            yield flush()
+        yield _ndjson_line({"type": "notes", "notes": response_notes(snapshot, sent_row_indices, columns)})
+        yield _ndjson_line({"type": "end", "row_count": row_count, "max_cols": len(snapshot.header),
+                            "reviewers": snapshot.reviewers(), "version": snapshot.version, **page_fields(total_rows)})
+        return
+
+    key = (spreadsheet_id, sheet_name)
+    generation = snapshot_cache.generation(key)
+    service = sheets_provider.get_service()
+    if not service:
+        yield _ndjson_line({"type": "error", "error": "Server authentication error."})
+        return
+
+    # Queued writes the fetched rows may predate are patched in as the rows stream past
+    pending_writes = write_queue.pending_writes(key, generation) if write_queue is not None else []
+    pending_values = collections.defaultdict(list) # sheet row number -> [(col_index, value)]
+    for kind, a1_notation, payload in pending_writes:
+        if kind == 'value':
+            _, row_index, col_index = parse_a1_notation(a1_notation)
+            pending_values[row_index + 1].append((col_index, payload))
+
+    notes = {}
+    sheet_rows = [] # Kept to build the cached snapshot once the stream completes
+    matched_rows = 0 # Rows passing the filters, sent or not
+    header_sent = False
+    sum_columns = ()
+    reviewers = set()
+    try:
+        row_limit = get_sheet_row_limit(service, spreadsheet_id, sheet_name)
+        for sheet_row_num, current_row_values in enumerate(iter_sheet_rows(spreadsheet_id, sheet_name, row_limit, notes), start=1):
+            sheet_rows.append(current_row_values)
+            if sheet_row_num == HEADER_SHEET_ROW:
+                yield _ndjson_line({"type": "header", "header": current_row_values})
+                header_sent = True
+                if hide_zero_sum:
+                    sum_columns = resolve_sum_columns(current_row_values, sum_cols)
+                continue
+            position = sheet_row_num - FIRST_DATA_SHEET_ROW + 1
+            if position >= 1:
+                for col_index, value in pending_values.get(sheet_row_num, ()):
+                    current_row_values.extend([''] * (col_index + 1 - len(current_row_values)))
+                    current_row_values[col_index] = value
+            if position >= 1 and len(current_row_values) > REVIEWER_COLUMN_INDEX and current_row_values[REVIEWER_COLUMN_INDEX]:
+                reviewers.add(current_row_values[REVIEWER_COLUMN_INDEX])
+            if position < first_position or position > last_position:
+                continue
+            if not row_matches_filters(current_row_values, reviewer, sum_columns):
+                continue
+            matched_rows += 1
+            if paged and not offset < matched_rows <= page_end:
+                continue # Outside the page; still parsed for the snapshot and counted for total_rows
+            sent_row_indices.append(sheet_row_num)
+            batch_rows.append(current_row_values)
+            batch_indices.append(sheet_row_num)
+            row_count += 1
+            if len(batch_rows) >= NDJSON_ROWS_PER_LINE:
+                yield flush()
+    except HttpError as err:
+        logging.error(f"API error streaming sheet data: {err}", exc_info=True)
+        yield _ndjson_line({"type": "error", "error": f"API Error ({err.resp.status}): Could not get sheet data. Check permissions, Sheet ID, and Sheet Name."})
+        return
+    except ValueError as e:
+        yield _ndjson_line({"type": "error", "error": f"Error: {e}"})
+        return
+    except Exception as e:
+        logging.error(f"Unexpected error streaming sheet data: {e}", exc_info=True)
+        yield _ndjson_line({"type": "error", "error": "Unexpected server error getting sheet data."})
+        return
+
+    if not header_sent:
+        yield _ndjson_line({"type": "header", "header": []})
+    if batch_rows:
+        yield flush()
+
+    for kind, a1_notation, payload in pending_writes:
+        if kind == 'note':
+            if payload:
+                notes[a1_notation] = payload
+            else:
+                notes.pop(a1_notation, None)
+    max_cols = max(map(len, sheet_rows), default=0)
+    header, all_rows_values, data_row_sheet_indices = split_sheet_rows(sheet_rows, max_cols)
+    snapshot = SheetSnapshot(header, all_rows_values, notes, data_row_sheet_indices)
+    snapshot_cache.put(key, snapshot, generation)
+    yield _ndjson_line({"type": "notes", "notes": response_notes(snapshot, sent_row_indices, columns)})
+    logging.log(REQUEST_LOG_LEVEL, f"Streamed {row_count} rows and {len(notes)} notes for ID: {spreadsheet_id}, Sheet: {sheet_name}")
+    yield _ndjson_line({"type": "end", "row_count": row_count, "max_cols": max_cols, "reviewers": sorted(reviewers),
+                        "version": snapshot.version, **page_fields(matched_rows)})
+# --- End NDJSON Streaming ---
 
 @app.route('/get-sheet-names')
 def get_sheet_names():
     spreadsheet_id = request.args.get('id')
-    logging.info(f"Request: /get-sheet-names | ID: '{spreadsheet_id}'")
+    logging.log(REQUEST_LOG_LEVEL, f"Request: /get-sheet-names | ID: '{spreadsheet_id}'")
     if not spreadsheet_id: return jsonify({"error": "Missing ID."}, 400)
 
-    creds = get_credentials()
-    if not creds:
+    service = sheets_provider.get_service()
+    if not service:
         return jsonify({"error": "Server authentication error."}), 500
 
     sheet_names = []
     error_msg = None
     try:
-        service = build('sheets', 'v4', credentials=creds)
-        spreadsheet_metadata = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
+        spreadsheet_metadata = sheets_scheduler.execute(
+            service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields=MetadataCache.FIELDS))
+        metadata_cache.put(spreadsheet_id, spreadsheet_metadata)
         sheets = spreadsheet_metadata.get('sheets', [])
         for sheet in sheets:
             title = sheet.get('properties', {}).get('title')
             if title: sheet_names.append(title)
-        logging.info(f"Fetched {len(sheet_names)} sheet names for ID: {spreadsheet_id}")
+        logging.log(REQUEST_LOG_LEVEL, f"Fetched {len(sheet_names)} sheet names for ID: {spreadsheet_id}")
     except HttpError as err:
         logging.error(f"API error getting sheet names: {err}", exc_info=True)
         # Basic error reporting for brevity, could parse details like before
@@ -260,80 +1556,185 @@ def get_sheet_names():
         return jsonify({"sheet_names": sheet_names})
 
 # --- Modified Data Fetching ---
+# Shared pool for chunk fetches; its size is the process-wide limit on concurrent grid requests.
+# Worker threads keep their own Sheets service via sheets_provider's thread-local cache.
+_fetch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=FETCH_PARALLELISM, thread_name_prefix='sheets-fetch')
+
+
+def _fetch_grid_chunk(spreadsheet_id, ranges, fields):
+    """Runs one spreadsheets.get(includeGridData) call and returns the first sheet's GridData list."""
+    service = sheets_provider.get_service()
+    if not service:
+        raise RuntimeError("Server authentication error.")
+    result = sheets_scheduler.execute(service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        ranges=ranges,
+        fields=fields,
+        includeGridData=True
+    ))
+    sheets_data = result.get('sheets', [])
+    return sheets_data[0].get('data', []) if sheets_data else []
+
+
+def iter_grid_chunks(spreadsheet_id, first_row, last_row, build_ranges, fields):
+    """Fetches sheet rows first_row..last_row (1-based, inclusive) in ROW_CHUNK_SIZE chunks.
+
+    build_ranges(chunk_first_row, chunk_last_row, is_first_chunk) returns the A1 ranges for one
+    chunk. Chunks are fetched concurrently on the shared pool with at most FETCH_PARALLELISM in
+    flight for this call, and their GridData lists are yielded in row order, so callers can parse
+    and drop each chunk instead of holding the whole grid response at once.
+    """
+    chunk_bounds = [(chunk_first, min(chunk_first + ROW_CHUNK_SIZE - 1, last_row))
+                    for chunk_first in range(first_row, last_row + 1, ROW_CHUNK_SIZE)]
+    logging.log(REQUEST_LOG_LEVEL, f"Fetching rows {first_row}-{last_row} of {spreadsheet_id} in {len(chunk_bounds)} chunk(s)")
+    in_flight = collections.deque()
+    try:
+        for position, (chunk_first, chunk_last) in enumerate(chunk_bounds):
+            ranges = build_ranges(chunk_first, chunk_last, position == 0)
+            in_flight.append(_fetch_executor.submit(_fetch_grid_chunk, spreadsheet_id, ranges, fields))
+            if len(in_flight) >= FETCH_PARALLELISM:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+    finally:
+        for future in in_flight:
+            future.cancel() # Caller stopped early or a chunk failed; don't fetch the rest
+
+
+def get_sheet_row_limit(service, spreadsheet_id, sheet_name):
+    """Returns how many sheet rows a full load should cover: the grid's rowCount, capped at MAX_SHEET_ROWS.
+
+    Raises ValueError if the sheet doesn't exist.
+    """
+    sheets = metadata_cache.get_sheets(service, spreadsheet_id)
+    if sheet_name not in sheets:
+        sheets = metadata_cache.get_sheets(service, spreadsheet_id, force_refresh=True)
+    if sheet_name not in sheets:
+        raise ValueError(f"Sheet '{sheet_name}' not found in spreadsheet.")
+    row_count = sheets[sheet_name].get('gridProperties', {}).get('rowCount', ROW_CHUNK_SIZE)
+    if row_count > MAX_SHEET_ROWS:
+        logging.warning(f"Sheet '{sheet_name}' has {row_count} rows; loading only the first {MAX_SHEET_ROWS} (MAX_SHEET_ROWS).")
+    return min(row_count, MAX_SHEET_ROWS)
+
+
+def iter_sheet_rows(spreadsheet_id, sheet_name, row_limit, notes):
+    """Yields the formatted values of sheet rows 1..row_limit in order, as chunks arrive.
+
+    Rows are not padded (trailing empty cells are absent), and empty rows the API omits at the
+    end of a chunk are yielded as []; iteration stops at the last row the API returned. Notes
+    are added to the `notes` dict as { "Sheet!A1": "note text" } while rows are parsed.
+    """
+    # Use spreadsheets.get to fetch grid data including notes
+    # Specify fields to potentially limit response size, include necessary grid data
+    fields = 'sheets(data(startRow,rowData(values(formattedValue,note))))'
+    def build_ranges(chunk_first, chunk_last, is_first_chunk):
+        return [f"{sheet_name}!{DEFAULT_START_COLUMN_LETTER}{chunk_first}:{DEFAULT_END_COLUMN_LETTER}{chunk_last}"]
+
+    return iter_grid_rows(iter_grid_chunks(spreadsheet_id, 1, row_limit, build_ranges, fields), sheet_name, notes)
+
+
+# Rows with fewer cells than this are parsed with a plain loop; from about this width up the two
+# comprehensions in iter_grid_rows are as fast or faster (bench/parse_bench.py)
+_NARROW_ROW_CELLS = 12
+_PARSE_BATCH_ROWS = 64 # iter_grid_rows parses and yields this many rows at a time
+
+
+def iter_grid_rows(grid_chunks, sheet_name, notes):
+    """Parses GridData lists (consecutive row chunks of one sheet, starting at row 1) into
+    row value lists; see iter_sheet_rows."""
+    rows_yielded = 0
+    note_prefix = f"{sheet_name}!"
+    for grids in grid_chunks:
+        for grid_data in grids:
+            row_data = grid_data.get('rowData', [])
+            start_row = grid_data.get('startRow', 0)
+            if row_data and rows_yielded < start_row:
+                # The previous chunk ended in empty rows, which the API omits
+                for _ in range(start_row - rows_yielded):
+                    yield []
+                rows_yielded = start_row
+            # Rows are parsed and yielded in small batches, timing only the parsing (not the time the
+            # consumer holds each batch) without a clock read per row
+            parse_seconds = 0.0
+            row_count = cell_count = 0
+            try:
+                for batch_first in range(0, len(row_data), _PARSE_BATCH_ROWS):
+                    batch_started = time.perf_counter()
+                    parsed_rows = []
+                    batch_rows = row_data[batch_first:batch_first + _PARSE_BATCH_ROWS]
+                    for sheet_row_num, row in enumerate(batch_rows, start_row + batch_first + 1): # Sheet rows are 1-based
+                        cells = row.get('values')
+                        if cells and len(cells) < _NARROW_ROW_CELLS:
+                            # Narrow rows: one loop over the cells costs less than setting up two comprehensions
+                            current_row_values = []
+                            for c_idx, cell in enumerate(cells):
+                                current_row_values.append(cell.get('formattedValue') or '')
+                                if 'note' in cell and cell['note']:
+                                    notes[note_prefix + column_letter(c_idx) + str(sheet_row_num)] = cell['note']
+                        elif cells:
+                            # Empty cells come back as {}. Two comprehensions (values, then noted columns)
+                            # walk the cells twice but keep the per-cell work in C
+                            current_row_values = [cell.get('formattedValue') or '' for cell in cells]
+                            noted_columns = [c_idx for c_idx, cell in enumerate(cells) if 'note' in cell]
+                            if noted_columns:
+                                note_suffix = str(sheet_row_num)
+                                for c_idx in noted_columns:
+                                    note = cells[c_idx]['note']
+                                    if note:
+                                        notes[note_prefix + column_letter(c_idx) + note_suffix] = note
+                        else:
+                            current_row_values = []
+                        parsed_rows.append(current_row_values)
+                    cell_count += sum(map(len, parsed_rows))
+                    row_count += len(parsed_rows)
+                    parse_seconds += time.perf_counter() - batch_started
+                    yield from parsed_rows
+            finally:
+                metrics.observe_parse(row_count, cell_count, parse_seconds)
+            rows_yielded += row_count
+
+
+def split_sheet_rows(sheet_rows, max_cols):
+    """Pads every row to max_cols in place and splits the sheet into header, data rows and row numbers.
+
+    max_cols is based *only* on cells returned, so notes in empty columns don't widen the grid.
+    """
+    padding = [''] * max_cols
+    for current_row_values in sheet_rows:
+        if len(current_row_values) < max_cols:
+            current_row_values.extend(padding[len(current_row_values):])
+    # Header is the 2nd sheet row, data starts on the 3rd
+    header = sheet_rows[HEADER_SHEET_ROW - 1] if len(sheet_rows) >= HEADER_SHEET_ROW else []
+    all_rows_values = sheet_rows[FIRST_DATA_SHEET_ROW - 1:]
+    data_row_sheet_indices = list(range(FIRST_DATA_SHEET_ROW, FIRST_DATA_SHEET_ROW + len(all_rows_values)))
+    return header, all_rows_values, data_row_sheet_indices
+
+
 def get_sheet_data_with_notes(spreadsheet_id, sheet_name):
-    """Fetches sheet data including values and notes using spreadsheets.get."""
-    logging.info(f"Fetching data and notes for ID: {spreadsheet_id}, Sheet: {sheet_name}")
-    creds = get_credentials()
-    if not creds: return None, None, None, None, "Server authentication error."
+    """Fetches sheet data including values and notes using spreadsheets.get.
+
+    The sheet is read in ROW_CHUNK_SIZE-row chunks (see iter_grid_chunks) up to its rowCount.
+    """
+    logging.log(REQUEST_LOG_LEVEL, f"Fetching data and notes for ID: {spreadsheet_id}, Sheet: {sheet_name}")
+    service = sheets_provider.get_service()
+    if not service: return None, None, None, None, "Server authentication error."
 
     try:
-        service = build('sheets', 'v4', credentials=creds)
-        # Construct the range string for A1:YZ500 within the specified sheet
-        range_a1 = f"{sheet_name}!{DEFAULT_START_COLUMN_LETTER}1:{DEFAULT_END_COLUMN_LETTER}{DEFAULT_MAX_ROWS}"
-        logging.info(f"Calling spreadsheets.get with range '{range_a1}' and includeGridData=true")
-
-        # Use spreadsheets.get to fetch grid data including notes
-        # Specify fields to potentially limit response size, include necessary grid data
-        fields = 'sheets(data(rowData(values(formattedValue,note))))'
-        # Note: Fetching grid data can be slower/larger than values().get()
-        result = service.spreadsheets().get(
-            spreadsheetId=spreadsheet_id,
-            ranges=[range_a1],
-            fields=fields,
-            includeGridData=True
-        ).execute()
-
-        # --- Parse the GridData response --- 
-        sheets_data = result.get('sheets', [])
-        if not sheets_data or not sheets_data[0].get('data'):
-            logging.warning(f"No sheet data found in response for range {range_a1}")
-            return [], {}, {}, [], None # Return empty header/notes, no error
-
-        grid_data = sheets_data[0]['data'][0] # Assuming single range fetch
-        row_data = grid_data.get('rowData', [])
-
-        header = []
-        all_rows_values = []
+        row_limit = get_sheet_row_limit(service, spreadsheet_id, sheet_name)
+
+        # --- Parse the GridData responses chunk by chunk ---
         notes = {} # Store notes as { "A1_notation": "note text" }
-        max_cols = 0
-        data_row_sheet_indices = []  # List of actual sheet row numbers for each data row
-
-        # Find max columns based *only* on formattedValue presence first
-        # This avoids notes in empty columns creating extra padding later
-        for r_idx, row in enumerate(row_data):
-             values = row.get('values', [])
-             max_cols = max(max_cols, len(values))
-
-        logging.info(f"Max columns found based on cell values: {max_cols}")
-
-        sheet_row_offset = 1 # Sheet rows are 1-based
-
-        for r_idx, row in enumerate(row_data):
-            current_row_values = []
-            values_in_row = row.get('values', [])
-            sheet_row_num = r_idx + sheet_row_offset
-
-            for c_idx in range(max_cols):
-                cell_data = values_in_row[c_idx] if c_idx < len(values_in_row) else {}
-                formatted_value = cell_data.get('formattedValue', '')
-                note = cell_data.get('note')
-                current_row_values.append(formatted_value if formatted_value is not None else '')
-
-                if note:
-                    col_letter = get_col_letter(c_idx)
-                    a1_notation = f"{sheet_name}!{col_letter}{sheet_row_num}"
-                    notes[a1_notation] = note
-                    # logging.debug(f"Found note at {a1_notation}: {note}") # Optional debug log
-
-            # Extract header from the 2nd row (index 1)
-            if r_idx == 1:
-                header = current_row_values[:max_cols]
-            # Add subsequent rows to data (starting from index 2)
-            if r_idx >= 2:
-                all_rows_values.append(current_row_values[:max_cols])
-                data_row_sheet_indices.append(sheet_row_num)
-
-        logging.info(f"Parsed {len(header)} header columns and {len(all_rows_values)} data rows. Found {len(notes)} notes.")
+        sheet_rows = list(iter_sheet_rows(spreadsheet_id, sheet_name, row_limit, notes)) # Index 0 is sheet row 1
+        max_cols = max(map(len, sheet_rows), default=0)
+
+        if not sheet_rows:
+            logging.warning(f"No sheet data found for sheet '{sheet_name}' (rows 1-{row_limit})")
+            return [], [], {}, [], None # Return empty header/notes, no error
+
+        logging.log(REQUEST_LOG_LEVEL, f"Max columns found based on cell values: {max_cols}")
+        header, all_rows_values, data_row_sheet_indices = split_sheet_rows(sheet_rows, max_cols)
+
+        logging.log(REQUEST_LOG_LEVEL, f"Parsed {len(header)} header columns and {len(all_rows_values)} data rows. Found {len(notes)} notes.")
         return header, all_rows_values, notes, data_row_sheet_indices, None # Return header, rows, notes, row indices, no error
 
     except HttpError as err:
@@ -341,11 +1742,1029 @@ def get_sheet_data_with_notes(spreadsheet_id, sheet_name):
         error_msg = f"API Error ({err.resp.status}): Could not get sheet data. Check permissions, Sheet ID, and Sheet Name."
         # Add more specific error checks if needed
         return None, None, None, None, error_msg
+    except ValueError as e:
+        logging.error(f"Value error getting sheet data/notes: {e}")
+        return None, None, None, None, f"Error: {e}"
     except Exception as e:
         logging.error(f"Unexpected error getting sheet data/notes: {e}", exc_info=True)
         return None, None, None, None, "Unexpected server error getting sheet data."
 # --- End Data Fetching ---
 
+# --- Windowed Data Fetching ---
+class HeaderCache:
+    """Thread-safe TTL cache of header rows (with their notes and the sheet's reviewers), so
+    windowed loads only fetch data rows."""
+
+    def __init__(self, ttl=SNAPSHOT_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {} # (spreadsheet_id, sheet_name) -> (fetched_at, header, header_notes, reviewers)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[0] <= self.ttl:
+                return entry[1:]
+            return None
+
+    def put(self, key, header, header_notes, reviewers):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), header, header_notes, reviewers)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+header_cache = HeaderCache()
+
+
+class WindowCache:
+    """Thread-safe TTL/LRU cache of get_sheet_window results, keyed by (spreadsheet_id, sheet_name,
+    first_sheet_row, last_sheet_row, columns).
+
+    Each entry records the sheet's snapshot_cache generation from before its fetch and is only
+    served while that is unchanged, so a write to the sheet (which bumps it) retires every window
+    of it, including one whose fetch was still running.
+    """
+
+    def __init__(self, ttl=SNAPSHOT_CACHE_TTL_SECONDS, max_entries=WINDOW_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict() # window key -> (fetched_at, generation, result)
+        self._counters = {'hits': 0, 'misses': 0}
+
+    def get(self, window_key):
+        generation = snapshot_cache.generation(window_key[:2])
+        with self._lock:
+            entry = self._entries.get(window_key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl or entry[1] != generation:
+                if entry is not None:
+                    del self._entries[window_key]
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(window_key)
+            self._counters['hits'] += 1
+            return entry[2]
+
+    def put(self, window_key, generation, result):
+        """Stores a result fetched starting at `generation`; skipped if a write came in since."""
+        if snapshot_cache.generation(window_key[:2]) != generation:
+            return
+        with self._lock:
+            self._entries[window_key] = (time.monotonic(), generation, result)
+            self._entries.move_to_end(window_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_spreadsheet(self, spreadsheet_id):
+        with self._lock:
+            for window_key in [k for k in self._entries if k[0] == spreadsheet_id]:
+                del self._entries[window_key]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries))
+
+
+window_cache = WindowCache()
+
+
+def parse_column_selection(cols_param):
+    """Parses a 'cols' query value like '0,1,3,4' into a sorted list of unique 0-based indices."""
+    if not cols_param:
+        return None
+    columns = set()
+    for part in cols_param.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if not part.isdigit():
+            raise ValueError(f"Invalid column index '{part}'")
+        columns.add(int(part))
+    return sorted(columns) or None
+
+
+def column_runs(columns):
+    """Groups sorted column indices into contiguous (first, last) runs: [0,1,2,5] -> [(0, 2), (5, 5)]."""
+    runs = []
+    for col in columns:
+        if runs and runs[-1][1] == col - 1:
+            runs[-1] = (runs[-1][0], col)
+        else:
+            runs.append((col, col))
+    return runs
+
+
+def get_sheet_window(spreadsheet_id, sheet_name, first_sheet_row, last_sheet_row, columns=None):
+    """Fetches only sheet rows first_sheet_row..last_sheet_row (1-based, inclusive), optionally
+    limited to the given 0-based columns, with one range per contiguous column run in each
+    spreadsheets.get (windows longer than ROW_CHUNK_SIZE are split into chunks). The rows above
+    the data (header and its notes) and the reviewer column (for the reviewer list) come from
+    header_cache or ride along as two more ranges in the first request.
+
+    Rows are returned full-width when columns is None, otherwise with one value per entry in
+    columns; the header is padded to cover them. Notes follow response_notes: all notes above
+    the data, and the window's own notes (so only in the selected columns). Returns header,
+    rows, notes, data_row_sheet_indices, reviewers, error_msg.
+    """
+    logging.log(REQUEST_LOG_LEVEL, f"Fetching window rows {first_sheet_row}-{last_sheet_row}, columns {columns or 'all'} for ID: {spreadsheet_id}, Sheet: {sheet_name}")
+    service = sheets_provider.get_service()
+    if not service: return None, None, None, None, None, "Server authentication error."
+
+    key = (spreadsheet_id, sheet_name)
+    cached_header = header_cache.get(key)
+    if columns is None:
+        col_runs = [(None, None)]
+    else:
+        col_runs = column_runs(columns)
+
+    def build_ranges(chunk_first, chunk_last, is_first_chunk):
+        ranges = []
+        for first_col, last_col in col_runs:
+            start_letter = get_col_letter(first_col) if first_col is not None else DEFAULT_START_COLUMN_LETTER
+            end_letter = get_col_letter(last_col) if last_col is not None else DEFAULT_END_COLUMN_LETTER
+            ranges.append(f"{sheet_name}!{start_letter}{chunk_first}:{end_letter}{chunk_last}")
+        if cached_header is None and is_first_chunk:
+            ranges.append(f"{sheet_name}!{DEFAULT_START_COLUMN_LETTER}1:{DEFAULT_END_COLUMN_LETTER}{FIRST_DATA_SHEET_ROW - 1}")
+            reviewer_letter = column_letter(REVIEWER_COLUMN_INDEX)
+            ranges.append(f"{sheet_name}!{reviewer_letter}{FIRST_DATA_SHEET_ROW}:{reviewer_letter}")
+        return ranges
+
+    cells_by_row = {} # sheet row number -> {col_index: formatted value}
+    notes = {}
+    header_values = {}
+    header_notes = {}
+    reviewers = set()
+    last_row_seen = first_sheet_row - 1
+    grid_count = 0
+    try:
+        fields = 'sheets(data(startRow,startColumn,rowData(values(formattedValue,note))))'
+        chunks = iter_grid_chunks(spreadsheet_id, first_sheet_row, last_sheet_row, build_ranges, fields)
+        for chunk_index, grids in enumerate(chunks):
+            parse_started = time.perf_counter()
+            row_count = cell_count = 0
+            if chunk_index == 0 and cached_header is None and grids:
+                # The reviewer column range is the last one of the first request
+                for row in grids[-1].get('rowData', []):
+                    values = row.get('values')
+                    if values and values[0].get('formattedValue'):
+                        reviewers.add(values[0]['formattedValue'])
+                grids = grids[:-1]
+            for grid in grids:
+                grid_count += 1
+                start_row = grid.get('startRow', 0)
+                start_col = grid.get('startColumn', 0)
+                is_header_grid = start_row + 1 < FIRST_DATA_SHEET_ROW # The rows above the data
+                for r_offset, row in enumerate(grid.get('rowData', [])):
+                    sheet_row_num = start_row + r_offset + 1
+                    if is_header_grid:
+                        row_cells = header_values if sheet_row_num == HEADER_SHEET_ROW else {} # Only notes kept above the header
+                    else:
+                        row_cells = cells_by_row.setdefault(sheet_row_num, {})
+                    row_notes = header_notes if is_header_grid else notes
+                    if not is_header_grid:
+                        last_row_seen = max(last_row_seen, sheet_row_num)
+                    row_count += 1
+                    cell_count += len(row.get('values', []))
+                    for c_offset, cell_data in enumerate(row.get('values', [])):
+                        col_index = start_col + c_offset
+                        formatted_value = cell_data.get('formattedValue')
+                        if formatted_value is not None:
+                            row_cells[col_index] = formatted_value
+                        note = cell_data.get('note')
+                        if note:
+                            row_notes[f"{sheet_name}!{column_letter(col_index)}{sheet_row_num}"] = note
+            metrics.observe_parse(row_count, cell_count, time.perf_counter() - parse_started)
+    except HttpError as err:
+        logging.error(f"API error getting sheet window: {err}", exc_info=True)
+        error_msg = f"API Error ({err.resp.status}): Could not get sheet data. Check permissions, Sheet ID, and Sheet Name."
+        return None, None, None, None, None, error_msg
+    except Exception as e:
+        logging.error(f"Unexpected error getting sheet window: {e}", exc_info=True)
+        return None, None, None, None, None, "Unexpected server error getting sheet data."
+
+    if cached_header is None:
+        header_width = max(header_values) + 1 if header_values else 0
+        header = [header_values.get(c, '') for c in range(header_width)]
+        reviewers = sorted(reviewers)
+        header_cache.put(key, header, header_notes, reviewers)
+    else:
+        header, header_notes, reviewers = cached_header
+    notes.update(header_notes)
+
+    # Sheet rows without any data inside the window still count, up to the last one returned
+    data_row_sheet_indices = list(range(first_sheet_row, last_row_seen + 1))
+    rows = []
+    if columns is None:
+        width = max([len(header)] + [max(cells) + 1 for cells in cells_by_row.values() if cells])
+        for sheet_row_num in data_row_sheet_indices:
+            cells = cells_by_row.get(sheet_row_num, {})
+            rows.append([cells.get(c, '') for c in range(width)])
+    else:
+        width = max(len(header), columns[-1] + 1)
+        for sheet_row_num in data_row_sheet_indices:
+            cells = cells_by_row.get(sheet_row_num, {})
+            rows.append([cells.get(c, '') for c in columns])
+    header = header + [''] * (width - len(header)) # Copy; the cached header stays as fetched
+
+    logging.log(REQUEST_LOG_LEVEL, f"Parsed window: {len(rows)} rows from {grid_count} grid ranges, {len(notes)} notes.")
+    return header, rows, notes, data_row_sheet_indices, reviewers, None
+
+
+def project_columns(rows, columns):
+    """Keeps only the given column indices of full-width rows, in order."""
+    return [[row[c] if c < len(row) else '' for c in columns] for row in rows]
+
+
+def response_notes(snapshot, sheet_row_nums, columns=None):
+    """The notes a /load-data response carries: every note on the rows above the data, plus the
+    notes on the returned data rows (sheet_row_nums), only in the selected columns if there are
+    any. get_sheet_window produces the same projection, so both paths answer alike."""
+    if columns is None and len(sheet_row_nums) == len(snapshot.data_row_sheet_indices):
+        return snapshot.notes # Every row is returned
+    notes = snapshot.notes_for_rows(range(1, FIRST_DATA_SHEET_ROW))
+    notes.update(snapshot.notes_for_rows(sheet_row_nums, columns))
+    return notes
+# --- End Windowed Data Fetching ---
+
+# --- Spreadsheet Metadata Cache ---
+class MetadataCache:
+    """Thread-safe TTL cache of sheet properties (title, sheetId, grid size) per spreadsheet."""
+
+    FIELDS = 'sheets/properties(sheetId,title,gridProperties(rowCount,columnCount))'
+
+    def __init__(self, ttl=METADATA_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {} # spreadsheet_id -> (fetched_at, {title: properties})
+        self._counters = {'hits': 0, 'fetches': 0}
+
+    def put(self, spreadsheet_id, spreadsheet_metadata, persist=True):
+        """Stores the 'sheets' properties from a spreadsheets.get response."""
+        if persist and snapshot_store is not None:
+            snapshot_store.save_metadata(spreadsheet_id, spreadsheet_metadata)
+        sheets = {}
+        for sheet in spreadsheet_metadata.get('sheets', []):
+            properties = sheet.get('properties', {})
+            if properties.get('title') is not None:
+                sheets[properties['title']] = properties
+        with self._lock:
+            self._entries[spreadsheet_id] = (time.monotonic(), sheets)
+        return sheets
+
+    def get_sheets(self, service, spreadsheet_id, force_refresh=False):
+        """Returns {title: properties}, fetching metadata when missing or expired."""
+        with self._lock:
+            entry = self._entries.get(spreadsheet_id)
+            if entry and not force_refresh and time.monotonic() - entry[0] <= self.ttl:
+                self._counters['hits'] += 1
+                return entry[1]
+        if entry is None and not force_refresh and snapshot_store is not None:
+            # Cold start: metadata another process stored within the TTL is as good as fetched
+            stored = snapshot_store.load_metadata(spreadsheet_id, self.ttl)
+            if stored is not None:
+                spreadsheet_metadata, age = stored
+                sheets = self.put(spreadsheet_id, spreadsheet_metadata, persist=False)
+                with self._lock:
+                    self._entries[spreadsheet_id] = (time.monotonic() - age, sheets)
+                    self._counters['hits'] += 1
+                return sheets
+        with self._lock:
+            self._counters['fetches'] += 1
+        logging.log(REQUEST_LOG_LEVEL, f"Fetching sheet metadata for ID: {spreadsheet_id}")
+        spreadsheet_metadata = sheets_scheduler.execute(
+            service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields=self.FIELDS))
+        return self.put(spreadsheet_id, spreadsheet_metadata)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries))
+
+
+metadata_cache = MetadataCache()
+
+
+def get_sheet_id(service, spreadsheet_id, sheet_name):
+    """Resolves a sheet title to its numeric sheetId. Raises ValueError if there is no such sheet."""
+    sheets = metadata_cache.get_sheets(service, spreadsheet_id)
+    if sheet_name not in sheets:
+        # The cached metadata may predate a newly added or renamed tab
+        sheets = metadata_cache.get_sheets(service, spreadsheet_id, force_refresh=True)
+    sheet_id = sheets.get(sheet_name, {}).get('sheetId')
+    if sheet_id is None:
+        raise ValueError(f"Could not find sheet ID for sheet name '{sheet_name}'")
+    return sheet_id
+# --- End Spreadsheet Metadata Cache ---
+
+# --- Row Filters for /load-data ---
+# Longest numeric prefix, as JavaScript's parseFloat reads it
+_NUMERIC_PREFIX = re.compile(r'[+-]?(?:Infinity|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)')
+
+
+def is_nonzero_sum_value(value):
+    """True unless value is blank or parses as zero; mirrors the page's old
+    `value !== '' && parseFloat(value) !== 0` check (so '0,5' is zero, 'abc' is not)."""
+    value = value.strip()
+    if not value:
+        return False
+    match = _NUMERIC_PREFIX.match(value)
+    if match is None:
+        return True # parseFloat gives NaN, which is not 0
+    return float(match.group()) != 0
+
+
+def resolve_sum_columns(header, candidates=None):
+    """Returns the indices among candidates (default: every column) whose header is '∑'."""
+    if candidates is None:
+        candidates = range(len(header))
+    return [col for col in candidates if col < len(header) and header[col] == SUM_COLUMN_HEADER]
+
+
+def row_matches_filters(row, reviewer=None, sum_columns=()):
+    """Unindexed check of one (possibly unpadded) row; SheetSnapshot.filter_positions is the
+    indexed equivalent. A row passes the sum filter if any of sum_columns is nonzero."""
+    if reviewer is not None:
+        if len(row) <= REVIEWER_COLUMN_INDEX or row[REVIEWER_COLUMN_INDEX] != reviewer:
+            return False
+    if sum_columns:
+        return any(col < len(row) and is_nonzero_sum_value(row[col]) for col in sum_columns)
+    return True
+# --- End Row Filters ---
+
+# --- Snapshot Cache ---
+# Versions start from the wall clock (ms), so versions handed out by an earlier process (and
+# snapshots restored from the on-disk store) don't collide with this process's
+_snapshot_versions = itertools.count(int(time.time() * 1000))
+
+
+class SheetSnapshot:
+    """Parsed contents of one sheet, as produced by get_sheet_data_with_notes.
+
+    Every snapshot gets a process-wide unique version, and a hash per data row covering
+    its values and notes (header_hash covers the rows above the data), so two versions
+    of a sheet can be compared row by row.
+    """
+
+    def __init__(self, header, rows, notes, data_row_sheet_indices, version=None):
+        self.header = header
+        self.rows = rows
+        self.notes = notes
+        self.data_row_sheet_indices = data_row_sheet_indices
+        self.fetched_at = time.monotonic()
+        self.version = next(_snapshot_versions) if version is None else version
+        self._row_positions = None # sheet row number -> index into rows, built on first write
+        self._indexes = {} # Row filter indexes, built on first filtered read
+        self._notes_by_row = self._group_notes()
+        self.header_hash = self._header_hash()
+        self.row_hashes = array.array('q', (self._row_hash(position) for position in range(len(rows))))
+        self.size_bytes = self._estimate_size()
+
+    def _group_notes(self):
+        notes_by_row = collections.defaultdict(list)
+        for a1_notation, note in self.notes.items():
+            try:
+                _, row_index, _ = parse_a1_notation(a1_notation)
+            except ValueError:
+                continue
+            notes_by_row[row_index + 1].append((a1_notation, note))
+        return notes_by_row
+
+    def _header_hash(self):
+        top_notes = sorted(note for row_num, row_notes in self._notes_by_row.items()
+                           if row_num < FIRST_DATA_SHEET_ROW for note in row_notes)
+        return hash((tuple(self.header), tuple(top_notes)))
+
+    def _row_hash(self, position):
+        row_notes = self._notes_by_row.get(self.data_row_sheet_indices[position], ())
+        return hash((tuple(self.rows[position]), tuple(sorted(row_notes))))
+
+    def _position_of(self, sheet_row_num):
+        if self._row_positions is None:
+            self._row_positions = {n: i for i, n in enumerate(self.data_row_sheet_indices)}
+        return self._row_positions.get(sheet_row_num)
+
+    def notes_for_row(self, sheet_row_num):
+        """[(a1_notation, note_text)] for the notes on one sheet row."""
+        return self._notes_by_row.get(sheet_row_num, [])
+
+    def notes_for_rows(self, sheet_row_nums, columns=None):
+        """{a1_notation: note_text} for the notes on the given sheet rows, only in `columns` if given."""
+        if columns is None:
+            return {a1_notation: note for sheet_row_num in sheet_row_nums for a1_notation, note in self.notes_for_row(sheet_row_num)}
+        columns = set(columns)
+        return {a1_notation: note for sheet_row_num in sheet_row_nums for a1_notation, note in self.notes_for_row(sheet_row_num)
+                if parse_a1_notation(a1_notation)[2] in columns}
+
+    def fingerprint(self):
+        return self.version, self.header_hash, self.row_hashes
+
+    def changes_since(self, fingerprint):
+        """Compares against an older fingerprint() of the same sheet.
+
+        Returns (changed_positions, removed_sheet_rows): positions in rows that are new or whose
+        values/notes differ, and sheet row numbers that no longer exist. Returns None if the
+        header rows changed, in which case the whole sheet should be resent.
+        """
+        _, header_hash, old_row_hashes = fingerprint
+        if header_hash != self.header_hash:
+            return None
+        if old_row_hashes == self.row_hashes:
+            return [], []
+        changed = [position for position, row_hash in enumerate(self.row_hashes)
+                   if position >= len(old_row_hashes) or old_row_hashes[position] != row_hash]
+        removed = list(range(FIRST_DATA_SHEET_ROW + len(self.rows), FIRST_DATA_SHEET_ROW + len(old_row_hashes)))
+        return changed, removed
+
+    def _estimate_size(self):
+        # Rough accounting: string payload plus ~56 bytes of object overhead per value
+        size = sum(len(h) + 56 for h in self.header)
+        for row in self.rows:
+            size += sum(len(v) for v in row) + 56 * len(row)
+        for key, note in self.notes.items():
+            size += len(key) + len(note) + 112
+        return size
+
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+    def with_note(self, a1_notation, note_text):
+        """Returns a copy with the note at a1_notation set (or cleared if empty)."""
+        return self.with_notes([(a1_notation, note_text)])
+
+    def with_notes(self, changes):
+        """Returns a copy with each (a1_notation, note_text) applied; empty text clears."""
+        notes = dict(self.notes) # Copy-on-write: readers may be serializing the old dict
+        changed_positions = set()
+        for a1_notation, note_text in changes:
+            if note_text:
+                notes[a1_notation] = note_text
+            else:
+                notes.pop(a1_notation, None)
+            try:
+                _, row_index, _ = parse_a1_notation(a1_notation)
+            except ValueError:
+                continue
+            position = self._position_of(row_index + 1)
+            if position is not None:
+                changed_positions.add(position)
+        return self._replace(changed_positions, notes=notes)
+
+    def with_value(self, row_index, col_index, value):
+        """Returns a copy with one cell value replaced, or None if the cell isn't a data cell."""
+        position = self._position_of(row_index + 1)
+        if position is None or col_index >= len(self.header):
+            return None
+        rows = list(self.rows)
+        row = list(rows[position])
+        if col_index >= len(row):
+            row.extend([''] * (col_index + 1 - len(row)))
+        row[col_index] = value
+        rows[position] = row
+        return self._replace([position], rows=rows)
+
+    def _reviewer_positions(self):
+        """reviewer -> sorted positions in rows of that reviewer's rows (blank reviewers skipped)."""
+        index = self._indexes.get('reviewers')
+        if index is None:
+            index = {}
+            for position, row in enumerate(self.rows):
+                if len(row) > REVIEWER_COLUMN_INDEX and row[REVIEWER_COLUMN_INDEX]:
+                    index.setdefault(row[REVIEWER_COLUMN_INDEX], []).append(position)
+            self._indexes['reviewers'] = index
+        return index
+
+    def reviewers(self):
+        """Sorted distinct non-blank reviewers across all data rows."""
+        return sorted(self._reviewer_positions())
+
+    def nonzero_sum_mask(self, sum_columns):
+        """One byte per row, 1 where any of sum_columns holds a nonzero value."""
+        key = ('nonzero',) + tuple(sorted(sum_columns))
+        mask = self._indexes.get(key)
+        if mask is not None:
+            return mask
+        if len(sum_columns) == 1:
+            col = sum_columns[0]
+            mask = bytes(col < len(row) and is_nonzero_sum_value(row[col]) for row in self.rows)
+        else:
+            # OR the per-column masks as big integers rather than byte by byte
+            combined = 0
+            for col in sum_columns:
+                combined |= int.from_bytes(self.nonzero_sum_mask([col]), 'little')
+            mask = combined.to_bytes(len(self.rows), 'little')
+        self._indexes[key] = mask
+        return mask
+
+    def _matching_positions(self, reviewer, sum_columns):
+        """Sorted positions of every row passing the reviewer / nonzero-sum filters, or None
+        without filters. Cached per filter, so paging through a filtered view stays cheap."""
+        positions = self._reviewer_positions().get(reviewer, []) if reviewer is not None else None
+        if not sum_columns:
+            return positions
+        key = ('matching', reviewer) + tuple(sorted(sum_columns))
+        matching = self._indexes.get(key)
+        if matching is None:
+            mask = self.nonzero_sum_mask(sum_columns)
+            candidates = positions if positions is not None else range(len(self.rows))
+            matching = self._indexes[key] = array.array('l', (position for position in candidates if mask[position]))
+        return matching
+
+    def filter_positions(self, reviewer=None, sum_columns=(), start=0, end=None):
+        """Positions in rows[start:end] whose reviewer is `reviewer` (if given) and with a
+        nonzero value in any of sum_columns (if given), in row order."""
+        positions, _ = self.window_positions(reviewer, sum_columns, start, end)
+        return positions
+
+    def window_positions(self, reviewer=None, sum_columns=(), start=0, end=None, offset=0, limit=None):
+        """Like filter_positions, but returns only `limit` positions starting `offset` positions
+        into the filtered rows, along with the total number of rows that pass the filters."""
+        end = len(self.rows) if end is None else min(end, len(self.rows))
+        start = min(start, end)
+        positions = self._matching_positions(reviewer, sum_columns)
+        if positions is None:
+            first, last = start, end
+        else:
+            first, last = bisect.bisect_left(positions, start), bisect.bisect_left(positions, end)
+        window_end = last if limit is None else min(last, first + offset + limit)
+        window = range(first + offset, window_end)
+        if positions is not None:
+            window = positions[window.start:window.stop] if window else []
+        return list(window), last - first
+
+    def _replace(self, changed_positions, **changes):
+        """Copy with attributes replaced; only rows at changed_positions are rehashed."""
+        clone = SheetSnapshot.__new__(SheetSnapshot)
+        clone.__dict__.update(self.__dict__)
+        clone.__dict__.update(changes)
+        clone.version = next(_snapshot_versions)
+        if 'rows' in changes:
+            clone._indexes = {} # Rebuilt lazily from the new rows
+        if 'notes' in changes:
+            clone._notes_by_row = clone._group_notes()
+            clone.header_hash = clone._header_hash()
+        clone.row_hashes = array.array('q', self.row_hashes)
+        for position in changed_positions:
+            clone.row_hashes[position] = clone._row_hash(position)
+        clone.size_bytes = clone._estimate_size()
+        return clone
+
+
+class SnapshotCache:
+    """Thread-safe LRU cache of SheetSnapshots keyed by (spreadsheet_id, sheet_name).
+
+    Entries expire after `ttl` seconds, and the least recently used entries are
+    evicted once either `max_entries` or `max_bytes` is exceeded. Each key carries a
+    generation number that writes bump, so a fetch that started before a write can't
+    overwrite the written data with what it read.
+    """
+
+    def __init__(self, ttl=SNAPSHOT_CACHE_TTL_SECONDS, max_entries=SNAPSHOT_CACHE_MAX_ENTRIES,
+                 max_bytes=SNAPSHOT_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._generations = {}
+        self._history = collections.OrderedDict() # key -> recent fingerprints, outlives cache entries
+        self._total_bytes = 0
+        self.listeners = [] # listener(key, snapshot, is_write) after a snapshot is stored; snapshot is None once dropped by a write
+        self._counters = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0,
+                          'write_updates': 0, 'invalidations': 0}
+
+    def _drop(self, key):
+        snapshot = self._entries.pop(key, None)
+        if snapshot is not None:
+            self._total_bytes -= snapshot.size_bytes
+
+    def _remember(self, key, snapshot):
+        history = self._history.get(key)
+        if history is None:
+            history = self._history[key] = collections.deque(maxlen=SNAPSHOT_HISTORY_VERSIONS)
+        history.append(snapshot.fingerprint())
+        self._history.move_to_end(key)
+        while len(self._history) > 2 * self.max_entries:
+            self._history.popitem(last=False)
+
+    def fingerprint(self, key, version):
+        """Returns the remembered fingerprint of `version` of a sheet, or None."""
+        with self._lock:
+            for fingerprint in self._history.get(key, ()):
+                if fingerprint[0] == version:
+                    return fingerprint
+            return None
+
+    def get(self, key):
+        with self._lock:
+            snapshot = self._entries.get(key)
+            if snapshot is None:
+                self._counters['misses'] += 1
+                return None
+            if snapshot.age() > self.ttl:
+                self._drop(key)
+                self._counters['expired'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return snapshot
+
+    def generation(self, key):
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def _notify(self, key, snapshot, is_write):
+        for listener in self.listeners:
+            try:
+                listener(key, snapshot, is_write)
+            except Exception as e:
+                logging.error(f"Snapshot cache listener failed for {key}: {e}", exc_info=True)
+
+    def put(self, key, snapshot, generation=None):
+        """Stores a snapshot. Skipped if a write bumped the key's generation since `generation`."""
+        stored = self._put(key, snapshot, generation)
+        if stored:
+            self._notify(key, snapshot, False)
+        return stored
+
+    def _put(self, key, snapshot, generation):
+        with self._lock:
+            if generation is not None and self._generations.get(key, 0) != generation:
+                logging.info(f"Discarding stale snapshot for {key}: written to while it was being fetched.")
+                return False
+            if snapshot.size_bytes > self.max_bytes:
+                logging.warning(f"Snapshot for {key} ({snapshot.size_bytes} bytes) exceeds cache limit; not caching.")
+                return False
+            self._drop(key)
+            self._entries[key] = snapshot
+            self._total_bytes += snapshot.size_bytes
+            self._remember(key, snapshot)
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._drop(oldest_key)
+                self._counters['evictions'] += 1
+            return True
+
+    def update(self, key, transform):
+        """Applies transform(snapshot) -> snapshot|None to a cached entry after a write.
+
+        A None result (the change can't be applied in place) invalidates the entry.
+        """
+        self._notify(key, self._update(key, transform), True)
+
+    def _update(self, key, transform):
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            snapshot = self._entries.get(key)
+            if snapshot is None:
+                return
+            updated = transform(snapshot)
+            self._drop(key)
+            if updated is None:
+                self._counters['invalidations'] += 1
+                return
+            updated.fetched_at = snapshot.fetched_at # Writes don't extend the TTL
+            self._entries[key] = updated
+            self._total_bytes += updated.size_bytes
+            self._remember(key, updated)
+            self._counters['write_updates'] += 1
+            return updated
+
+    def invalidate(self, key):
+        self.update(key, lambda snapshot: None)
+
+    def bump_generation(self, key):
+        """Makes fetches of key already in flight skip caching their result, as a write does.
+        Returns the new generation."""
+        with self._lock:
+            generation = self._generations[key] = self._generations.get(key, 0) + 1
+            return generation
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update(entries=len(self._entries), bytes=self._total_bytes,
+                         max_entries=self.max_entries, max_bytes=self.max_bytes, ttl_seconds=self.ttl)
+            return stats
+
+
+snapshot_cache = SnapshotCache()
+
+
+def get_sheet_snapshot(spreadsheet_id, sheet_name, force_refresh=False):
+    """Read-through wrapper around get_sheet_data_with_notes. Returns (snapshot, error_msg)."""
+    key = (spreadsheet_id, sheet_name)
+    if not force_refresh:
+        snapshot = snapshot_cache.get(key)
+        if snapshot is not None:
+            logging.log(REQUEST_LOG_LEVEL, f"Snapshot cache hit for {key} (age {snapshot.age():.1f}s).")
+            return snapshot, None
+        if snapshot_store is not None:
+            generation = snapshot_cache.generation(key)
+            snapshot = snapshot_store.load_snapshot(key)
+            if snapshot is not None:
+                # Stale-while-revalidate: answer from disk now, refetch in the background
+                snapshot = with_pending_writes(key, snapshot, generation)
+                snapshot_cache.put(key, snapshot, generation)
+                revalidate_snapshot_later(spreadsheet_id, sheet_name)
+                return snapshot, None
+
+    def fetch():
+        generation = snapshot_cache.generation(key)
+        header, all_rows, notes, data_row_sheet_indices, error_msg = get_sheet_data_with_notes(spreadsheet_id, sheet_name)
+        if error_msg:
+            return None, error_msg
+        snapshot = with_pending_writes(key, SheetSnapshot(header, all_rows, notes, data_row_sheet_indices), generation)
+        snapshot_cache.put(key, snapshot, generation)
+        return snapshot, None
+
+    # Concurrent misses for the same sheet share one fetch and parse
+    return sheets_scheduler.singleflight(('snapshot',) + key, fetch)
+
+
+def revalidate_snapshot_later(spreadsheet_id, sheet_name):
+    """Refetches a sheet on a background thread (joining any fetch already running for it)."""
+    def revalidate():
+        _, error_msg = get_sheet_snapshot(spreadsheet_id, sheet_name, force_refresh=True)
+        if error_msg:
+            logging.warning(f"Background refresh of {(spreadsheet_id, sheet_name)} failed: {error_msg}")
+
+    threading.Thread(target=revalidate, name='snapshot-revalidate', daemon=True).start()
+
+
+def invalidate_spreadsheet_caches(spreadsheet_id):
+    """Drops every cached tab of a spreadsheet and tells its /events listeners to reload."""
+    for key in [k for k in snapshot_cache.keys() if k[0] == spreadsheet_id]:
+        snapshot_cache.invalidate(key)
+        header_cache.invalidate(key)
+    window_cache.invalidate_spreadsheet(spreadsheet_id)
+    event_hub.publish_reload(spreadsheet_id)
+
+
+def with_pending_writes(key, snapshot, generation):
+    """Re-applies the write-behind writes that a snapshot of key, fetched starting at cache
+    generation `generation`, may not include yet (see WriteBehindQueue.pending_writes)."""
+    if write_queue is None:
+        return snapshot
+    writes = write_queue.pending_writes(key, generation)
+    notes = [(a1_notation, payload) for kind, a1_notation, payload in writes if kind == 'note']
+    if notes:
+        snapshot = snapshot.with_notes(notes)
+    for kind, a1_notation, payload in writes:
+        if kind == 'value':
+            _, row_index, col_index = parse_a1_notation(a1_notation)
+            snapshot = snapshot.with_value(row_index, col_index, payload) or snapshot
+    return snapshot
+
+
+def record_note_write(spreadsheet_id, a1_notation, note_text):
+    """Applies a note write to the cached snapshot (the cell must be a single A1 cell)."""
+    sheet_name, row_index, _ = parse_a1_notation(a1_notation)
+    snapshot_cache.update((spreadsheet_id, sheet_name),
+                          lambda snapshot: snapshot.with_note(a1_notation, note_text))
+    if row_index + 1 == HEADER_SHEET_ROW:
+        header_cache.invalidate((spreadsheet_id, sheet_name))
+    event_hub.publish_cells((spreadsheet_id, sheet_name), [{"a1": a1_notation, "note": note_text}], 'write')
+
+
+def record_value_write(spreadsheet_id, a1_notation, value):
+    """Applies a cell value write to the cached snapshot."""
+    try:
+        sheet_name, row_index, col_index = parse_a1_notation(a1_notation)
+    except ValueError:
+        # Not a plain cell reference (e.g. a range); we can't tell what changed, so drop every tab
+        invalidate_spreadsheet_caches(spreadsheet_id)
+        return
+    snapshot_cache.update((spreadsheet_id, sheet_name),
+                          lambda snapshot: snapshot.with_value(row_index, col_index, value))
+    if row_index + 1 == HEADER_SHEET_ROW:
+        header_cache.invalidate((spreadsheet_id, sheet_name))
+    event_hub.publish_cells((spreadsheet_id, sheet_name), [{"a1": a1_notation, "value": value}], 'write')
+# --- End Snapshot Cache ---
+
+# --- Persistent Snapshot Store ---
+class SnapshotStore:
+    """SQLite file of parsed snapshots and spreadsheet metadata that outlives the process.
+
+    Snapshots reach the store through a SnapshotCache listener and are written by a
+    background thread (only the latest version of a sheet, gzip-compressed JSON), so
+    requests never wait on disk writes. Entries keep their snapshot version, so clients
+    holding that version still get deltas after a restart. The least recently read
+    entries are evicted once the payloads exceed max_bytes, and entries older than
+    max_age are never served. A file written with another SCHEMA_VERSION is cleared, and one
+    that isn't a database at all is moved aside; if the file can't be read (locked by another
+    process, say) loads fall back to fetching from the API.
+    """
+
+    SCHEMA_VERSION = 1 # Bump when the tables or the payload layout change
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS snapshots (
+            spreadsheet_id TEXT NOT NULL,
+            sheet_name TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            stored_at REAL NOT NULL,                  -- wall clock time of the fetch
+            accessed_at REAL NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            payload BLOB NOT NULL,                    -- gzip-compressed JSON
+            PRIMARY KEY (spreadsheet_id, sheet_name)
+        );
+        CREATE TABLE IF NOT EXISTS metadata (
+            spreadsheet_id TEXT PRIMARY KEY,
+            stored_at REAL NOT NULL,
+            payload TEXT NOT NULL                     -- the spreadsheets.get response
+        );
+    """
+
+    def __init__(self, directory=SNAPSHOT_STORE_DIR, max_bytes=SNAPSHOT_STORE_MAX_BYTES,
+                 max_age=SNAPSHOT_STORE_MAX_AGE_SECONDS):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'snapshots.sqlite3')
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock() # Serializes use of the shared connection
+        try:
+            self._conn = self._open()
+        except sqlite3.DatabaseError as e:
+            if isinstance(e, sqlite3.OperationalError):
+                raise # Locked or unreadable rather than damaged; leave the file alone
+            corrupt_path = f"{self.path}.corrupt-{int(time.time())}"
+            logging.warning(f"Snapshot store {self.path} is not a usable database ({e}); moving it to {corrupt_path}.")
+            for suffix in ('', '-wal', '-shm'):
+                with contextlib.suppress(FileNotFoundError):
+                    os.replace(self.path + suffix, corrupt_path + suffix)
+            self._conn = self._open()
+        self._size = (0, 0) # (entries, bytes) as last read, reported while the file is locked
+        self._pending = {} # key -> latest snapshot to write, or None to delete
+        self._stored_versions = {} # key -> version known to be on disk
+        self._cond = threading.Condition()
+        self._counters = {'loads': 0, 'load_misses': 0, 'saves': 0, 'deletes': 0, 'evictions': 0, 'errors': 0}
+        self._thread = threading.Thread(target=self._run, name='snapshot-store', daemon=True)
+        self._thread.start()
+        logging.info(f"Snapshot store at {self.path} opened.")
+
+    def _open(self):
+        # A short busy timeout: a locked file should cost a request a second, not five
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=1.0)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL') # Losing the last save on a crash only costs a refetch
+            schema_version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if schema_version != self.SCHEMA_VERSION:
+                # Written by another version of the app; it's only a cache, so start afresh
+                if schema_version:
+                    logging.info(f"Snapshot store {self.path} has schema version {schema_version}; clearing it.")
+                conn.executescript('DROP TABLE IF EXISTS snapshots; DROP TABLE IF EXISTS metadata;')
+                conn.executescript(self.SCHEMA)
+                conn.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def snapshot_stored(self, key, snapshot, is_write):
+        """SnapshotCache listener: queues the new snapshot (or its removal) for writing."""
+        if snapshot is not None and self._stored_versions.get(key) == snapshot.version:
+            return # Just loaded from disk
+        with self._cond:
+            self._pending[key] = snapshot
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                key, snapshot = self._pending.popitem()
+            try:
+                if snapshot is None:
+                    self._delete(key)
+                else:
+                    self._save(key, snapshot)
+            except Exception as e:
+                self._counters['errors'] += 1
+                logging.error(f"Snapshot store write for {key} failed: {e}", exc_info=True)
+
+    def _save(self, key, snapshot):
+        payload = gzip.compress(json.dumps(
+            [snapshot.header, snapshot.rows, snapshot.notes, snapshot.data_row_sheet_indices],
+            ensure_ascii=False, separators=(',', ':')).encode('utf-8'), compresslevel=1)
+        if len(payload) > self.max_bytes:
+            self._delete(key)
+            return
+        now = time.time()
+        stored_at = now - snapshot.age()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO snapshots (spreadsheet_id, sheet_name, version, stored_at, accessed_at, '
+                'size_bytes, payload) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key[0], key[1], snapshot.version, stored_at, now, len(payload), payload))
+            self._stored_versions[key] = snapshot.version
+            self._counters['saves'] += 1
+            self._evict()
+
+    def _delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM snapshots WHERE spreadsheet_id = ? AND sheet_name = ?', key)
+            self._stored_versions.pop(key, None)
+            self._counters['deletes'] += 1
+
+    def _evict(self):
+        # Caller holds self._lock
+        self._conn.execute('DELETE FROM snapshots WHERE stored_at < ?', (time.time() - self.max_age,))
+        total = self._conn.execute('SELECT COALESCE(SUM(size_bytes), 0) FROM snapshots').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for spreadsheet_id, sheet_name, size_bytes in self._conn.execute(
+                'SELECT spreadsheet_id, sheet_name, size_bytes FROM snapshots ORDER BY accessed_at').fetchall():
+            self._conn.execute('DELETE FROM snapshots WHERE spreadsheet_id = ? AND sheet_name = ?',
+                               (spreadsheet_id, sheet_name))
+            self._stored_versions.pop((spreadsheet_id, sheet_name), None)
+            self._counters['evictions'] += 1
+            total -= size_bytes
+            if total <= self.max_bytes:
+                break
+
+    def load_snapshot(self, key):
+        """Returns the stored SheetSnapshot for key (its age carried over), or None."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT version, stored_at, payload FROM snapshots WHERE spreadsheet_id = ? AND sheet_name = ? '
+                    'AND stored_at >= ?', (key[0], key[1], time.time() - self.max_age)).fetchone()
+                if row is None:
+                    self._counters['load_misses'] += 1
+                    return None
+                self._conn.execute('UPDATE snapshots SET accessed_at = ? WHERE spreadsheet_id = ? AND sheet_name = ?',
+                                   (time.time(), key[0], key[1]))
+        except sqlite3.Error as e:
+            self._counters['errors'] += 1
+            logging.warning(f"Snapshot store read for {key} failed, fetching instead: {e}")
+            return None
+        version, stored_at, payload = row
+        try:
+            header, rows, notes, data_row_sheet_indices = json.loads(gzip.decompress(payload))
+            snapshot = SheetSnapshot(header, rows, notes, data_row_sheet_indices, version=version)
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logging.warning(f"Discarding unreadable stored snapshot for {key}: {e}")
+            with contextlib.suppress(sqlite3.Error): # The next save replaces it anyway
+                self._delete(key)
+            return None
+        snapshot.fetched_at = time.monotonic() - max(0.0, time.time() - stored_at)
+        self._stored_versions[key] = version
+        self._counters['loads'] += 1
+        logging.info(f"Loaded snapshot for {key} from disk (version {version}, age {snapshot.age():.0f}s).")
+        return snapshot
+
+    def save_metadata(self, spreadsheet_id, spreadsheet_metadata):
+        try:
+            with self._lock:
+                self._conn.execute('INSERT OR REPLACE INTO metadata (spreadsheet_id, stored_at, payload) VALUES (?, ?, ?)',
+                                   (spreadsheet_id, time.time(), json.dumps(spreadsheet_metadata, ensure_ascii=False)))
+        except sqlite3.Error as e:
+            self._counters['errors'] += 1
+            logging.error(f"Snapshot store metadata write for {spreadsheet_id} failed: {e}")
+
+    def load_metadata(self, spreadsheet_id, max_age):
+        """Returns (spreadsheet_metadata, age_seconds) if stored within max_age, else None."""
+        try:
+            with self._lock:
+                row = self._conn.execute('SELECT stored_at, payload FROM metadata WHERE spreadsheet_id = ?',
+                                         (spreadsheet_id,)).fetchone()
+            if row is None or time.time() - row[0] > max_age:
+                return None
+            return json.loads(row[1]), max(0.0, time.time() - row[0])
+        except (sqlite3.Error, ValueError) as e:
+            self._counters['errors'] += 1
+            logging.warning(f"Snapshot store metadata read for {spreadsheet_id} failed, fetching instead: {e}")
+            return None
+
+    def stats(self):
+        with self._lock:
+            try:
+                self._size = self._conn.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM snapshots').fetchone()
+            except sqlite3.Error as e:
+                logging.warning(f"Snapshot store size query failed: {e}")
+            entries, total = self._size
+            return dict(self._counters, entries=entries, bytes=total, max_bytes=self.max_bytes,
+                        pending_writes=len(self._pending))
+
+
+snapshot_store = None
+if SNAPSHOT_STORE_DIR:
+    try:
+        snapshot_store = SnapshotStore()
+        snapshot_cache.listeners.append(snapshot_store.snapshot_stored)
+    except (OSError, sqlite3.Error) as e:
+        logging.error(f"Could not open snapshot store in {SNAPSHOT_STORE_DIR}, continuing without it: {e}")
+# --- End Persistent Snapshot Store ---
+
 # --- New Endpoint to Save Note ---
 @app.route('/save-note', methods=['POST'])
 def save_note_route():
@@ -354,55 +2773,37 @@ def save_note_route():
     a1_notation = data.get('a1') # e.g., "Sheet1!C5"
     note_text = data.get('note')
 
-    logging.info(f"Request: /save-note | ID: '{spreadsheet_id}', A1: '{a1_notation}', Note: '{note_text[:50]}...'")
+    logging.log(REQUEST_LOG_LEVEL, f"Request: /save-note | ID: '{spreadsheet_id}', A1: '{a1_notation}', Note: '{note_text[:50]}...'")
 
     if not spreadsheet_id or not a1_notation:
         return jsonify({"error": "Missing required parameters (id, a1)."}), 400
     if note_text is None: # Allow empty string to clear note
         note_text = ''
 
-    creds = get_credentials()
-    if not creds:
+    if write_queue is not None:
+        try:
+            parse_a1_notation(a1_notation)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid request format: {e}"}), 400
+        mutation_id = write_queue.enqueue(spreadsheet_id, 'note', a1_notation, note_text)
+        record_note_write(spreadsheet_id, a1_notation, note_text)
+        return jsonify({"success": True, "a1": a1_notation, "note": note_text, "queued": True, "mutation_id": mutation_id})
+
+    service = sheets_provider.get_service()
+    if not service:
         return jsonify({"error": "Server authentication error."}), 500
 
     error_msg = None
+    status_code = 500
     try:
-        service = build('sheets', 'v4', credentials=creds)
 
         # Parse Sheet Name, Row, Col from A1 notation
-        # Basic parsing, assumes standard format like SheetName!LetterNumber
-        parts = a1_notation.split('!')
-        if len(parts) != 2:
-             raise ValueError("Invalid A1 notation format")
-        sheet_name = parts[0]
-        cell_ref = parts[1]
-        col_letter = ''
-        row_num_str = ''
-        for char in cell_ref:
-            if char.isalpha():
-                col_letter += char
-            elif char.isdigit():
-                row_num_str += char
-        if not col_letter or not row_num_str:
-             raise ValueError("Could not parse column/row from A1 notation")
-        row_index = int(row_num_str) - 1 # Convert to 0-based index
-        col_index = 0
-        for char in col_letter:
-            col_index = col_index * 26 + (ord(char.upper()) - 65 + 1)
-        col_index -= 1
-
-        # --- Fetch sheetId BEFORE building the request body ---
-        logging.info(f"Fetching sheetId for sheet name: '{sheet_name}'")
-        spreadsheet_metadata = service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields='sheets/properties(sheetId,title)').execute()
-        sheet_id = None
-        for sheet in spreadsheet_metadata.get('sheets', []):
-            if sheet.get('properties', {}).get('title') == sheet_name:
-                sheet_id = sheet.get('properties', {}).get('sheetId')
-                break
-        if sheet_id is None:
-            raise ValueError(f"Could not find sheet ID for sheet name '{sheet_name}'")
-        logging.info(f"Found sheetId: {sheet_id} for sheet name: '{sheet_name}'")
-        # --- End Fetch sheetId ---
+        sheet_name, row_index, col_index = parse_a1_notation(a1_notation)
+
+        # --- Resolve sheetId BEFORE building the request body ---
+        sheet_id = get_sheet_id(service, spreadsheet_id, sheet_name)
+        logging.log(REQUEST_LOG_LEVEL, f"Found sheetId: {sheet_id} for sheet name: '{sheet_name}'")
+        # --- End Resolve sheetId ---
 
         # Use batchUpdate to set the note
         requests_body = {
@@ -432,17 +2833,21 @@ def save_note_route():
             ]
         }
 
-        logging.info(f"Executing batchUpdate to set note for range: sheetId={sheet_id}, row={row_index}, col={col_index}")
-        response = service.spreadsheets().batchUpdate(
+        logging.log(REQUEST_LOG_LEVEL, f"Executing batchUpdate to set note for range: sheetId={sheet_id}, row={row_index}, col={col_index}")
+        response = sheets_scheduler.execute(service.spreadsheets().batchUpdate(
             spreadsheetId=spreadsheet_id,
             body=requests_body
-        ).execute()
+        ))
 
-        logging.info(f"Successfully updated note for {a1_notation}. Response: {response}")
+        logging.log(REQUEST_LOG_LEVEL, f"Successfully updated note for {a1_notation}. Response: {response}")
+        record_note_write(spreadsheet_id, a1_notation, note_text)
 
     except HttpError as err:
         logging.error(f"API error saving note: {err}", exc_info=True)
         error_msg = f"API Error ({err.resp.status}): Could not save note. Check permissions and cell reference."
+        if err.resp.status == 429:
+            error_msg = QUOTA_EXCEEDED_MESSAGE
+            status_code = 429
     except ValueError as e:
         logging.error(f"Value error processing save note request: {e}")
         error_msg = f"Invalid request format: {e}"
@@ -451,11 +2856,174 @@ def save_note_route():
         error_msg = "Unexpected server error saving note."
 
     if error_msg:
-        return jsonify({"error": error_msg}), 500
+        return jsonify({"error": error_msg}), status_code
     else:
         return jsonify({"success": True, "a1": a1_notation, "note": note_text})
 # --- End Save Note Endpoint ---
 
+# --- Bulk Save Notes Endpoint ---
+def merge_cells_into_rectangles(cells):
+    """Greedily covers a set of (row, col) cells with non-overlapping rectangles.
+
+    Each cell is extended right as far as the run of selected cells goes, then down
+    while the whole column span is selected. Returns (start_row, start_col, end_row,
+    end_col) tuples with exclusive ends, matching GridRange.
+    """
+    remaining = set(cells)
+    rectangles = []
+    for row, col in sorted(cells):
+        if (row, col) not in remaining:
+            continue
+        end_col = col + 1
+        while (row, end_col) in remaining:
+            end_col += 1
+        end_row = row + 1
+        while all((end_row, c) in remaining for c in range(col, end_col)):
+            end_row += 1
+        for r in range(row, end_row):
+            for c in range(col, end_col):
+                remaining.discard((r, c))
+        rectangles.append((row, col, end_row, end_col))
+    return rectangles
+
+
+@app.route('/save-notes', methods=['POST'])
+def save_notes_route():
+    """Sets notes on many cells with as few batchUpdate calls as possible.
+
+    Body: {"id": ..., "note": "text", "cells": ["Sheet1!C5", ...]}. A cell may also be
+    given as {"a1": ..., "note": ...} to override the shared note. Adjacent cells are
+    merged into rectangular updateCells requests. Returns per-cell results in input order;
+    a cell listed more than once is written once, and its earlier entries report that
+    write's outcome with "duplicate_of" set to the position of the written entry.
+    """
+    data = request.json or {}
+    spreadsheet_id = data.get('id')
+    cells = data.get('cells')
+    default_note = data.get('note') or '' # Empty string clears notes
+
+    logging.log(REQUEST_LOG_LEVEL, f"Request: /save-notes | ID: '{spreadsheet_id}', Cells: {len(cells) if isinstance(cells, list) else cells}")
+
+    if not spreadsheet_id or not isinstance(cells, list) or not cells:
+        return jsonify({"error": "Missing required parameters (id, cells)."}), 400
+
+    service = sheets_provider.get_service()
+    if not service:
+        return jsonify({"error": "Server authentication error."}), 500
+
+    results = [None] * len(cells)
+    targets = {} # sheet_name -> {(row_index, col_index): (result_position, a1, note)}
+    for position, cell in enumerate(cells):
+        a1_notation, note_text = (cell.get('a1'), cell.get('note', default_note) or '') if isinstance(cell, dict) else (cell, default_note)
+        try:
+            if not isinstance(a1_notation, str):
+                raise ValueError("Cell must be an A1 string")
+            if not isinstance(note_text, str):
+                raise ValueError("Note must be a string")
+            sheet_name, row_index, col_index = parse_a1_notation(a1_notation)
+        except ValueError as e:
+            results[position] = {"a1": a1_notation, "success": False, "error": f"Invalid request format: {e}"}
+            continue
+        previous = targets.setdefault(sheet_name, {}).get((row_index, col_index))
+        if previous is not None:
+            # Same cell listed twice: last one wins, the earlier entry reports the same outcome
+            results[previous[0]] = {"a1": previous[1], "duplicate_of": position}
+        targets[sheet_name][(row_index, col_index)] = (position, a1_notation, note_text)
+
+    for sheet_name, sheet_cells in targets.items():
+        try:
+            sheet_id = get_sheet_id(service, spreadsheet_id, sheet_name)
+        except HttpError as err:
+            logging.error(f"API error resolving sheet '{sheet_name}': {err}", exc_info=True)
+            error_msg = f"API Error ({err.resp.status}): Could not resolve sheet '{sheet_name}'."
+            for position, a1_notation, _ in sheet_cells.values():
+                results[position] = {"a1": a1_notation, "success": False, "error": error_msg}
+            continue
+        except ValueError as e:
+            for position, a1_notation, _ in sheet_cells.values():
+                results[position] = {"a1": a1_notation, "success": False, "error": str(e)}
+            continue
+        except Exception as e:
+            logging.error(f"Unexpected error resolving sheet '{sheet_name}': {e}", exc_info=True)
+            for position, a1_notation, _ in sheet_cells.values():
+                results[position] = {"a1": a1_notation, "success": False,
+                                     "error": f"Unexpected server error resolving sheet '{sheet_name}'."}
+            continue
+
+        update_requests = []
+        request_cells = [] # Cells covered by each entry in update_requests
+        for start_row, start_col, end_row, end_col in merge_cells_into_rectangles(sheet_cells):
+            rows = []
+            covered = []
+            for r in range(start_row, end_row):
+                values = []
+                for c in range(start_col, end_col):
+                    entry = sheet_cells[(r, c)]
+                    values.append({'note': entry[2] if entry[2] else None})
+                    covered.append(entry)
+                rows.append({'values': values})
+            update_requests.append({
+                'updateCells': {
+                    'rows': rows,
+                    'fields': 'note',
+                    'range': {
+                        'sheetId': sheet_id,
+                        'startRowIndex': start_row,
+                        'endRowIndex': end_row,
+                        'startColumnIndex': start_col,
+                        'endColumnIndex': end_col
+                    }
+                }
+            })
+            request_cells.append(covered)
+
+        logging.log(REQUEST_LOG_LEVEL, f"Saving {len(sheet_cells)} notes on '{sheet_name}' as {len(update_requests)} updateCells requests")
+        for batch_start in range(0, len(update_requests), BULK_NOTES_MAX_REQUESTS_PER_BATCH):
+            batch_end = batch_start + BULK_NOTES_MAX_REQUESTS_PER_BATCH
+            batch_cells = [entry for covered in request_cells[batch_start:batch_end] for entry in covered]
+            error_msg = None
+            try:
+                sheets_scheduler.execute(service.spreadsheets().batchUpdate(
+                    spreadsheetId=spreadsheet_id,
+                    body={'requests': update_requests[batch_start:batch_end]}
+                ))
+            except HttpError as err:
+                logging.error(f"API error saving notes: {err}", exc_info=True)
+                error_msg = f"API Error ({err.resp.status}): Could not save note. Check permissions and cell reference."
+                if err.resp.status == 429:
+                    error_msg = QUOTA_EXCEEDED_MESSAGE
+            except Exception as e:
+                logging.error(f"Unexpected error saving notes: {e}", exc_info=True)
+                error_msg = "Unexpected server error saving note."
+
+            for position, a1_notation, note_text in batch_cells:
+                if error_msg:
+                    results[position] = {"a1": a1_notation, "success": False, "error": error_msg}
+                else:
+                    results[position] = {"a1": a1_notation, "success": True, "note": note_text}
+            if not error_msg:
+                saved = [(a1_notation, note_text) for _, a1_notation, note_text in batch_cells]
+                snapshot_cache.update((spreadsheet_id, sheet_name),
+                                      lambda snapshot: snapshot.with_notes(saved))
+                if any(row_index + 1 == HEADER_SHEET_ROW for row_index, _ in sheet_cells):
+                    header_cache.invalidate((spreadsheet_id, sheet_name))
+                event_hub.publish_cells((spreadsheet_id, sheet_name),
+                                        [{"a1": a1_notation, "note": note_text} for a1_notation, note_text in saved], 'write')
+
+    # Resolve duplicates to the outcome of the entry that was actually written, keeping their own a1
+    for position, result in enumerate(results):
+        if 'success' not in result:
+            written_position = result['duplicate_of']
+            while 'success' not in results[written_position]:
+                written_position = results[written_position]['duplicate_of']
+            results[position] = dict(results[written_position], a1=result['a1'], duplicate_of=written_position)
+
+    saved_count = sum(1 for result in results if result['success'])
+    logging.log(REQUEST_LOG_LEVEL, f"Saved {saved_count} of {len(results)} notes for ID: {spreadsheet_id}")
+    return jsonify({"success": saved_count == len(results), "saved": saved_count,
+                    "failed": len(results) - saved_count, "results": results})
+# --- End Bulk Save Notes Endpoint ---
+
 # --- New Endpoint to Ban Cell (Set Value to 0) ---
 @app.route('/ban-cell', methods=['POST'])
 def ban_cell_route():
@@ -463,18 +3031,27 @@ def ban_cell_route():
     spreadsheet_id = data.get('id')
     a1_notation = data.get('a1') # e.g., "Sheet1!D5"
 
-    logging.info(f"Request: /ban-cell | ID: '{spreadsheet_id}', A1: '{a1_notation}'")
+    logging.log(REQUEST_LOG_LEVEL, f"Request: /ban-cell | ID: '{spreadsheet_id}', A1: '{a1_notation}'")
 
     if not spreadsheet_id or not a1_notation:
         return jsonify({"error": "Missing required parameters (id, a1)."}), 400
 
-    creds = get_credentials()
-    if not creds:
+    if write_queue is not None:
+        try:
+            parse_a1_notation(a1_notation)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid request format: {e}"}), 400
+        mutation_id = write_queue.enqueue(spreadsheet_id, 'value', a1_notation, '0')
+        record_value_write(spreadsheet_id, a1_notation, '0')
+        return jsonify({"success": True, "a1": a1_notation, "newValue": "0", "queued": True, "mutation_id": mutation_id})
+
+    service = sheets_provider.get_service()
+    if not service:
         return jsonify({"error": "Server authentication error."}), 500
 
     error_msg = None
+    status_code = 500
     try:
-        service = build('sheets', 'v4', credentials=creds)
 
         # Define the request body for values.update
         # We set the value to the string "0"
@@ -482,15 +3059,16 @@ def ban_cell_route():
             'values': [['0']]
         }
 
-        logging.info(f"Executing values.update to set cell {a1_notation} to '0'")
-        result = service.spreadsheets().values().update(
+        logging.log(REQUEST_LOG_LEVEL, f"Executing values.update to set cell {a1_notation} to '0'")
+        result = sheets_scheduler.execute(service.spreadsheets().values().update(
             spreadsheetId=spreadsheet_id,
             range=a1_notation, # values.update works directly with A1 range
             valueInputOption='USER_ENTERED', # Interpret '0' as a number if possible by Sheets
             body=body
-        ).execute()
+        ))
 
-        logging.info(f"Successfully set cell {a1_notation} to '0'. Response: {result}")
+        logging.log(REQUEST_LOG_LEVEL, f"Successfully set cell {a1_notation} to '0'. Response: {result}")
+        record_value_write(spreadsheet_id, a1_notation, '0')
 
     except HttpError as err:
         logging.error(f"API error banning cell: {err}", exc_info=True)
@@ -498,24 +3076,970 @@ def ban_cell_route():
         # Add more specific checks if needed (e.g., 400 for invalid range)
         if err.resp.status == 400:
             error_msg += " (Possible invalid cell reference)"
+        elif err.resp.status == 429:
+            error_msg = QUOTA_EXCEEDED_MESSAGE
+            status_code = 429
 
     except Exception as e:
         logging.error(f"Unexpected error banning cell: {e}", exc_info=True)
         error_msg = "Unexpected server error updating cell value."
 
     if error_msg:
-        return jsonify({"error": error_msg}), 500
+        return jsonify({"error": error_msg}), status_code
     else:
         # Return success along with which cell was updated
         return jsonify({"success": True, "a1": a1_notation, "newValue": "0"})
 # --- End Ban Cell Endpoint ---
 
+# --- Write-Behind Queue ---
+class WriteBehindQueue:
+    """Durable queue of cell writes, flushed to the Sheets API by a background thread.
+
+    A write is stored in SQLite before it is acknowledged, so pending writes survive a
+    restart. Every flush sends at most one values.batchUpdate (cell values) and one
+    spreadsheets.batchUpdate (notes) per spreadsheet, with repeated writes to a cell
+    collapsed to the latest. Failed flushes are retried with backoff; after max_attempts
+    the writes are marked failed.
+
+    Until a fetch is known to include them, writes are also kept per sheet in memory, so
+    snapshots fetched in the meantime can be patched with them (pending_writes) instead of
+    reverting the cells to what the Sheets API still holds.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS mutations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            spreadsheet_id TEXT NOT NULL,
+            kind TEXT NOT NULL,                       -- 'value' or 'note'
+            a1 TEXT NOT NULL,
+            payload TEXT NOT NULL,                    -- the cell value or note text
+            status TEXT NOT NULL DEFAULT 'pending',   -- pending, committed or failed
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at REAL NOT NULL,
+            finished_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS mutations_by_status ON mutations (status, next_attempt_at);
+    """
+
+    def __init__(self, path=WRITE_BEHIND_DB_PATH, flush_interval=WRITE_BEHIND_FLUSH_MS / 1000.0,
+                 max_attempts=WRITE_BEHIND_MAX_ATTEMPTS, retention=WRITE_BEHIND_RETENTION_SECONDS):
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self._lock = threading.Lock() # Serializes use of the shared connection
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=FULL') # An acknowledged write must survive a crash
+        self._conn.executescript(self.SCHEMA)
+        self._overlay = {} # (spreadsheet_id, sheet_name) -> {(kind, a1): [mutation_id, payload, flushed_generation, flushed_at]}
+        for mutation_id, spreadsheet_id, kind, a1_notation, payload in self._conn.execute(
+                "SELECT id, spreadsheet_id, kind, a1, payload FROM mutations WHERE status = 'pending' ORDER BY id"):
+            self._track(mutation_id, spreadsheet_id, kind, a1_notation, payload)
+        self._stop = threading.Event()
+        self._counters = {
+            'enqueued': 0,
+            'flushes': 0,
+            'committed': 0,
+            'retries': 0,
+            'failed': 0,
+        }
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        pending = self.summary()['pending']
+        logging.info(f"Write-behind queue at {path} started ({pending} pending writes).")
+
+    def enqueue(self, spreadsheet_id, kind, a1_notation, payload):
+        """Durably queues one write and returns its mutation id."""
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO mutations (spreadsheet_id, kind, a1, payload, created_at) VALUES (?, ?, ?, ?, ?)',
+                (spreadsheet_id, kind, a1_notation, payload, time.time()))
+            self._counters['enqueued'] += 1
+            self._track(cursor.lastrowid, spreadsheet_id, kind, a1_notation, payload)
+            return cursor.lastrowid
+
+    def _track(self, mutation_id, spreadsheet_id, kind, a1_notation, payload):
+        try:
+            sheet_name, _, _ = parse_a1_notation(a1_notation)
+        except ValueError:
+            return # Not a single cell; nothing to patch snapshots with
+        self._overlay.setdefault((spreadsheet_id, sheet_name), {})[(kind, a1_notation)] = [mutation_id, payload, None, None]
+
+    def pending_writes(self, key, generation):
+        """[(kind, a1, payload)] for the writes to sheet key that a fetch begun at snapshot cache
+        generation `generation` may have missed: those still queued, and those flushed after the
+        fetch began. Writes flushed before that are forgotten, since the fetch saw them."""
+        with self._lock:
+            entries = self._overlay.get(key)
+            if not entries:
+                return []
+            for entry_key in [k for k, entry in entries.items() if entry[2] is not None and entry[2] <= generation]:
+                del entries[entry_key]
+            if not entries:
+                del self._overlay[key]
+            return [(kind, a1_notation, entry[1]) for (kind, a1_notation), entry in entries.items()]
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Write-behind flush failed: {e}", exc_info=True)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def flush(self):
+        """Sends every pending write that is due, grouped by spreadsheet."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, spreadsheet_id, kind, a1, payload, attempts FROM mutations "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id", (now,)).fetchall()
+            self._conn.execute("DELETE FROM mutations WHERE status != 'pending' AND finished_at < ?",
+                               (now - self.retention,))
+            for key, entries in list(self._overlay.items()):
+                # No fetch takes this long, so whatever reads the sheet next sees these writes upstream
+                for entry_key in [k for k, entry in entries.items() if entry[3] is not None and entry[3] < now - self.retention]:
+                    del entries[entry_key]
+                if not entries:
+                    del self._overlay[key]
+        if not rows:
+            return
+        by_spreadsheet = collections.defaultdict(lambda: {'value': [], 'note': []})
+        for row in rows:
+            by_spreadsheet[row[1]][row[2]].append(row)
+        service = sheets_provider.get_service()
+        for spreadsheet_id, batches in by_spreadsheet.items():
+            for kind, batch in batches.items():
+                if not batch:
+                    continue
+                if not service:
+                    self._retry_later(batch, "Server authentication error.")
+                    continue
+                self._send(service, spreadsheet_id, kind, batch)
+
+    def _send(self, service, spreadsheet_id, kind, batch):
+        latest = {} # a1 -> (mutation_id, payload); later writes to a cell win
+        for mutation_id, _, _, a1_notation, payload, _ in batch:
+            latest[a1_notation] = (mutation_id, payload)
+        with self._lock:
+            self._counters['flushes'] += 1
+        try:
+            if kind == 'value':
+                data = [{'range': a1_notation, 'values': [[payload]]} for a1_notation, (_, payload) in latest.items()]
+                sheets_scheduler.execute(service.spreadsheets().values().batchUpdate(
+                    spreadsheetId=spreadsheet_id,
+                    body={'valueInputOption': 'USER_ENTERED', 'data': data}))
+            else:
+                requests_body = []
+                for a1_notation, (_, note_text) in latest.items():
+                    sheet_name, row_index, col_index = parse_a1_notation(a1_notation)
+                    sheet_id = get_sheet_id(service, spreadsheet_id, sheet_name)
+                    requests_body.append(note_update_request(sheet_id, row_index, col_index, note_text))
+                sheets_scheduler.execute(service.spreadsheets().batchUpdate(
+                    spreadsheetId=spreadsheet_id, body={'requests': requests_body}))
+        except (HttpError, ValueError) as e:
+            retryable = isinstance(e, HttpError) and e.resp.status in SheetsApiScheduler.RETRYABLE_STATUSES
+            error_msg = f"API Error ({e.resp.status})" if isinstance(e, HttpError) else f"Error: {e}"
+            if retryable:
+                self._retry_later(batch, error_msg)
+            elif len(latest) > 1:
+                # One bad cell fails the whole batch; send cells one at a time to single it out
+                for a1_notation in latest:
+                    self._send(service, spreadsheet_id, kind, [m for m in batch if m[3] == a1_notation])
+            else:
+                logging.error(f"Write-behind {kind} write to {spreadsheet_id} failed: {e}")
+                self._finish(batch, 'failed', error_msg)
+            return
+        except Exception as e:
+            logging.error(f"Unexpected error flushing writes to {spreadsheet_id}: {e}", exc_info=True)
+            self._retry_later(batch, "Unexpected server error.")
+            return
+        logging.log(REQUEST_LOG_LEVEL, f"Flushed {len(batch)} queued {kind} writes ({len(latest)} cells) to {spreadsheet_id}")
+        self._finish(batch, 'committed', None)
+
+    def _retry_later(self, batch, error_msg):
+        now = time.time()
+        exhausted = [m for m in batch if m[5] + 1 >= self.max_attempts]
+        with self._lock:
+            for mutation_id, _, _, _, _, attempts in batch:
+                delay = random.uniform(0.5, 1.0) * min(60.0, self.flush_interval * (2 ** (attempts + 1)))
+                self._conn.execute('UPDATE mutations SET attempts = ?, next_attempt_at = ?, error = ? WHERE id = ?',
+                                   (attempts + 1, now + delay, error_msg, mutation_id))
+            self._counters['retries'] += len(batch) - len(exhausted)
+        if exhausted:
+            self._finish(exhausted, 'failed', error_msg)
+
+    def _finish(self, batch, status, error_msg):
+        sheet_keys = {}
+        for mutation_id, spreadsheet_id, kind, a1_notation, _, _ in batch:
+            with contextlib.suppress(ValueError):
+                sheet_keys[mutation_id] = (spreadsheet_id, parse_a1_notation(a1_notation)[0])
+        # Fetches already running may have read the sheet before this flush reached it
+        generations = {key: snapshot_cache.bump_generation(key) for key in set(sheet_keys.values())}
+        with self._lock:
+            self._conn.executemany(
+                'UPDATE mutations SET status = ?, error = ?, finished_at = ? WHERE id = ?',
+                [(status, error_msg, time.time(), m[0]) for m in batch])
+            self._counters[status] += len(batch)
+            for mutation_id, _, kind, a1_notation, _, _ in batch:
+                entries = self._overlay.get(sheet_keys.get(mutation_id), {})
+                entry = entries.get((kind, a1_notation))
+                if entry is None or entry[0] != mutation_id:
+                    continue # Superseded by a later write to the cell
+                if status == 'committed':
+                    entry[2], entry[3] = generations[sheet_keys[mutation_id]], time.time()
+                else:
+                    del entries[(kind, a1_notation)]
+        if status == 'failed':
+            # The cached snapshots were updated optimistically; let them be refetched
+            for spreadsheet_id in {m[1] for m in batch}:
+                invalidate_spreadsheet_caches(spreadsheet_id)
+
+    def status(self, mutation_ids):
+        """Returns {id, status, attempts, error} for each known id."""
+        if not mutation_ids:
+            return []
+        placeholders = ','.join('?' * len(mutation_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT id, status, attempts, error FROM mutations WHERE id IN ({placeholders}) ORDER BY id',
+                list(mutation_ids)).fetchall()
+        return [{"id": r[0], "status": r[1], "attempts": r[2], "error": r[3]} for r in rows]
+
+    def summary(self):
+        with self._lock:
+            counts = dict(self._conn.execute('SELECT status, COUNT(*) FROM mutations GROUP BY status').fetchall())
+            oldest = self._conn.execute("SELECT MIN(created_at) FROM mutations WHERE status = 'pending'").fetchone()[0]
+            stats = dict(self._counters)
+            stats['overlay_cells'] = sum(len(entries) for entries in self._overlay.values())
+        stats.update({
+            'pending': counts.get('pending', 0),
+            'failed_retained': counts.get('failed', 0),
+            'oldest_pending_age_seconds': round(time.time() - oldest, 3) if oldest is not None else None,
+        })
+        return stats
+
+
+def note_update_request(sheet_id, row_index, col_index, note_text):
+    """updateCells request setting (or clearing, for empty text) the note on one cell."""
+    return {
+        'updateCells': {
+            'rows': [{'values': [{'note': note_text if note_text else None}]}],
+            'fields': 'note',
+            'range': {
+                'sheetId': sheet_id,
+                'startRowIndex': row_index,
+                'endRowIndex': row_index + 1,
+                'startColumnIndex': col_index,
+                'endColumnIndex': col_index + 1
+            }
+        }
+    }
+
+
+write_queue = None
+if WRITE_BEHIND_ENABLED:
+    try:
+        write_queue = WriteBehindQueue()
+    except sqlite3.Error as e:
+        logging.error(f"Could not open write-behind queue at {WRITE_BEHIND_DB_PATH}, writing synchronously: {e}")
+
+
+@app.route('/write-status')
+def write_status_route():
+    """Reports queued writes: ?ids=1,2,3 gives the status of those mutations."""
+    if write_queue is None:
+        return jsonify({"enabled": False, "mutations": []})
+    try:
+        mutation_ids = [int(part) for part in request.args.get('ids', '').split(',') if part.strip()]
+    except ValueError:
+        return jsonify({"error": "ids must be a comma-separated list of mutation ids."}), 400
+    return jsonify({"enabled": True, "mutations": write_queue.status(mutation_ids), **write_queue.summary()})
+# --- End Write-Behind Queue ---
+
+# --- Multi-Sheet Batch Load ---
+BATCH_LOAD_FIELDS = 'sheets(properties(title),data(startRow,rowData(values(formattedValue,note))))'
+
+
+def group_sheets_for_batch(sheet_limits, max_rows=BATCH_LOAD_MAX_ROWS):
+    """Packs (sheet_name, row_limit) pairs, in order, into groups of at most max_rows total rows.
+
+    Returns (groups, oversized): sheets larger than max_rows on their own are left out of the
+    groups so they can be loaded in chunks instead.
+    """
+    groups, oversized = [], []
+    group_rows = 0
+    for sheet_name, row_limit in sheet_limits:
+        if row_limit > max_rows:
+            oversized.append(sheet_name)
+            continue
+        if not groups or group_rows + row_limit > max_rows:
+            groups.append([])
+            group_rows = 0
+        groups[-1].append((sheet_name, row_limit))
+        group_rows += row_limit
+    return groups, oversized
+
+
+_batch_load_executor = concurrent.futures.ThreadPoolExecutor(max_workers=BATCH_LOAD_PARALLELISM, thread_name_prefix='sheets-batch-load')
+
+
+def fetch_sheet_group(spreadsheet_id, group):
+    """Fetches the sheets in group (a list of (sheet_name, row_limit)) with one spreadsheets.get,
+    one range per sheet, and returns {sheet_name: GridData list}, unparsed."""
+    service = sheets_provider.get_service()
+    if not service:
+        raise RuntimeError("Server authentication error.")
+    ranges = [f"{sheet_name}!{DEFAULT_START_COLUMN_LETTER}1:{DEFAULT_END_COLUMN_LETTER}{row_limit}"
+              for sheet_name, row_limit in group]
+    logging.log(REQUEST_LOG_LEVEL, f"Fetching {len(ranges)} sheets of {spreadsheet_id} in one request")
+    result = sheets_scheduler.execute(service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        ranges=ranges,
+        fields=BATCH_LOAD_FIELDS,
+        includeGridData=True
+    ))
+    return {sheet.get('properties', {}).get('title'): sheet.get('data', []) for sheet in result.get('sheets', [])}
+
+
+def parse_sheet_grid(sheet_name, grid_data):
+    """Builds a SheetSnapshot from one sheet's GridData list, as fetch_sheet_group returns it."""
+    notes = {}
+    sheet_rows = list(iter_grid_rows([grid_data], sheet_name, notes))
+    max_cols = max(map(len, sheet_rows), default=0)
+    header, all_rows_values, data_row_sheet_indices = split_sheet_rows(sheet_rows, max_cols)
+    return SheetSnapshot(header, all_rows_values, notes, data_row_sheet_indices)
+
+
+@app.route('/load-sheets')
+def load_sheets_route():
+    """Loads several sheets of one spreadsheet at once: ?id=...&sheet=A&sheet=B (all sheets if
+    no sheet is given). Uncached sheets are fetched together, BATCH_LOAD_MAX_ROWS rows per
+    spreadsheets.get, and every loaded sheet goes into the snapshot cache.
+
+    The response is {"sheets": {name: <load-data payload>}, "errors": {name: message}}; with
+    warm=1 each sheet only reports its row_count, for clients that just want the cache filled.
+    """
+    spreadsheet_id = request.args.get('id')
+    requested_sheets = list(dict.fromkeys(request.args.getlist('sheet'))) # ?sheet=A&sheet=A loads A once
+    warm_only = request.args.get('warm') in ('1', 'true')
+    force_refresh = request.args.get('refresh') in ('1', 'true')
+    logging.log(REQUEST_LOG_LEVEL, f"Request: /load-sheets | ID: '{spreadsheet_id}', Sheets: {requested_sheets or 'all'}, Warm: {warm_only}")
+    if not spreadsheet_id:
+        return jsonify({"error": "Missing required parameter (id)."}), 400
+
+    service = sheets_provider.get_service()
+    if not service:
+        return jsonify({"error": "Server authentication error."}), 500
+
+    snapshots, errors, to_fetch = {}, {}, []
+    try:
+        sheet_names = requested_sheets or list(metadata_cache.get_sheets(service, spreadsheet_id, force_refresh=force_refresh))
+        for sheet_name in sheet_names:
+            snapshot = None if force_refresh else snapshot_cache.get((spreadsheet_id, sheet_name))
+            if snapshot is not None:
+                snapshots[sheet_name] = snapshot
+                continue
+            try:
+                to_fetch.append((sheet_name, get_sheet_row_limit(service, spreadsheet_id, sheet_name)))
+            except ValueError as e:
+                errors[sheet_name] = f"Error: {e}"
+    except HttpError as err:
+        logging.error(f"API error getting sheet metadata: {err}", exc_info=True)
+        return jsonify({"error": f"API Error ({err.resp.status}): Could not get sheet names. Check permissions and Sheet ID."}), 500
+
+    groups, oversized = group_sheets_for_batch(to_fetch)
+    generations = {sheet_name: snapshot_cache.generation((spreadsheet_id, sheet_name)) for sheet_name, _ in to_fetch}
+    # Groups are fetched on the batch-load pool; oversized sheets load in chunks on the fetch pool meanwhile
+    futures = {_batch_load_executor.submit(fetch_sheet_group, spreadsheet_id, group): group for group in groups}
+    for sheet_name in oversized:
+        snapshot, error_msg = get_sheet_snapshot(spreadsheet_id, sheet_name, force_refresh=force_refresh)
+        if error_msg:
+            errors[sheet_name] = error_msg
+        else:
+            snapshots[sheet_name] = snapshot
+    for future in concurrent.futures.as_completed(futures):
+        group = futures[future]
+        try:
+            fetched = future.result()
+        except HttpError as err:
+            logging.error(f"API error batch-loading sheets: {err}", exc_info=True)
+            for sheet_name, _ in group:
+                errors[sheet_name] = f"API Error ({err.resp.status}): Could not get sheet data. Check permissions, Sheet ID, and Sheet Name."
+            continue
+        except Exception as e:
+            logging.error(f"Unexpected error batch-loading sheets: {e}", exc_info=True)
+            for sheet_name, _ in group:
+                errors[sheet_name] = "Unexpected server error getting sheet data."
+            continue
+        # Parsed here as each group arrives, one tab at a time, while the pool fetches the rest;
+        # each tab is cached as soon as it is parsed and its GridData dropped
+        for sheet_name, _ in group:
+            grid_data = fetched.pop(sheet_name, None)
+            snapshot = parse_sheet_grid(sheet_name, grid_data) if grid_data else SheetSnapshot([], [], {}, [])
+            snapshot = with_pending_writes((spreadsheet_id, sheet_name), snapshot, generations[sheet_name])
+            snapshot_cache.put((spreadsheet_id, sheet_name), snapshot, generations[sheet_name])
+            snapshots[sheet_name] = snapshot
+
+    logging.log(REQUEST_LOG_LEVEL, f"Loaded {len(snapshots)} sheets ({len(to_fetch)} fetched) for ID: {spreadsheet_id}, {len(errors)} errors")
+    if warm_only:
+        sheets_payload = {sheet_name: {"row_count": len(snapshot.rows)} for sheet_name, snapshot in snapshots.items()}
+    else:
+        sheets_payload = {sheet_name: {"header": snapshot.header, "rows": snapshot.rows, "notes": snapshot.notes,
+                                       "data_row_sheet_indices": snapshot.data_row_sheet_indices,
+                                       "reviewers": snapshot.reviewers()}
+                          for sheet_name, snapshot in snapshots.items()}
+    return jsonify({"sheets": sheets_payload, "errors": errors})
+# --- End Multi-Sheet Batch Load ---
+
+# --- Server-Sent Events ---
+def diff_snapshot_cells(previous, snapshot, max_events=EVENTS_MAX_CELL_EVENTS):
+    """Cell changes between two snapshots of a sheet as [{"row", "col", "value"}] and [{"a1", "note"}].
+
+    None when rows were added or removed, the header changed, or there are more than max_events.
+    """
+    if len(previous.rows) != len(snapshot.rows):
+        return None
+    changes = snapshot.changes_since(previous.fingerprint())
+    if changes is None:
+        return None
+    events = []
+    for position in changes[0]:
+        sheet_row_num = snapshot.data_row_sheet_indices[position]
+        old_row, new_row = previous.rows[position], snapshot.rows[position]
+        for col_index in range(max(len(old_row), len(new_row))):
+            old_value = old_row[col_index] if col_index < len(old_row) else ''
+            new_value = new_row[col_index] if col_index < len(new_row) else ''
+            if old_value != new_value:
+                events.append({"row": sheet_row_num, "col": col_index, "value": new_value})
+        old_notes = dict(previous.notes_for_row(sheet_row_num))
+        new_notes = dict(snapshot.notes_for_row(sheet_row_num))
+        for a1_notation in old_notes.keys() | new_notes.keys():
+            if old_notes.get(a1_notation) != new_notes.get(a1_notation):
+                events.append({"a1": a1_notation, "note": new_notes.get(a1_notation, '')})
+        if len(events) > max_events:
+            return None
+    return events
+
+
+class EventHub:
+    """Fans sheet changes out to /events subscribers.
+
+    Events go into one ring buffer with increasing ids, so a client that reconnects with
+    Last-Event-ID gets what it missed (or a 'reload' event if that has left the buffer).
+    Streams are normally served by EventStreamServer; stream() is the fallback for when it
+    isn't running. waitress serves a streaming response on a worker thread for as long as it
+    stays open, so there at most max_held_streams streams wait for new events (up to
+    hold_seconds each); any other client gets its backlog immediately and reconnects after
+    retry_ms.
+    """
+
+    SUBSCRIBER_TTL_SECONDS = 120 # A sheet is watched while a client connected this recently
+
+    def __init__(self, buffer_size=EVENTS_BUFFER_SIZE, max_held_streams=EVENTS_MAX_HELD_STREAMS,
+                 hold_seconds=EVENTS_HOLD_SECONDS, retry_ms=EVENTS_RETRY_MS):
+        self.max_held_streams = max_held_streams
+        self.hold_seconds = hold_seconds
+        self.retry_ms = retry_ms
+        self._cond = threading.Condition()
+        self._events = collections.deque(maxlen=buffer_size) # (event_id, key, event_name, data)
+        self._last_event_id = 0
+        self._watched = {} # key -> monotonic time a client last connected
+        self._last_snapshots = {} # key -> latest snapshot seen for a watched sheet, to diff refreshes against
+        self._held_streams = 0
+        self.listeners = [] # listener() after an event is published
+        self._counters = {'published': 0, 'connections': 0, 'held_connections': 0, 'resets': 0}
+
+    def _is_watched(self, key):
+        seen = self._watched.get(key)
+        return seen is not None and time.monotonic() - seen <= self.SUBSCRIBER_TTL_SECONDS
+
+    def publish(self, key, event_name, data):
+        with self._cond:
+            if not self._is_watched(key):
+                return
+            self._last_event_id += 1
+            self._events.append((self._last_event_id, key, event_name, data))
+            self._counters['published'] += 1
+            self._cond.notify_all()
+        for listener in self.listeners:
+            listener()
+
+    def publish_cells(self, key, cells, source):
+        for cell in cells:
+            self.publish(key, 'cell', dict(cell, source=source))
+
+    def publish_reload(self, spreadsheet_id, sheet_name=None):
+        with self._cond:
+            keys = [key for key in self._watched if key[0] == spreadsheet_id and sheet_name in (None, key[1])]
+        for key in keys:
+            self.publish(key, 'reload', {"reason": "changed"})
+
+    def snapshot_stored(self, key, snapshot, is_write):
+        """SnapshotCache listener: turns freshly fetched data into cell events for watched sheets."""
+        if snapshot is None:
+            return # Dropped after a write; the write published its own events
+        with self._cond:
+            if not self._is_watched(key):
+                self._watched.pop(key, None)
+                self._last_snapshots.pop(key, None)
+                return
+            previous = self._last_snapshots.get(key)
+            self._last_snapshots[key] = snapshot
+        if is_write or previous is None or previous is snapshot:
+            return # Writes publish their own events
+        cells = diff_snapshot_cells(previous, snapshot)
+        if cells is None:
+            self.publish(key, 'reload', {"reason": "upstream"})
+            return
+        for cell in cells:
+            if 'row' in cell:
+                cell = {"a1": f"{key[1]}!{get_col_letter(cell['col'])}{cell['row']}", "value": cell['value']}
+            self.publish(key, 'cell', dict(cell, source='upstream'))
+
+    def connect(self, key):
+        """Registers a new client of key's events; the sheet counts as watched from now on."""
+        with self._cond:
+            self._watched[key] = time.monotonic()
+            self._counters['connections'] += 1
+        if key not in self._last_snapshots:
+            snapshot = snapshot_cache.get(key)
+            if snapshot is not None:
+                with self._cond:
+                    self._last_snapshots.setdefault(key, snapshot)
+
+    def touch(self, key):
+        """Keeps key watched while a client stays connected."""
+        with self._cond:
+            self._watched[key] = time.monotonic()
+
+    def _pending(self, key, last_event_id):
+        """Returns (events for key after last_event_id, id to resume from); needs self._cond held."""
+        if last_event_id is None:
+            return [(self._last_event_id, 'ready', {})], self._last_event_id # New client: only future events
+        oldest_id = self._events[0][0] if self._events else self._last_event_id + 1
+        if last_event_id > self._last_event_id or last_event_id < oldest_id - 1:
+            # Server restarted or the client fell too far behind: it must reload
+            self._counters['resets'] += 1
+            return [(self._last_event_id, 'reload', {"reason": "resync"})], self._last_event_id
+        # Ids are consecutive, so the unseen events are the buffer's tail
+        pending = [(event_id, event_name, data) for event_id, event_key, event_name, data
+                   in itertools.islice(self._events, last_event_id + 1 - oldest_id, None) if event_key == key]
+        return pending, self._last_event_id
+
+    def pending(self, key, last_event_id):
+        with self._cond:
+            return self._pending(key, last_event_id)
+
+    def format(self, event_id, event_name, data):
+        return f"id: {event_id}\nevent: {event_name}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+    def stream(self, key, last_event_id):
+        """Generates the text/event-stream body for one connection served on a worker thread."""
+        self.connect(key)
+        with self._cond:
+            held = self._held_streams < self.max_held_streams
+            if held:
+                self._held_streams += 1
+                self._counters['held_connections'] += 1
+        try:
+            # Held clients reconnect right away when the hold ends; others poll at retry_ms
+            yield f"retry: {250 if held else self.retry_ms}\n\n"
+            deadline = time.monotonic() + (self.hold_seconds if held else 0)
+            while True:
+                with self._cond:
+                    pending, last_event_id = self._pending(key, last_event_id)
+                    remaining = deadline - time.monotonic()
+                    if not pending and remaining > 0:
+                        self._cond.wait(min(remaining, 15))
+                        self._watched[key] = time.monotonic()
+                        pending, last_event_id = self._pending(key, last_event_id)
+                        remaining = deadline - time.monotonic()
+                if pending:
+                    yield ''.join(self.format(*event) for event in pending)
+                elif remaining > 0:
+                    yield ': keepalive\n\n'
+                if remaining <= 0:
+                    yield f"id: {last_event_id}\n\n" # Resume point for the reconnect
+                    return
+        finally:
+            if held:
+                with self._cond:
+                    self._held_streams -= 1
+
+    def stats(self):
+        with self._cond:
+            return dict(self._counters, held_streams=self._held_streams, buffered_events=len(self._events),
+                        watched_sheets=sum(1 for key in self._watched if self._is_watched(key)))
+
+
+event_hub = EventHub()
+snapshot_cache.listeners.append(event_hub.snapshot_stored)
+
+
+def parse_last_event_id(value):
+    """Last-Event-ID header or last_event_id parameter -> int, or None if missing or garbled."""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+class _EventStreamConnection:
+    __slots__ = ('sock', 'received', 'outbox', 'writing', 'closing', 'closed', 'key', 'last_event_id')
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.received = b''
+        self.outbox = bytearray()
+        self.writing = False # Registered for EVENT_WRITE because the outbox didn't fit the socket
+        self.closing = False # Close once the outbox is sent
+        self.closed = False
+        self.key = None # (spreadsheet_id, sheet_name) once the request is parsed
+        self.last_event_id = None
+
+
+class EventStreamServer:
+    """Serves /events streams for an EventHub from one selector thread, so open streams don't
+    each hold a waitress worker thread.
+
+    Speaks just enough HTTP/1.1 for EventSource: GET .../events?id=...&sheet=... (resuming from
+    a Last-Event-ID header or last_event_id parameter) gets a text/event-stream response that
+    stays open, and the hub's events for that sheet are written to it as they are published.
+    Sockets are non-blocking; a client that lets more than max_buffered_bytes pile up is
+    disconnected and catches up when it reconnects.
+    """
+
+    KEEPALIVE_SECONDS = 15
+    MAX_REQUEST_BYTES = 16384
+    RETRY_MS = 1000 # Reconnect delay after a dropped connection
+
+    def __init__(self, hub, host='0.0.0.0', port=EVENTS_PORT, max_connections=EVENTS_MAX_CONNECTIONS,
+                 max_buffered_bytes=EVENTS_MAX_BUFFERED_BYTES):
+        self.hub = hub
+        self.max_connections = max_connections
+        self.max_buffered_bytes = max_buffered_bytes
+        self._listener = socket.create_server((host, port), backlog=128)
+        self._listener.setblocking(False)
+        self.port = self._listener.getsockname()[1]
+        self._waker, self._wake_sender = socket.socketpair()
+        self._waker.setblocking(False)
+        self._wake_sender.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ, 'accept')
+        self._selector.register(self._waker, selectors.EVENT_READ, 'wake')
+        self._connections = {} # socket -> _EventStreamConnection
+        self._stopping = False
+        self._counters = {'connections': 0, 'rejected': 0, 'dropped_slow': 0}
+        self._thread = threading.Thread(target=self._run, name='events-server', daemon=True)
+
+    def start(self):
+        self.hub.listeners.append(self.wake)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping = True
+        self.wake()
+        self._thread.join(timeout=5)
+        if self.wake in self.hub.listeners:
+            self.hub.listeners.remove(self.wake)
+
+    def wake(self):
+        """Hub listener: has the selector thread send newly published events."""
+        try:
+            self._wake_sender.send(b'\0')
+        except OSError:
+            pass # A wakeup is already pending (buffer full), or the server stopped
+
+    def _run(self):
+        next_keepalive = time.monotonic() + self.KEEPALIVE_SECONDS
+        try:
+            while not self._stopping:
+                for selector_key, mask in self._selector.select(max(0.0, next_keepalive - time.monotonic())):
+                    if selector_key.data == 'accept':
+                        self._accept()
+                    elif selector_key.data == 'wake':
+                        self._drain_wakeups()
+                        self._send_events()
+                    else:
+                        connection = selector_key.data
+                        if mask & selectors.EVENT_READ:
+                            self._read(connection)
+                        if mask & selectors.EVENT_WRITE and not connection.closed:
+                            self._flush(connection)
+                if time.monotonic() >= next_keepalive:
+                    self._send_keepalives()
+                    next_keepalive = time.monotonic() + self.KEEPALIVE_SECONDS
+        except Exception:
+            logging.exception("/events stream server stopped")
+        finally:
+            for connection in list(self._connections.values()):
+                self._close(connection)
+            self._selector.close()
+            self._listener.close()
+            self._waker.close()
+            self._wake_sender.close()
+
+    def _drain_wakeups(self):
+        try:
+            while self._waker.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+            except BlockingIOError:
+                return
+            except OSError as e:
+                logging.warning(f"/events stream server could not accept a connection: {e}") # e.g. out of file descriptors
+                return
+            sock.setblocking(False)
+            connection = _EventStreamConnection(sock)
+            self._connections[sock] = connection
+            self._selector.register(sock, selectors.EVENT_READ, connection)
+            if len(self._connections) > self.max_connections:
+                self._counters['rejected'] += 1
+                # Past the limit the page's EventSource keeps retrying, and its delta poll covers the gap
+                self._respond(connection, '503 Service Unavailable', {"error": "Too many event streams."})
+
+    def _read(self, connection):
+        try:
+            data = connection.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._close(connection)
+            return
+        if connection.key is not None or connection.closing:
+            return # Anything sent after the request is ignored
+        connection.received += data
+        head, separator, _ = connection.received.partition(b'\r\n\r\n')
+        if separator:
+            self._handle_request(connection, head.decode('latin-1'))
+        elif len(connection.received) > self.MAX_REQUEST_BYTES:
+            self._respond(connection, '431 Request Header Fields Too Large', {"error": "Request too large."})
+
+    def _handle_request(self, connection, head):
+        request_line, *header_lines = head.split('\r\n')
+        parts = request_line.split(' ')
+        if len(parts) != 3:
+            return self._respond(connection, '400 Bad Request', {"error": "Malformed request."})
+        method, target, _ = parts
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        url = urllib.parse.urlsplit(target)
+        if not url.path.endswith('/events'):
+            return self._respond(connection, '404 Not Found', {"error": "Not found."})
+        if method == 'OPTIONS':
+            return self._respond(connection, '204 No Content', None)
+        if method != 'GET':
+            return self._respond(connection, '405 Method Not Allowed', {"error": "Use GET."})
+        query = urllib.parse.parse_qs(url.query)
+        spreadsheet_id = query.get('id', [''])[0]
+        sheet_name = query.get('sheet', [''])[0]
+        if not spreadsheet_id or not sheet_name:
+            return self._respond(connection, '400 Bad Request', {"error": "Missing required parameters (id, sheet)."})
+        connection.key = (spreadsheet_id, sheet_name)
+        self._counters['connections'] += 1
+        self.hub.connect(connection.key)
+        pending, connection.last_event_id = self.hub.pending(
+            connection.key, parse_last_event_id(headers.get('last-event-id') or query.get('last_event_id', [''])[0]))
+        self._send(connection, 'HTTP/1.1 200 OK\r\n'
+                               'Content-Type: text/event-stream; charset=utf-8\r\n'
+                               'Cache-Control: no-cache\r\n'
+                               'Access-Control-Allow-Origin: *\r\n'
+                               'X-Accel-Buffering: no\r\n'
+                               'Connection: close\r\n\r\n'
+                               f'retry: {self.RETRY_MS}\n\n' + ''.join(self.hub.format(*event) for event in pending))
+
+    def _respond(self, connection, status, payload):
+        """Sends a complete response and closes the connection once it's written."""
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        head = (f'HTTP/1.1 {status}\r\n'
+                'Content-Type: application/json\r\n'
+                'Access-Control-Allow-Origin: *\r\n'
+                'Access-Control-Allow-Methods: GET\r\n'
+                'Access-Control-Allow-Headers: Last-Event-ID\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                'Connection: close\r\n\r\n')
+        connection.closing = True
+        self._send(connection, head, body)
+
+    def _send_events(self):
+        for connection in list(self._connections.values()):
+            if connection.key is None or connection.closed:
+                continue
+            pending, connection.last_event_id = self.hub.pending(connection.key, connection.last_event_id)
+            if pending:
+                self._send(connection, ''.join(self.hub.format(*event) for event in pending))
+
+    def _send_keepalives(self):
+        for key in {connection.key for connection in self._connections.values() if connection.key is not None}:
+            self.hub.touch(key)
+        for connection in list(self._connections.values()):
+            if connection.key is not None and not connection.closed:
+                self._send(connection, ': keepalive\n\n')
+
+    def _send(self, connection, text, body=b''):
+        if connection.closed:
+            return
+        connection.outbox += text.encode('utf-8') + body
+        if len(connection.outbox) > self.max_buffered_bytes:
+            self._counters['dropped_slow'] += 1
+            self._close(connection)
+            return
+        self._flush(connection)
+
+    def _flush(self, connection):
+        try:
+            sent = connection.sock.send(connection.outbox)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._close(connection)
+            return
+        del connection.outbox[:sent]
+        if not connection.outbox and connection.closing:
+            self._close(connection)
+            return
+        writing = bool(connection.outbox)
+        if writing != connection.writing:
+            connection.writing = writing
+            self._selector.modify(connection.sock, selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0), connection)
+
+    def _close(self, connection):
+        if connection.closed:
+            return
+        connection.closed = True
+        self._connections.pop(connection.sock, None)
+        self._selector.unregister(connection.sock)
+        connection.sock.close()
+
+    def stats(self):
+        connections = list(self._connections.values())
+        return dict(self._counters, port=self.port,
+                    open_streams=sum(1 for connection in connections if connection.key is not None))
+
+
+event_server = None # EventStreamServer, started when run directly (see __main__)
+
+
+def events_server_url():
+    """Where clients reach event_server: EVENTS_PUBLIC_URL, or its port on the host they used for this request."""
+    if EVENTS_PUBLIC_URL:
+        return EVENTS_PUBLIC_URL
+    host = urllib.parse.urlsplit(request.host_url).hostname
+    if ':' in host:
+        host = f'[{host}]' # IPv6 literal
+    return f"{request.scheme}://{host}:{event_server.port}/events"
+
+
+@app.route('/events')
+def events_route():
+    """Server-Sent Events for one sheet: 'cell' events ({"a1", "value"|"note", "source"}) for
+    writes made through this server and for upstream changes seen when the sheet is refetched,
+    and 'reload' events when the change is too big to describe cell by cell.
+
+    With the stream server running this only redirects there (EventSource follows redirects),
+    carrying Last-Event-ID over as last_event_id so a reconnecting client resumes."""
+    spreadsheet_id = request.args.get('id')
+    sheet_name = request.args.get('sheet')
+    if not spreadsheet_id or not sheet_name:
+        return jsonify({"error": "Missing required parameters (id, sheet)."}), 400
+    last_event_id = parse_last_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    if event_server is not None:
+        query = {"id": spreadsheet_id, "sheet": sheet_name}
+        if last_event_id is not None:
+            query["last_event_id"] = last_event_id
+        response = redirect(f"{events_server_url()}?{urllib.parse.urlencode(query)}", code=307)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    response = Response(event_hub.stream((spreadsheet_id, sheet_name), last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Don't let proxies buffer the stream
+    return response
+# --- End Server-Sent Events ---
+
+# --- Stats Endpoint ---
+@app.route('/stats')
+def stats_route():
+    """Returns internal cache/counter statistics for monitoring."""
+    return jsonify({"service_provider": sheets_provider.stats(), "scheduler": sheets_scheduler.stats(),
+                    "snapshot_cache": snapshot_cache.stats(), "metadata_cache": metadata_cache.stats(),
+                    "window_cache": window_cache.stats(),
+                    "write_queue": write_queue.summary() if write_queue is not None else None,
+                    "events": event_hub.stats(),
+                    "events_server": event_server.stats() if event_server is not None else None,
+                    "snapshot_store": snapshot_store.stats() if snapshot_store is not None else None,
+                    "startup": _startup_timings})
+
+
+@app.route('/metrics')
+def metrics_route():
+    """Prometheus text format: latency histograms per route and Sheets API method, response
+    sizes, responses by status, parse throughput, and cache/queue gauges."""
+    snapshot_stats = snapshot_cache.stats()
+    scheduler_stats = sheets_scheduler.stats()
+    event_stats = event_hub.stats()
+    gauges = {
+        'sheet_editor_snapshot_cache_entries': ('Snapshots in the in-process cache.', snapshot_stats['entries']),
+        'sheet_editor_snapshot_cache_bytes': ('Estimated size of cached snapshots.', snapshot_stats['bytes']),
+        'sheet_editor_metadata_cache_entries': ('Spreadsheets with cached sheet metadata.', metadata_cache.stats()['entries']),
+        'sheet_editor_sheets_api_inflight': ('Distinct Sheets API reads in flight.', scheduler_stats['inflight']),
+        'sheet_editor_read_quota_queue_depth': ('Calls waiting for read quota.', scheduler_stats['read_quota']['queue_depth']),
+        'sheet_editor_write_quota_queue_depth': ('Calls waiting for write quota.', scheduler_stats['write_quota']['queue_depth']),
+        'sheet_editor_http_pool_idle': ('Idle pooled Sheets API transports.', scheduler_stats['http_pool']['idle']),
+        'sheet_editor_events_held_streams': ('/events streams currently held open.', event_stats['held_streams']),
+        'sheet_editor_events_buffered': ('Events buffered for resuming clients.', event_stats['buffered_events']),
+    }
+    counters = {
+        'sheet_editor_snapshot_cache_hits_total': ('Snapshot cache hits.', snapshot_stats['hits']),
+        'sheet_editor_snapshot_cache_misses_total': ('Snapshot cache misses.', snapshot_stats['misses']),
+        'sheet_editor_sheets_api_coalesced_total': ('Reads served by joining an identical in-flight call.', scheduler_stats['coalesced']),
+        'sheet_editor_sheets_api_retries_total': ('Sheets API calls retried after a 429/5xx.', scheduler_stats['retries']),
+        'sheet_editor_http_connections_opened_total': ('Sheets API connections opened.', scheduler_stats['http_pool']['connections_opened']),
+    }
+    if write_queue is not None:
+        queue_summary = write_queue.summary()
+        gauges['sheet_editor_write_queue_pending'] = ('Queued writes not yet sent.', queue_summary['pending'])
+        gauges['sheet_editor_write_queue_oldest_pending_seconds'] = ('Age of the oldest queued write.', queue_summary['oldest_pending_age_seconds'])
+    if event_server is not None:
+        gauges['sheet_editor_events_open_streams'] = ('/events streams open on the stream server.', event_server.stats()['open_streams'])
+    if snapshot_store is not None:
+        store_stats = snapshot_store.stats()
+        gauges['sheet_editor_snapshot_store_bytes'] = ('Compressed snapshot bytes on disk.', store_stats['bytes'])
+        gauges['sheet_editor_snapshot_store_entries'] = ('Snapshots on disk.', store_stats['entries'])
+    return Response(metrics.render(gauges, counters), mimetype='text/plain; version=0.0.4')
+# --- End Stats Endpoint ---
+
+_startup_timings['module_load_seconds'] = round(time.perf_counter() - _module_load_started, 4)
+
 if __name__ == '__main__':
     # No longer need the templates check here, focus on serving
     # if not os.path.exists('templates'):
     #     os.makedirs('templates')
     port = 3000
-    print(f"Starting Waitress server on http://0.0.0.0:{port}")
+    if EVENTS_PORT:
+        try:
+            event_server = EventStreamServer(event_hub, port=EVENTS_PORT).start()
+            print(f"Serving /events streams on port {event_server.port}")
+        except OSError as e:
+            logging.error(f"Could not start the /events stream server on port {EVENTS_PORT}, holding streams on worker threads: {e}")
+    print(f"Starting Waitress server on http://0.0.0.0:{port} with {SERVER_THREADS} threads")
     # Use waitress.serve instead of app.run()
-    serve(app, host='0.0.0.0', port=port)
+    from waitress import serve # Only needed when run directly; Vercel imports `app`
+    serve(app, host='0.0.0.0', port=port, threads=SERVER_THREADS)
     # app.run(debug=True) # Remove flask development server 
\ No newline at end of file
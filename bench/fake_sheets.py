@@ -0,0 +1,311 @@
+"""Local stand-in for the Sheets API v4 endpoints app.py calls, for benchmarks.
+
+Serves spreadsheets.get (sheet metadata, or grid data for ?ranges=...&includeGridData=true),
+values.get, values.update, values.batchUpdate, spreadsheets.batchUpdate (updateCells notes)
+and an OAuth token endpoint, over synthetic grids held in memory. Every spreadsheet id
+maps to the same synthetic spreadsheet. `fields` masks are ignored.
+
+Point app.py at it with SHEETS_API_ROOT_URL=<url> and the credentials from
+fake_credentials(<url>/token), which needs the `cryptography` package (listed in
+bench/requirements.txt). Run on its own:
+
+    python bench/fake_sheets.py --rows 5000 --cols 20 --latency-ms 50 --port 8099
+"""
+import argparse
+import collections
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REVIEWERS = ['alice', 'bob', 'carol', 'dave']
+
+
+def col_index(letters):
+    index = 0
+    for char in letters:
+        index = index * 26 + (ord(char.upper()) - 64)
+    return index - 1
+
+
+def parse_a1_range(a1_range):
+    """'Sheet1!B3:D10' -> ('Sheet1', 2, 10, 1, 4): 0-based start, exclusive end; None = unbounded."""
+    sheet_name, _, ref = a1_range.rpartition('!')
+    if not sheet_name:
+        sheet_name, ref = ref, ''
+    if sheet_name.startswith("'") and sheet_name.endswith("'"):
+        sheet_name = sheet_name[1:-1].replace("''", "'")
+    if not ref:
+        return sheet_name, 0, None, 0, None
+    bounds = []
+    for part in ref.split(':'):
+        match = re.match(r'^([A-Za-z]*)(\d*)$', part)
+        bounds.append((int(match.group(2)) - 1 if match.group(2) else None,
+                       col_index(match.group(1)) if match.group(1) else None))
+    (first_row, first_col), (last_row, last_col) = bounds[0], bounds[-1]
+    return (sheet_name, first_row or 0, last_row + 1 if last_row is not None else None,
+            first_col or 0, last_col + 1 if last_col is not None else None)
+
+
+class SyntheticSheet:
+    """A grid laid out like the real review sheets: a title row, a header row (column D is the
+    reviewer, some columns are '∑' totals) and data rows, with notes on a fraction of cells."""
+
+    def __init__(self, sheet_id, rows, cols, note_density=0.05, seed=1):
+        rnd = random.Random(seed)
+        self.sheet_id = sheet_id
+        header = ['№', 'ФИО', 'Логин', 'проверяющий'] + [f'Задание {c - 3}' for c in range(4, cols)]
+        for c in range(6, cols, 5):
+            header[c] = '∑'
+        self.values = [['Review sheet'] + [''] * (cols - 1), header[:cols]]
+        self.notes = collections.defaultdict(dict) # row index -> {col index: note}
+        for r in range(rows):
+            row = [str(r + 1), f'Student {r}', f'login{r}', rnd.choice(REVIEWERS)]
+            row += [str(rnd.choice((0, 0, 1, 2, 3))) for _ in range(4, cols)]
+            self.values.append(row[:cols])
+            for c in range(cols):
+                if rnd.random() < note_density:
+                    self.notes[r + 2][c] = f'Note on row {r + 3}, column {c + 1}'
+
+    def grid_properties(self):
+        # Like Google, the grid is at least 1000 x 26 cells even when the data is smaller
+        return {'rowCount': max(len(self.values), 1000), 'columnCount': max(max(map(len, self.values)), 26)}
+
+    def grid_data(self, first_row, end_row, first_col, end_col):
+        """GridData for a range, shaped like the API's: empty cells and trailing empty rows omitted."""
+        end_row = len(self.values) if end_row is None else min(end_row, len(self.values))
+        row_data = []
+        for r in range(first_row, end_row):
+            row = self.values[r]
+            row_notes = self.notes.get(r, {})
+            width = max(len(row), max(row_notes, default=-1) + 1)
+            last = width if end_col is None else min(width, end_col)
+            cells = []
+            for c in range(first_col, last):
+                cell = {}
+                if c < len(row) and row[c] != '':
+                    cell['formattedValue'] = row[c]
+                if c in row_notes:
+                    cell['note'] = row_notes[c]
+                cells.append(cell)
+            while cells and not cells[-1]:
+                cells.pop()
+            row_data.append({'values': cells} if cells else {})
+        while row_data and not row_data[-1]:
+            row_data.pop()
+        grid = {'rowData': row_data}
+        if first_row:
+            grid['startRow'] = first_row
+        if first_col:
+            grid['startColumn'] = first_col
+        return grid
+
+    def write_values(self, first_row, first_col, values):
+        for i, row_values in enumerate(values):
+            r = first_row + i
+            while len(self.values) <= r:
+                self.values.append([])
+            row = self.values[r]
+            for j, value in enumerate(row_values):
+                c = first_col + j
+                row.extend([''] * (c + 1 - len(row)))
+                row[c] = str(value)
+
+
+class FakeSpreadsheet:
+    """Sheets of one synthetic spreadsheet plus counts of the calls made against it."""
+
+    def __init__(self, sheet_count=1, rows=1000, cols=20, note_density=0.05, seed=1):
+        self.lock = threading.Lock()
+        self.sheets = {f'Sheet{i + 1}': SyntheticSheet(i + 1, rows, cols, note_density, seed + i)
+                       for i in range(sheet_count)}
+        self.calls = collections.Counter()
+
+    def sheet_by_id(self, sheet_id):
+        return next(sheet for sheet in self.sheets.values() if sheet.sheet_id == sheet_id)
+
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Keep-alive, like the real API
+    spreadsheet = None
+    latency = 0.0 # Seconds added to every API call
+    jitter = 0.0 # Up to this many more seconds, uniformly random
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate_latency(self):
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _route(self, endpoint, handler, *args):
+        self.spreadsheet.calls[endpoint] += 1
+        self._simulate_latency()
+        try:
+            with self.spreadsheet.lock:
+                status, payload = handler(*args)
+        except (KeyError, StopIteration, ValueError, AttributeError) as e:
+            status, payload = 400, {'error': {'code': 400, 'message': f'Bad request: {e}', 'status': 'INVALID_ARGUMENT'}}
+        self._send(status, payload)
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        match = re.match(r'^/v4/spreadsheets/([^/]+)/values/(.+)$', url.path)
+        if match:
+            return self._route('values.get', self._values_get, urllib.parse.unquote(match.group(2)))
+        match = re.match(r'^/v4/spreadsheets/([^/:]+)$', url.path)
+        if match:
+            return self._route('spreadsheets.get', self._spreadsheets_get, match.group(1), query)
+        self._send(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+
+    def do_PUT(self):
+        url = urllib.parse.urlparse(self.path)
+        match = re.match(r'^/v4/spreadsheets/([^/]+)/values/(.+)$', url.path)
+        if match:
+            return self._route('values.update', self._values_update, urllib.parse.unquote(match.group(2)), self._read_body())
+        self._send(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path == '/token':
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            return self._send(200, {'access_token': 'fake-token', 'expires_in': 3600, 'token_type': 'Bearer'})
+        if re.match(r'^/v4/spreadsheets/[^/]+/values:batchUpdate$', url.path):
+            return self._route('values.batchUpdate', self._values_batch_update, self._read_body())
+        if re.match(r'^/v4/spreadsheets/[^/]+:batchUpdate$', url.path):
+            return self._route('spreadsheets.batchUpdate', self._batch_update, self._read_body())
+        self._send(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+
+    def _spreadsheets_get(self, spreadsheet_id, query):
+        sheets = self.spreadsheet.sheets
+        if query.get('includeGridData', ['false'])[0] != 'true':
+            return 200, {'spreadsheetId': spreadsheet_id, 'sheets': [
+                {'properties': {'sheetId': sheet.sheet_id, 'title': title, 'gridProperties': sheet.grid_properties()}}
+                for title, sheet in sheets.items()]}
+        data_by_sheet = collections.OrderedDict()
+        for a1_range in query.get('ranges', []) or list(sheets):
+            sheet_name, first_row, end_row, first_col, end_col = parse_a1_range(a1_range)
+            data_by_sheet.setdefault(sheet_name, []).append(
+                sheets[sheet_name].grid_data(first_row, end_row, first_col, end_col))
+        return 200, {'spreadsheetId': spreadsheet_id, 'sheets': [
+            {'properties': {'sheetId': sheets[title].sheet_id, 'title': title}, 'data': data}
+            for title, data in data_by_sheet.items()]}
+
+    def _values_get(self, a1_range):
+        sheet_name, first_row, end_row, first_col, end_col = parse_a1_range(a1_range)
+        rows = self.spreadsheet.sheets[sheet_name].values[first_row:end_row]
+        values = [row[first_col:end_col] for row in rows]
+        while values and not values[-1]:
+            values.pop()
+        return 200, {'range': a1_range, 'majorDimension': 'ROWS', 'values': values}
+
+    def _values_update(self, a1_range, body):
+        sheet_name, first_row, _, first_col, _ = parse_a1_range(a1_range)
+        self.spreadsheet.sheets[sheet_name].write_values(first_row, first_col, body.get('values', []))
+        return 200, {'updatedRange': a1_range, 'updatedCells': sum(len(row) for row in body.get('values', []))}
+
+    def _values_batch_update(self, body):
+        for value_range in body.get('data', []):
+            sheet_name, first_row, _, first_col, _ = parse_a1_range(value_range['range'])
+            self.spreadsheet.sheets[sheet_name].write_values(first_row, first_col, value_range.get('values', []))
+        return 200, {'totalUpdatedRanges': len(body.get('data', []))}
+
+    def _batch_update(self, body):
+        for update in body.get('requests', []):
+            update_cells = update['updateCells']
+            grid_range = update_cells['range']
+            sheet = self.spreadsheet.sheet_by_id(grid_range.get('sheetId', 0))
+            for i, row in enumerate(update_cells.get('rows', [])):
+                for j, cell in enumerate(row.get('values', [])):
+                    r, c = grid_range['startRowIndex'] + i, grid_range['startColumnIndex'] + j
+                    if cell.get('note'):
+                        sheet.notes[r][c] = cell['note']
+                    else:
+                        sheet.notes.get(r, {}).pop(c, None)
+        return 200, {'replies': [{} for _ in body.get('requests', [])]}
+
+
+class FakeSheetsServer:
+    """Runs FakeSheetsHandler for one FakeSpreadsheet on a background thread."""
+
+    def __init__(self, spreadsheet, host='127.0.0.1', port=0, latency=0.0, jitter=0.0):
+        handler = type('BoundFakeSheetsHandler', (FakeSheetsHandler,),
+                       {'spreadsheet': spreadsheet, 'latency': latency, 'jitter': jitter})
+        self.spreadsheet = spreadsheet
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.url = f'http://{host}:{self.httpd.server_port}'
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-sheets', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def fake_credentials(token_uri):
+    """Service account info with a freshly generated key, accepted by google-auth.
+
+    Needs `cryptography` (pip install -r bench/requirements.txt).
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_key = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption()).decode('ascii')
+    return {
+        'type': 'service_account',
+        'project_id': 'bench',
+        'private_key_id': 'bench',
+        'private_key': private_key,
+        'client_email': 'bench@bench.iam.gserviceaccount.com',
+        'client_id': '0',
+        'token_uri': token_uri,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--sheets', type=int, default=1, help='number of tabs (Sheet1, Sheet2, ...)')
+    parser.add_argument('--rows', type=int, default=1000, help='data rows per tab')
+    parser.add_argument('--cols', type=int, default=20)
+    parser.add_argument('--note-density', type=float, default=0.05, help='fraction of cells with a note')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='added to every API call')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='random extra latency, up to this much')
+    parser.add_argument('--write-credentials', metavar='PATH', help='write matching service account JSON here')
+    args = parser.parse_args()
+
+    spreadsheet = FakeSpreadsheet(args.sheets, args.rows, args.cols, args.note_density)
+    server = FakeSheetsServer(spreadsheet, args.host, args.port, args.latency_ms / 1000, args.jitter_ms / 1000)
+    if args.write_credentials:
+        with open(args.write_credentials, 'w') as f:
+            json.dump(fake_credentials(server.url + '/token'), f)
+    print(f"Fake Sheets API on {server.url} (set SHEETS_API_ROOT_URL={server.url})")
+    server.httpd.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
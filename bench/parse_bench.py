@@ -0,0 +1,170 @@
+"""Microbenchmark of the GridData parse stage (iter_grid_rows + split_sheet_rows in app.py).
+
+Parses synthetic spreadsheets.get responses three ways and checks that all produce identical
+header, rows, notes and row numbers, then prints rows/sec for each:
+
+  before   the original get_sheet_data_with_notes loop (commit 4081bc1): a pass over the rows
+           for the width, then every padded cell parsed with its note looked up, rows sliced
+  loop     the streaming parser with one loop over each row's cells, before the comprehensions
+  app      app.iter_grid_rows as it is now (a plain loop for narrow rows, comprehensions otherwise)
+
+    python bench/parse_bench.py
+    python bench/parse_bench.py --shape 500x650 --note-density 0.02 --repeat 10
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+os.environ.setdefault('FAST_START', '0') # Importing app must not try to load credentials
+os.environ.setdefault('QUIET_REQUEST_LOGS', '1')
+
+import app # noqa: E402
+from fake_sheets import SyntheticSheet # noqa: E402
+
+
+def baseline_parse(grid_chunks, sheet_name):
+    """get_sheet_data_with_notes' parse as of commit 4081bc1, which fetched the sheet as one
+    GridData, so the chunks are joined back into one rowData list first."""
+    row_data = []
+    for grids in grid_chunks:
+        for grid_data in grids:
+            start_row = grid_data.get('startRow', 0)
+            if grid_data.get('rowData') and len(row_data) < start_row:
+                row_data.extend({} for _ in range(start_row - len(row_data)))
+            row_data.extend(grid_data.get('rowData', []))
+
+    header = []
+    all_rows_values = []
+    notes = {} # Store notes as { "A1_notation": "note text" }
+    max_cols = 0
+    data_row_sheet_indices = []  # List of actual sheet row numbers for each data row
+
+    # Find max columns based *only* on formattedValue presence first
+    # This avoids notes in empty columns creating extra padding later
+    for r_idx, row in enumerate(row_data):
+         values = row.get('values', [])
+         max_cols = max(max_cols, len(values))
+
+    sheet_row_offset = 1 # Sheet rows are 1-based
+
+    for r_idx, row in enumerate(row_data):
+        current_row_values = []
+        values_in_row = row.get('values', [])
+        sheet_row_num = r_idx + sheet_row_offset
+
+        for c_idx in range(max_cols):
+            cell_data = values_in_row[c_idx] if c_idx < len(values_in_row) else {}
+            formatted_value = cell_data.get('formattedValue', '')
+            note = cell_data.get('note')
+            current_row_values.append(formatted_value if formatted_value is not None else '')
+
+            if note:
+                col_letter = app.get_col_letter(c_idx)
+                a1_notation = f"{sheet_name}!{col_letter}{sheet_row_num}"
+                notes[a1_notation] = note
+
+        # Extract header from the 2nd row (index 1)
+        if r_idx == 1:
+            header = current_row_values[:max_cols]
+        # Add subsequent rows to data (starting from index 2)
+        if r_idx >= 2:
+            all_rows_values.append(current_row_values[:max_cols])
+            data_row_sheet_indices.append(sheet_row_num)
+
+    return header, all_rows_values, notes, data_row_sheet_indices
+
+
+def loop_parse(grid_chunks, sheet_name):
+    """The chunked parser before the comprehension rewrite: one loop over the cells with
+    per-cell appends and notes keyed through get_col_letter and an f-string, then a second
+    pass to pad rows."""
+    notes = {}
+    sheet_rows = []
+    for grids in grid_chunks:
+        for grid_data in grids:
+            row_data = grid_data.get('rowData', [])
+            start_row = grid_data.get('startRow', 0)
+            if row_data and len(sheet_rows) < start_row:
+                sheet_rows.extend([] for _ in range(start_row - len(sheet_rows)))
+            for r_offset, row in enumerate(row_data):
+                sheet_row_num = start_row + r_offset + 1
+                current_row_values = []
+                for c_idx, cell_data in enumerate(row.get('values', [])):
+                    formatted_value = cell_data.get('formattedValue', '')
+                    current_row_values.append(formatted_value if formatted_value is not None else '')
+                    note = cell_data.get('note')
+                    if note:
+                        notes[f"{sheet_name}!{app.get_col_letter(c_idx)}{sheet_row_num}"] = note
+                sheet_rows.append(current_row_values)
+    max_cols = max((len(current_row_values) for current_row_values in sheet_rows), default=0)
+    for current_row_values in sheet_rows:
+        current_row_values.extend([''] * (max_cols - len(current_row_values)))
+    header = sheet_rows[app.HEADER_SHEET_ROW - 1] if len(sheet_rows) >= app.HEADER_SHEET_ROW else []
+    all_rows_values = sheet_rows[app.FIRST_DATA_SHEET_ROW - 1:]
+    data_row_sheet_indices = list(range(app.FIRST_DATA_SHEET_ROW, app.FIRST_DATA_SHEET_ROW + len(all_rows_values)))
+    return header, all_rows_values, notes, data_row_sheet_indices
+
+
+def app_parse(grid_chunks, sheet_name):
+    notes = {}
+    sheet_rows = list(app.iter_grid_rows(grid_chunks, sheet_name, notes))
+    max_cols = max(map(len, sheet_rows), default=0)
+    header, all_rows_values, data_row_sheet_indices = app.split_sheet_rows(sheet_rows, max_cols)
+    return header, all_rows_values, notes, data_row_sheet_indices
+
+
+def make_grid_chunks(rows, cols, note_density, blank_fraction, chunk_rows, seed=1):
+    """GridData chunks shaped like iter_grid_chunks yields them for a synthetic sheet."""
+    sheet = SyntheticSheet(1, rows, cols, note_density, seed)
+    rnd = random.Random(seed)
+    for row in sheet.values[2:]:
+        for c in range(4, len(row)):
+            if rnd.random() < blank_fraction:
+                row[c] = ''
+    total_rows = len(sheet.values)
+    return [[sheet.grid_data(first, min(first + chunk_rows, total_rows), 0, None)]
+            for first in range(0, total_rows, chunk_rows)]
+
+
+def time_parsers(parsers, grid_chunks, repeat):
+    """Median seconds per parser. Runs are interleaved so that machine noise hits all parsers alike."""
+    timings = [[] for _ in parsers]
+    for _ in range(repeat):
+        for parse, parse_timings in zip(parsers, timings):
+            started = time.perf_counter()
+            parse(grid_chunks, 'Sheet1')
+            parse_timings.append(time.perf_counter() - started)
+    return [statistics.median(parse_timings) for parse_timings in timings]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--shape', action='append', metavar='ROWSxCOLS',
+                        help='grid size; repeatable (default: 500x650, 5000x20, 5000x60)')
+    parser.add_argument('--note-density', type=float, default=0.02)
+    parser.add_argument('--blank-fraction', type=float, default=0.5, help='fraction of score cells left empty')
+    parser.add_argument('--repeat', type=int, default=15, help='runs per parser; the median counts')
+    args = parser.parse_args()
+
+    parsers = [baseline_parse, loop_parse, app_parse]
+    print(f"{'shape':<10}{'before rows/s':>15}{'loop rows/s':>13}{'app rows/s':>12}{'vs before':>11}{'vs loop':>9}")
+    for shape in args.shape or ['500x650', '5000x60', '5000x20', '5000x8']:
+        rows, cols = (int(part) for part in shape.lower().split('x'))
+        grid_chunks = make_grid_chunks(rows, cols, args.note_density, args.blank_fraction, app.ROW_CHUNK_SIZE)
+        expected = baseline_parse(grid_chunks, 'Sheet1')
+        for parse in parsers[1:]:
+            if parse(grid_chunks, 'Sheet1') != expected:
+                sys.exit(f"{shape}: {parse.__name__} output differs from the 4081bc1 parser")
+        before_seconds, loop_seconds, app_seconds = time_parsers(parsers, grid_chunks, args.repeat)
+        print(f"{shape:<10}{rows / before_seconds:>15,.0f}{rows / loop_seconds:>13,.0f}{rows / app_seconds:>12,.0f}"
+              f"{before_seconds / app_seconds:>10.2f}x{loop_seconds / app_seconds:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""Benchmarks app.py, served by waitress, against the fake Sheets API in fake_sheets.py.
+
+Each scenario sends --requests requests from --concurrency client threads (after one
+warm-up request) and reports throughput, latency percentiles and errors; the app's peak
+RSS and the upstream calls it made are recorded too. Results are written as JSON, and
+--compare prints the change against an earlier results file.
+
+    pip install -r requirements.txt -r bench/requirements.txt
+    python bench/run.py --rows 5000 --concurrency 8 --requests 200
+    python bench/run.py --scenarios load-data-refresh --latency-ms 80 --compare bench/results/before.json
+
+Scenarios:
+    load-data          GET /load-data (served from the snapshot cache after the warm-up)
+    load-data-refresh  GET /load-data?refresh=1 (full fetch and parse every time)
+    load-data-ndjson   GET /load-data?format=ndjson&refresh=1 (streamed)
+    load-data-page     GET /load-data?hide_zero_sum=1&offset=...&page_size=200 (scrolling a filtered view)
+    get-sheet-names    GET /get-sheet-names
+    save-note          POST /save-note on a different cell each time
+    ban-cell           POST /ban-cell on a different cell each time
+"""
+import argparse
+import concurrent.futures
+import datetime
+import http.client
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+from fake_sheets import FakeSheetsServer, FakeSpreadsheet, fake_credentials # noqa: E402
+
+SPREADSHEET_ID = 'bench-spreadsheet'
+SHEET_NAME = 'Sheet1'
+FIRST_DATA_SHEET_ROW = 3
+
+
+def scenario_request(name, i, rows):
+    """(method, path, json body or None) for request number i of a scenario."""
+    sheet_row = FIRST_DATA_SHEET_ROW + i % rows
+    query = urllib.parse.urlencode({'id': SPREADSHEET_ID, 'sheet': SHEET_NAME})
+    if name == 'load-data':
+        return 'GET', f'/load-data?{query}', None
+    if name == 'load-data-refresh':
+        return 'GET', f'/load-data?{query}&refresh=1', None
+    if name == 'load-data-ndjson':
+        return 'GET', f'/load-data?{query}&format=ndjson&refresh=1', None
+    if name == 'load-data-page':
+        # The table scrolling through a filtered view, one 200-row window per request
+        offset = i * 200 % rows
+        return 'GET', f'/load-data?{query}&hide_zero_sum=1&offset={offset}&page_size=200', None
+    if name == 'get-sheet-names':
+        return 'GET', f'/get-sheet-names?id={SPREADSHEET_ID}', None
+    if name == 'save-note':
+        return 'POST', '/save-note', {'id': SPREADSHEET_ID, 'a1': f'{SHEET_NAME}!E{sheet_row}', 'note': f'bench note {i}'}
+    if name == 'ban-cell':
+        return 'POST', '/ban-cell', {'id': SPREADSHEET_ID, 'a1': f'{SHEET_NAME}!F{sheet_row}'}
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+SCENARIOS = ['load-data', 'load-data-refresh', 'load-data-ndjson', 'load-data-page', 'get-sheet-names', 'save-note', 'ban-cell']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_app(fake_url, port, threads, extra_env):
+    env = dict(os.environ)
+    env.update({
+        'GOOGLE_CREDENTIALS_JSON': json.dumps(fake_credentials(fake_url + '/token')),
+        'SHEETS_API_ROOT_URL': fake_url,
+        'QUIET_REQUEST_LOGS': '1',
+        'SERVER_THREADS': str(threads), # Sizes the /events held-stream limit to match
+        # Benchmarks measure the app, not the quota pacing meant for Google's limits
+        'SHEETS_READ_REQUESTS_PER_MINUTE': '1000000',
+        'SHEETS_WRITE_REQUESTS_PER_MINUTE': '1000000',
+        'SHEETS_QUOTA_BURST': '1000000',
+    })
+    env.update(extra_env)
+    code = ('import sys, waitress, app; '
+            'waitress.serve(app.app, host="127.0.0.1", port=int(sys.argv[1]), threads=int(sys.argv[2]), _quiet=True)')
+    process = subprocess.Popen([sys.executable, '-c', code, str(port), str(threads)], cwd=REPO_DIR, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"app exited with status {process.returncode} during startup")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/stats')
+            connection.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("app did not start within 30s")
+
+
+def peak_rss_bytes(pid):
+    """VmHWM of a running process (Linux), or None."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def get_json(port, path):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    connection.request('GET', path)
+    return json.loads(connection.getresponse().read())
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run_scenario(name, port, requests, concurrency, rows):
+    local = threading.local()
+
+    def send(i):
+        method, path, body = scenario_request(name, i, rows)
+        connection = getattr(local, 'connection', None)
+        if connection is None:
+            connection = local.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = connection.getresponse()
+            size = len(response.read())
+            status = response.status
+        except (OSError, http.client.HTTPException) as e:
+            local.connection = None
+            return time.perf_counter() - started, f'error: {type(e).__name__}', 0
+        return time.perf_counter() - started, status, size
+
+    send(-1) # Warm-up: first fetch, service construction, cache fill
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, range(requests)))
+    wall_seconds = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _, _ in results)
+    statuses = {}
+    for _, status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = [result for result in results if result[1] == 200]
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput_rps': round(requests / wall_seconds, 2),
+        'latency_ms': {
+            'mean': round(1000 * sum(latencies) / len(latencies), 2),
+            'p50': round(1000 * percentile(latencies, 0.50), 2),
+            'p90': round(1000 * percentile(latencies, 0.90), 2),
+            'p99': round(1000 * percentile(latencies, 0.99), 2),
+            'max': round(1000 * latencies[-1], 2),
+        },
+        'statuses': statuses,
+        'errors': requests - len(ok),
+        'mean_response_bytes': round(sum(size for _, _, size in ok) / len(ok)) if ok else 0,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    print(f"{'scenario':<20}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, result in results['scenarios'].items():
+        line = (f"{name:<20}{result['throughput_rps']:>10.1f}{result['latency_ms']['p50']:>10.1f}"
+                f"{result['latency_ms']['p99']:>10.1f}{result['errors']:>8}")
+        previous = (baseline or {}).get('scenarios', {}).get(name)
+        if previous:
+            def change(new, old):
+                return f"{100 * (new - old) / old:+.1f}%" if old else 'n/a'
+            line += (f"   vs {baseline.get('git_commit') or 'baseline'}: req/s {change(result['throughput_rps'], previous['throughput_rps'])},"
+                     f" p99 {change(result['latency_ms']['p99'], previous['latency_ms']['p99'])}")
+        print(line)
+    peak = results['app']['peak_rss_bytes']
+    print(f"app peak RSS: {peak / 2**20:.1f} MiB" if peak else "app peak RSS: unknown")
+    if baseline and baseline.get('app', {}).get('peak_rss_bytes') and peak:
+        print(f"  vs baseline: {peak / 2**20 - baseline['app']['peak_rss_bytes'] / 2**20:+.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__.split('\n\n', 1)[1])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated, from the list below')
+    parser.add_argument('--requests', type=int, default=100, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads')
+    parser.add_argument('--threads', type=int, default=8, help='waitress worker threads')
+    parser.add_argument('--rows', type=int, default=2000, help='data rows in the fake sheet')
+    parser.add_argument('--cols', type=int, default=20)
+    parser.add_argument('--sheets', type=int, default=3, help='tabs in the fake spreadsheet')
+    parser.add_argument('--note-density', type=float, default=0.05)
+    parser.add_argument('--latency-ms', type=float, default=30.0, help='fake Sheets API latency per call')
+    parser.add_argument('--jitter-ms', type=float, default=10.0)
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE', help='extra app environment')
+    parser.add_argument('--output', help='results JSON path (default: bench/results/<timestamp>.json)')
+    parser.add_argument('--compare', metavar='RESULTS_JSON', help='earlier results to compare against')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    extra_env = dict(item.split('=', 1) for item in args.env)
+
+    spreadsheet = FakeSpreadsheet(args.sheets, args.rows, args.cols, args.note_density)
+    fake = FakeSheetsServer(spreadsheet, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000).start()
+    port = free_port()
+    process = start_app(fake.url, port, args.threads, extra_env)
+    results = {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'scenarios': {},
+    }
+    try:
+        for name in scenarios:
+            calls_before = dict(spreadsheet.calls)
+            result = run_scenario(name, port, args.requests, args.concurrency, args.rows)
+            result['upstream_calls'] = {endpoint: count - calls_before.get(endpoint, 0)
+                                        for endpoint, count in spreadsheet.calls.items()
+                                        if count != calls_before.get(endpoint, 0)}
+            results['scenarios'][name] = result
+        results['app'] = {'peak_rss_bytes': peak_rss_bytes(process.pid), 'stats': get_json(port, '/stats')}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        fake.stop()
+    if results['app']['peak_rss_bytes'] is None:
+        # Not Linux: fall back to the max RSS of waited-for children (KiB on Linux, bytes on macOS)
+        max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        results['app']['peak_rss_bytes'] = max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+    output = args.output or os.path.join(
+        BENCH_DIR, 'results', datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('FAST_START', '0') # Importing app must not try to load credentials
+os.environ.setdefault('QUIET_REQUEST_LOGS', '1')
+
+import app # noqa: E402 (needs the path and environment above)
+from bench.fake_sheets import FakeSheetsHandler, FakeSpreadsheet # noqa: E402
+
+
+class FakeRequest:
+    """Stands in for a googleapiclient HttpRequest; execute() answers from the fake spreadsheet."""
+
+    def __init__(self, method, uri, handler, *args):
+        self.method = method
+        self.uri = uri
+        self._handler = handler
+        self._args = args
+
+    def execute(self, http=None):
+        status, payload = self._handler(*self._args)
+        assert status == 200, payload
+        return payload
+
+
+class FakeSheetsService:
+    """The slice of the Sheets v4 service app.py uses, answered by bench/fake_sheets.py's handlers
+    without going through HTTP. Call counts land in book.calls like the fake server's."""
+
+    def __init__(self, book):
+        self.book = book
+        self._handler = FakeSheetsHandler.__new__(FakeSheetsHandler)
+        self._handler.spreadsheet = book
+
+    def _request(self, method, endpoint, handler, *args):
+        def counted(*args):
+            self.book.calls[endpoint] += 1
+            with self.book.lock:
+                return handler(*args)
+        return FakeRequest(method, f'{endpoint}:{args!r}', counted, *args)
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return FakeValuesResource(self)
+
+    def get(self, spreadsheetId, ranges=None, fields=None, includeGridData=False):
+        query = {'includeGridData': ['true' if includeGridData else 'false'], 'ranges': list(ranges or [])}
+        return self._request('GET', 'spreadsheets.get', self._handler._spreadsheets_get, spreadsheetId, query)
+
+    def batchUpdate(self, spreadsheetId, body):
+        return self._request('POST', 'spreadsheets.batchUpdate', self._handler._batch_update, body)
+
+
+class FakeValuesResource:
+    def __init__(self, service):
+        self._service = service
+
+    def get(self, spreadsheetId, range, **kwargs):
+        return self._service._request('GET', 'values.get', self._service._handler._values_get, range)
+
+    def update(self, spreadsheetId, range, body, **kwargs):
+        return self._service._request('PUT', 'values.update', self._service._handler._values_update, range, body)
+
+    def batchUpdate(self, spreadsheetId, body):
+        return self._service._request('POST', 'values.batchUpdate', self._service._handler._values_batch_update, body)
+
+
+@pytest.fixture
+def book(monkeypatch):
+    """A two-tab synthetic spreadsheet (40 data rows x 12 columns each) served to app.py in
+    place of the Sheets API, with empty caches."""
+    book = FakeSpreadsheet(sheet_count=2, rows=40, cols=12, note_density=0.1)
+    service = FakeSheetsService(book)
+    monkeypatch.setattr(app.sheets_provider, 'get_service', lambda: service)
+    monkeypatch.setattr(app.sheets_scheduler, 'execute', lambda request: request.execute())
+    snapshot_cache = app.SnapshotCache()
+    snapshot_cache.listeners = list(app.snapshot_cache.listeners)
+    monkeypatch.setattr(app, 'snapshot_cache', snapshot_cache)
+    monkeypatch.setattr(app, 'header_cache', app.HeaderCache())
+    monkeypatch.setattr(app, 'window_cache', app.WindowCache())
+    monkeypatch.setattr(app, 'metadata_cache', app.MetadataCache())
+    return book
+
+
+@pytest.fixture
+def client(book):
+    return app.app.test_client()
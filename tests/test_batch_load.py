@@ -0,0 +1,76 @@
+import threading
+
+import app
+from app import group_sheets_for_batch
+
+
+def test_groups_pack_sheets_in_order_up_to_the_row_limit():
+    sheets = [('A', 400), ('B', 500), ('C', 200), ('D', 900), ('E', 100)]
+    groups, oversized = group_sheets_for_batch(sheets, max_rows=1000)
+    assert groups == [[('A', 400), ('B', 500)], [('C', 200)], [('D', 900), ('E', 100)]]
+    assert oversized == []
+
+
+def test_oversized_sheets_are_left_out():
+    groups, oversized = group_sheets_for_batch([('A', 300), ('Big', 2000), ('B', 300)], max_rows=1000)
+    assert groups == [[('A', 300), ('B', 300)]]
+    assert oversized == ['Big']
+
+
+def record_grid_requests(monkeypatch):
+    """Records (thread name, ranges) for each grid spreadsheets.get."""
+    requests = []
+    execute = app.sheets_scheduler.execute
+    def recording_execute(http_request):
+        query = http_request._args[1] if len(http_request._args) > 1 else {}
+        if isinstance(query, dict) and query.get('includeGridData') == ['true']:
+            requests.append((threading.current_thread().name, query['ranges']))
+        return execute(http_request)
+    monkeypatch.setattr(app.sheets_scheduler, 'execute', recording_execute)
+    return requests
+
+
+def test_load_sheets_matches_load_data(client):
+    response = client.get('/load-sheets?id=X').get_json()
+    assert list(response['sheets']) == ['Sheet1', 'Sheet2']
+    assert response['errors'] == {}
+    for sheet_name, payload in response['sheets'].items():
+        single = client.get(f'/load-data?id=X&sheet={sheet_name}').get_json()
+        for field in ('header', 'rows', 'notes', 'data_row_sheet_indices', 'reviewers'):
+            assert payload[field] == single[field], (sheet_name, field)
+
+
+def test_groups_are_fetched_on_their_own_pool(client, monkeypatch):
+    requests = record_grid_requests(monkeypatch)
+    client.get('/load-sheets?id=X&sheet=Sheet1&sheet=Sheet2')
+    assert len(requests) == 1
+    thread_name, ranges = requests[0]
+    assert thread_name.startswith('sheets-batch-load')
+    assert [a1_range.split('!')[0] for a1_range in ranges] == ['Sheet1', 'Sheet2']
+
+
+def test_repeated_sheet_params_are_loaded_once(client, monkeypatch):
+    requests = record_grid_requests(monkeypatch)
+    response = client.get('/load-sheets?id=X&sheet=Sheet2&sheet=Sheet2&sheet=Sheet1&sheet=Sheet2').get_json()
+    assert sorted(response['sheets']) == ['Sheet1', 'Sheet2']
+    assert len(requests) == 1
+    assert [a1_range.split('!')[0] for a1_range in requests[0][1]] == ['Sheet2', 'Sheet1']
+
+
+def test_unknown_sheet_is_reported_per_sheet(client):
+    response = client.get('/load-sheets?id=X&sheet=Sheet1&sheet=Nope').get_json()
+    assert list(response['sheets']) == ['Sheet1']
+    assert 'Nope' in response['errors']
+
+
+def test_busy_batch_pool_does_not_hold_up_load_data(client):
+    release = threading.Event()
+    blockers = [app._batch_load_executor.submit(release.wait, 10) for _ in range(app.BATCH_LOAD_PARALLELISM)]
+    try:
+        response = client.get('/load-data?id=X&sheet=Sheet1')
+        assert response.status_code == 200
+        assert len(response.get_json()['rows']) == 40
+    finally:
+        release.set()
+        for blocker in blockers:
+            blocker.result()
@@ -0,0 +1,84 @@
+import pytest
+
+import app
+from app import merge_cells_into_rectangles
+
+
+def covered_cells(rectangles):
+    return [(r, c) for start_row, start_col, end_row, end_col in rectangles
+            for r in range(start_row, end_row) for c in range(start_col, end_col)]
+
+
+def test_merges_a_block_into_one_rectangle():
+    cells = {(r, c) for r in range(2, 5) for c in range(1, 4)}
+    assert merge_cells_into_rectangles(cells) == [(2, 1, 5, 4)]
+
+
+def test_gaps_split_rectangles():
+    cells = [(0, 0), (0, 1), (0, 3), (1, 0), (1, 1), (3, 0)]
+    assert merge_cells_into_rectangles(cells) == [(0, 0, 2, 2), (0, 3, 1, 4), (3, 0, 4, 1)]
+
+
+def test_ragged_shape_is_covered_exactly_once():
+    cells = {(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (2, 0), (2, 5)}
+    rectangles = merge_cells_into_rectangles(cells)
+    assert sorted(covered_cells(rectangles)) == sorted(cells)
+
+
+def test_duplicate_cells_are_written_once():
+    rectangles = merge_cells_into_rectangles([(1, 1), (1, 2), (1, 1)])
+    assert rectangles == [(1, 1, 2, 3)]
+
+
+def test_no_cells():
+    assert merge_cells_into_rectangles([]) == []
+
+
+class RecordingService:
+    """Stands in for the Sheets service: batchUpdate returns its arguments for execute to record."""
+
+    def spreadsheets(self):
+        return self
+
+    def batchUpdate(self, **kwargs):
+        return kwargs
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    sent = []
+    monkeypatch.setattr(app.sheets_provider, 'get_service', RecordingService)
+    monkeypatch.setattr(app.sheets_scheduler, 'execute', lambda request: sent.append(request) or {})
+    monkeypatch.setattr(app, 'get_sheet_id', lambda service, spreadsheet_id, sheet_name: {'Sheet1': 11, 'Other': 22}[sheet_name])
+    return sent
+
+
+def test_save_notes_sends_one_batch_per_sheet(sent):
+    client = app.app.test_client()
+    cells = ['Sheet1!B3', 'Sheet1!C3', 'Sheet1!B4', 'Sheet1!C4', 'Other!A1', 'Other!A3']
+    response = client.post('/save-notes', json={'id': 'X', 'note': 'n', 'cells': cells}).get_json()
+    assert response['saved'] == 6
+    ranges = {request['body']['requests'][0]['updateCells']['range']['sheetId']:
+              [r['updateCells']['range'] for r in request['body']['requests']] for request in sent}
+    assert ranges[11] == [{'sheetId': 11, 'startRowIndex': 2, 'endRowIndex': 4, 'startColumnIndex': 1, 'endColumnIndex': 3}]
+    assert ranges[22] == [{'sheetId': 22, 'startRowIndex': 0, 'endRowIndex': 1, 'startColumnIndex': 0, 'endColumnIndex': 1},
+                          {'sheetId': 22, 'startRowIndex': 2, 'endRowIndex': 3, 'startColumnIndex': 0, 'endColumnIndex': 1}]
+
+
+def test_save_notes_duplicates_report_the_written_entry(sent):
+    client = app.app.test_client()
+    cells = [{'a1': 'Sheet1!B3', 'note': 'first'}, {'a1': 'Sheet1!$B$3', 'note': 'x'}, {'a1': 'Sheet1!B3', 'note': 'last'}]
+    results = client.post('/save-notes', json={'id': 'X', 'cells': cells}).get_json()['results']
+    written = [r['note'] for request in sent for update in request['body']['requests']
+               for row in update['updateCells']['rows'] for r in row['values']]
+    assert written == ['last']
+    assert results[0] == {'a1': 'Sheet1!B3', 'success': True, 'note': 'last', 'duplicate_of': 2}
+    assert results[1] == {'a1': 'Sheet1!$B$3', 'success': True, 'note': 'last', 'duplicate_of': 2}
+    assert results[2] == {'a1': 'Sheet1!B3', 'success': True, 'note': 'last'}
+
+
+def test_save_notes_reports_unknown_sheet_per_entry(sent):
+    client = app.app.test_client()
+    response = client.post('/save-notes', json={'id': 'X', 'note': 'n', 'cells': ['Sheet1!B3', 'Gone!B3']}).get_json()
+    assert [r['success'] for r in response['results']] == [True, False]
+    assert "Gone" in response['results'][1]['error']
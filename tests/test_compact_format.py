@@ -0,0 +1,110 @@
+import gzip
+
+import pytest
+
+import app
+from app import column_letter, run_length_encode
+
+
+def load(client, headers=None, **params):
+    response = client.get('/load-data', query_string=dict({'id': 'X', 'sheet': 'Sheet1'}, **params), headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response
+
+
+def decode_column(column, row_count):
+    if 'const' in column:
+        return [column['const']] * row_count
+    if 'dict' in column:
+        return [column['dict'][code] for code in column['codes']]
+    return column['values']
+
+
+def decode_compact(payload):
+    """The client's decoding of a compact-v1 payload back into the JSON response's fields."""
+    assert payload['format'] == 'compact-v1'
+    columns = [decode_column(column, payload['row_count']) for column in payload['columns']]
+    rows = [[column[position] for column in columns] for position in range(payload['row_count'])]
+    notes = {f"{payload['sheet']}!{column_letter(col_index)}{sheet_row}": text
+             for sheet_row, col_index, text in payload['notes']}
+    indices = [start + step for start, length in payload['data_row_sheet_indices'] for step in range(length)]
+    return rows, notes, indices
+
+
+def test_run_length_encode():
+    assert run_length_encode([]) == []
+    assert run_length_encode([3, 4, 5, 9]) == [[3, 3], [9, 1]]
+    assert run_length_encode([1, 3, 4]) == [[1, 1], [3, 2]]
+
+
+@pytest.mark.parametrize('params', [
+    {},
+    {'start_row': 5, 'end_row': 20},
+    {'cols': '0,3,6,11'},
+    {'reviewer': 'carol'},
+    {'cursor': 11, 'page_size': 10},
+])
+def test_compact_decodes_to_the_json_response(client, params):
+    expected = load(client, **params).get_json()
+    payload = load(client, format='compact', **params).get_json()
+    rows, notes, indices = decode_compact(payload)
+    assert rows == expected['rows']
+    assert notes == expected['notes'] and notes
+    assert indices == expected['data_row_sheet_indices']
+    assert payload['column_indices'] == expected.get('columns', list(range(len(expected['header']))))
+    for field in ('header', 'reviewers', 'version', 'next_cursor', 'total_rows'):
+        assert payload.get(field) == expected.get(field), field
+
+
+def test_compact_delta_decodes_to_the_json_delta(client, book):
+    first = load(client).get_json()
+    book.sheets['Sheet1'].values[2 + 4][5] = 'changed'
+    expected = load(client, since=first['version'], refresh=1).get_json()
+    payload = load(client, since=first['version'], format='compact').get_json()
+    assert decode_compact(payload) == (expected['rows'], expected['notes'], expected['data_row_sheet_indices'])
+    assert payload['removed_row_sheet_indices'] == expected['removed_row_sheet_indices']
+
+
+def test_repeated_and_constant_columns_are_dictionary_encoded(client):
+    payload = load(client, format='compact').get_json()
+    by_index = dict(zip(payload['column_indices'], payload['columns']))
+    assert 'dict' in by_index[3] and sorted(by_index[3]['dict']) == ['alice', 'bob', 'carol', 'dave']
+    assert 'values' in by_index[1] # Names are all distinct
+    one_row = load(client, format='compact', start_row=1, end_row=1).get_json()
+    assert all('const' in column for column in one_row['columns'])
+
+
+def test_gzip_when_accepted(client):
+    identity = load(client)
+    assert 'Content-Encoding' not in identity.headers
+    assert 'Accept-Encoding' in identity.headers['Vary']
+    compressed = load(client, headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.get_data()) == identity.get_data()
+    refused = load(client, headers={'Accept-Encoding': 'gzip;q=0, identity'})
+    assert 'Content-Encoding' not in refused.headers
+
+
+def test_brotli_preferred_when_available(client):
+    brotli = pytest.importorskip('brotli')
+    identity = load(client)
+    response = load(client, headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.get_data()) == identity.get_data()
+
+
+def test_small_streamed_and_error_responses_are_not_compressed(client):
+    headers = {'Accept-Encoding': 'gzip'}
+    small = load(client, headers=headers, start_row=1, end_row=1, cols='0')
+    assert len(small.get_data()) < app.COMPRESSION_MIN_BYTES
+    assert 'Content-Encoding' not in small.headers
+    streamed = load(client, headers=headers, format='ndjson')
+    assert 'Content-Encoding' not in streamed.headers
+    error = client.get('/load-data?id=X', headers=headers)
+    assert error.status_code == 400 and 'Content-Encoding' not in error.headers
+
+
+def test_compression_can_be_turned_off(client, monkeypatch):
+    monkeypatch.setattr(app, 'RESPONSE_COMPRESSION', False)
+    assert 'Content-Encoding' not in load(client, headers={'Accept-Encoding': 'gzip'}).headers
@@ -0,0 +1,65 @@
+def load(client, **params):
+    response = client.get('/load-data', query_string=dict({'id': 'X', 'sheet': 'Sheet1'}, **params))
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def test_stale_version_gets_only_the_changed_rows(client, book):
+    first = load(client)
+    sheet = book.sheets['Sheet1']
+    sheet.values[2 + 4][5] = 'changed' # Data row 5 (sheet row 7)
+    sheet.notes[2 + 9][1] = 'new note' # Data row 10 (sheet row 12)
+
+    delta = load(client, since=first['version'], refresh=1)
+    assert delta['delta'] is True
+    assert delta['since'] == first['version']
+    assert delta['version'] != first['version']
+    assert delta['data_row_sheet_indices'] == [7, 12]
+    assert delta['rows'][0][5] == 'changed'
+    assert delta['notes']['Sheet1!B12'] == 'new note'
+    assert delta['removed_row_sheet_indices'] == []
+
+
+def test_current_version_gets_an_empty_delta(client):
+    first = load(client)
+    delta = load(client, since=first['version'])
+    assert delta['delta'] is True
+    assert delta['rows'] == [] and delta['removed_row_sheet_indices'] == []
+
+
+def test_removed_rows_are_listed(client, book):
+    first = load(client)
+    del book.sheets['Sheet1'].values[-2:]
+    delta = load(client, since=first['version'], refresh=1)
+    assert delta['delta'] is True
+    assert delta['removed_row_sheet_indices'] == [41, 42]
+
+
+def test_unknown_version_falls_back_to_a_full_reload(client):
+    full = load(client)
+    response = load(client, since=full['version'] + 12345)
+    assert 'delta' not in response
+    assert response['rows'] == full['rows']
+    assert response['notes'] == full['notes']
+    assert response['version'] == full['version']
+
+
+def test_header_change_sends_the_full_sheet(client, book):
+    first = load(client)
+    book.sheets['Sheet1'].values[1][4] = 'Renamed task'
+    response = load(client, since=first['version'], refresh=1)
+    assert 'delta' not in response
+    assert response['header'][4] == 'Renamed task'
+    assert len(response['rows']) == 40
+
+
+def test_delta_applies_the_row_filters(client, book):
+    first = load(client)
+    sheet = book.sheets['Sheet1']
+    reviewer = sheet.values[2][3]
+    other = next(name for name in ('alice', 'bob', 'carol', 'dave') if name != reviewer)
+    sheet.values[2][3] = other # Data row 1 leaves the reviewer's view
+    sheet.values[3][3] = reviewer # Data row 2 joins it
+    delta = load(client, since=first['version'], refresh=1, reviewer=reviewer)
+    assert delta['data_row_sheet_indices'] == [4]
+    assert delta['removed_row_sheet_indices'] == [3]
@@ -0,0 +1,155 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import app
+from app import EventHub, EventStreamServer
+
+KEY = ('X', 'Sheet1')
+
+
+def event_ids(text):
+    return [int(line[4:]) for line in text.splitlines() if line.startswith('id: ')]
+
+
+def test_publish_then_receive():
+    hub = EventHub()
+    hub.connect(KEY)
+    _, last_event_id = hub.pending(KEY, None)
+    hub.publish(KEY, 'cell', {"a1": "Sheet1!B3", "value": "1"})
+    hub.publish(('X', 'Other'), 'cell', {"a1": "Other!B3", "value": "2"}) # Not watched: dropped
+    pending, resume_id = hub.pending(KEY, last_event_id)
+    assert pending == [(resume_id, 'cell', {"a1": "Sheet1!B3", "value": "1"})]
+    assert hub.pending(KEY, resume_id) == ([], resume_id)
+
+
+def test_last_event_id_replays_only_missed_events():
+    hub = EventHub()
+    hub.connect(KEY)
+    for value in '123':
+        hub.publish(KEY, 'cell', {"a1": "Sheet1!B3", "value": value})
+    pending, _ = hub.pending(KEY, 1)
+    assert [data['value'] for _, _, data in pending] == ['2', '3']
+
+
+def test_client_behind_the_buffer_is_told_to_reload():
+    hub = EventHub(buffer_size=2)
+    hub.connect(KEY)
+    for value in '1234':
+        hub.publish(KEY, 'cell', {"a1": "Sheet1!B3", "value": value})
+    pending, resume_id = hub.pending(KEY, 1)
+    assert pending == [(4, 'reload', {"reason": "resync"})] and resume_id == 4
+    assert hub.pending(KEY, 99)[0][0][1] == 'reload' # Ids from before a restart
+
+
+def test_worker_streams_past_the_held_limit_poll():
+    hub = EventHub(max_held_streams=1, hold_seconds=30, retry_ms=3000)
+    held = hub.stream(KEY, None)
+    assert next(held) == 'retry: 250\n\n'
+    assert 'event: ready' in next(held)
+    received = []
+    waiter = threading.Thread(target=lambda: received.append(next(held)))
+    waiter.start()
+
+    # The held stream is using the only slot: this one gets its backlog and ends at once
+    polled = ''.join(hub.stream(KEY, None))
+    assert polled.startswith('retry: 3000\n\n')
+    assert 'event: ready' in polled
+
+    hub.publish(KEY, 'cell', {"a1": "Sheet1!B3", "value": "1"})
+    waiter.join(5)
+    assert 'event: cell' in received[0]
+    held.close()
+    assert hub.stats()['held_streams'] == 0
+
+
+@pytest.fixture
+def server():
+    hub = EventHub()
+    server = EventStreamServer(hub, host='127.0.0.1', port=0, max_connections=300).start()
+    yield server
+    server.stop()
+
+
+def open_stream(server, query='id=X&sheet=Sheet1', headers=''):
+    sock = socket.create_connection(('127.0.0.1', server.port), timeout=5)
+    sock.sendall(f'GET /events?{query} HTTP/1.1\r\nHost: localhost\r\n{headers}\r\n'.encode())
+    return sock
+
+
+def read_until(sock, marker, received=b''):
+    deadline = time.monotonic() + 5
+    while marker.encode() not in received:
+        assert time.monotonic() < deadline, received
+        received += sock.recv(65536)
+    return received.decode()
+
+
+def test_server_streams_published_events(server):
+    sock = open_stream(server)
+    head = read_until(sock, 'event: ready')
+    assert head.startswith('HTTP/1.1 200 OK\r\n')
+    assert 'Content-Type: text/event-stream' in head
+    server.hub.publish(KEY, 'cell', {"a1": "Sheet1!B3", "value": "7"})
+    body = read_until(sock, 'event: cell')
+    assert 'data: {"a1":"Sheet1!B3","value":"7"}' in body
+    sock.close()
+
+
+def test_server_resumes_from_last_event_id(server):
+    sock = open_stream(server)
+    read_until(sock, 'event: ready')
+    sock.close()
+    for value in '123':
+        server.hub.publish(KEY, 'cell', {"a1": "Sheet1!B3", "value": value})
+    resumed = open_stream(server, headers='Last-Event-ID: 1\r\n')
+    body = read_until(resumed, '"value":"3"')
+    assert event_ids(body) == [2, 3]
+    resumed.close()
+    by_parameter = open_stream(server, query='id=X&sheet=Sheet1&last_event_id=2')
+    assert event_ids(read_until(by_parameter, '"value":"3"')) == [3]
+    by_parameter.close()
+
+
+def test_server_holds_many_streams_on_one_thread(server):
+    threads_before = threading.active_count()
+    socks = [open_stream(server) for _ in range(200)]
+    for sock in socks:
+        read_until(sock, 'event: ready')
+    assert server.stats()['open_streams'] == 200
+    assert threading.active_count() == threads_before
+    server.hub.publish(KEY, 'cell', {"a1": "Sheet1!B3", "value": "1"})
+    for sock in socks:
+        read_until(sock, 'event: cell')
+        sock.close()
+
+
+def test_server_rejects_connections_past_the_limit():
+    server = EventStreamServer(EventHub(), host='127.0.0.1', port=0, max_connections=2).start()
+    try:
+        socks = [open_stream(server) for _ in range(2)]
+        for sock in socks:
+            read_until(sock, 'event: ready')
+        rejected = open_stream(server)
+        assert read_until(rejected, '}').startswith('HTTP/1.1 503')
+        assert server.stats()['rejected'] == 1
+    finally:
+        server.stop()
+
+
+def test_server_rejects_bad_requests(server):
+    missing = open_stream(server, query='id=X')
+    assert read_until(missing, '}').startswith('HTTP/1.1 400')
+    sock = socket.create_connection(('127.0.0.1', server.port), timeout=5)
+    sock.sendall(b'GET /other HTTP/1.1\r\n\r\n')
+    assert read_until(sock, '}').startswith('HTTP/1.1 404')
+
+
+def test_route_redirects_to_the_stream_server(server, monkeypatch):
+    monkeypatch.setattr(app, 'event_server', server)
+    client = app.app.test_client()
+    response = client.get('/events?id=X&sheet=Sheet1', headers={'Last-Event-ID': '5'})
+    assert response.status_code == 307
+    assert response.headers['Location'] == f'http://localhost:{server.port}/events?id=X&sheet=Sheet1&last_event_id=5'
@@ -0,0 +1,96 @@
+import socket
+import threading
+import time
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import app
+from app import HttpTransportPool
+
+
+class StaticCredentials:
+    token = 'token'
+    expiry = None
+    valid = True
+
+    def apply(self, headers):
+        headers['authorization'] = 'Bearer token'
+
+    def before_request(self, request, method, url, headers):
+        self.apply(headers)
+
+
+@pytest.fixture(autouse=True)
+def credentials(monkeypatch):
+    monkeypatch.setattr(app.sheets_provider, 'get_credentials', StaticCredentials)
+
+
+def closed_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_transport_is_returned_after_an_exception():
+    pool = HttpTransportPool(size=1, http2=False)
+    with pytest.raises(RuntimeError):
+        with pool.transport() as first:
+            raise RuntimeError('request failed')
+    assert pool.stats()['idle'] == 1
+    with pool.transport() as second:
+        assert second is first
+    assert pool.stats()['transports_created'] == 1
+
+
+def test_transport_is_returned_after_a_connection_error():
+    pool = HttpTransportPool(size=1, http2=False)
+    with pytest.raises(OSError):
+        with pool.transport() as http:
+            http.request(f'http://127.0.0.1:{closed_port()}/v4/spreadsheets/X')
+    assert pool.stats()['idle'] == 1
+
+
+def test_waiting_caller_gets_a_transport_released_by_an_exception():
+    pool = HttpTransportPool(size=1, http2=False)
+    checked_out = threading.Event()
+    release = threading.Event()
+    def fail_while_holding():
+        with pytest.raises(RuntimeError):
+            with pool.transport():
+                checked_out.set()
+                release.wait(5)
+                raise RuntimeError('request failed')
+    holder = threading.Thread(target=fail_while_holding)
+    holder.start()
+    checked_out.wait(5)
+    threading.Timer(0.1, release.set).start()
+    started = time.monotonic()
+    with pool.transport():
+        assert time.monotonic() - started < 5
+    holder.join(5)
+    assert pool.stats()['waits'] == 1
+    assert pool.stats()['transports_created'] == 1 and pool.stats()['idle'] == 1
+
+
+def test_scheduler_returns_the_transport_on_api_errors(monkeypatch):
+    pool = HttpTransportPool(size=2, http2=False)
+    monkeypatch.setattr(app, 'http_pool', pool)
+
+    class FailingRequest:
+        method = 'POST'
+        methodId = 'sheets.spreadsheets.batchUpdate'
+        uri = 'https://sheets/x'
+
+        def execute(self, http=None):
+            assert http is not None
+            raise HttpError(httplib2.Response({'status': 400}), b'{}')
+
+    scheduler = app.SheetsApiScheduler(read_per_minute=0, write_per_minute=0)
+    for _ in range(5):
+        with pytest.raises(HttpError):
+            scheduler.execute(FailingRequest())
+    assert pool.stats()['idle'] == 1 and pool.stats()['transports_created'] == 1
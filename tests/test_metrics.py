@@ -0,0 +1,100 @@
+import collections
+import math
+import re
+
+import app
+from app import Counter, Histogram
+
+NAME = r'[a-zA-Z_:][a-zA-Z0-9_:]*'
+LABEL = r'[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\[\\"n])*"'
+SAMPLE = re.compile(rf'({NAME})(?:\{{({LABEL}(?:,{LABEL})*)\}})? (\S+)')
+TYPES = ('counter', 'gauge', 'histogram', 'summary', 'untyped')
+
+
+def parse_exposition(text):
+    """Parses Prometheus text format 0.0.4, asserting it's well-formed. Returns
+    {family: {'type': ..., 'samples': [(name, {label: value}, value)]}}."""
+    assert text.endswith('\n')
+    families = collections.OrderedDict()
+    current = None
+    for line in text[:-1].split('\n'):
+        if line.startswith('# HELP ') or line.startswith('# TYPE '):
+            keyword, name, rest = line[2:6], *line[7:].split(' ', 1)
+            assert re.fullmatch(NAME, name), line
+            family = families.setdefault(name, {'type': None, 'help': None, 'samples': []})
+            assert not family['samples'], f"{keyword} after samples: {line}"
+            if keyword == 'TYPE':
+                assert family['type'] is None and rest in TYPES, line
+                family['type'] = rest
+            else:
+                assert family['help'] is None, line
+                family['help'] = rest
+            current = name
+            continue
+        assert not line.startswith('#') and line, repr(line)
+        match = SAMPLE.fullmatch(line)
+        assert match, line
+        name, labels, value = match.groups()
+        labels = dict(re.findall(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"', labels or ''))
+        float(value) # Raises on anything Prometheus can't read
+        family_name = name
+        if families.get(current, {}).get('type') == 'histogram' and name in (current + '_bucket', current + '_sum', current + '_count'):
+            family_name = current
+        assert family_name == current, f"sample {name} outside its family ({current})"
+        families[current]['samples'].append((name, labels, float(value)))
+    return families
+
+
+def check_histogram(name, samples):
+    series = collections.defaultdict(list)
+    sums, counts = {}, {}
+    for sample_name, labels, value in samples:
+        key = tuple(sorted((k, v) for k, v in labels.items() if k != 'le'))
+        if sample_name == name + '_bucket':
+            series[key].append((float(labels['le']), value))
+        elif sample_name == name + '_sum':
+            sums[key] = value
+        else:
+            counts[key] = value
+    assert set(series) == set(sums) == set(counts)
+    for key, buckets in series.items():
+        bounds = [bound for bound, _ in buckets]
+        assert bounds == sorted(bounds) and bounds[-1] == math.inf
+        values = [value for _, value in buckets]
+        assert values == sorted(values), (name, key) # Cumulative
+        assert values[-1] == counts[key]
+
+
+def test_metrics_endpoint_is_valid_exposition_format(client):
+    client.get('/load-data?id=X&sheet=Sheet1')
+    client.get('/load-data?id=X&sheet=Sheet1&format=ndjson&refresh=1').get_data()
+    client.get('/load-data?id=X')
+    client.get('/no-such-page')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    families = parse_exposition(response.get_data(as_text=True))
+
+    for name, family in families.items():
+        assert family['type'] is not None and family['help'], name
+        if family['type'] == 'histogram':
+            check_histogram(name, family['samples'])
+        if family['type'] == 'counter':
+            assert all(value >= 0 for _, _, value in family['samples']), name
+
+    statuses = {(labels['route'], labels['status']) for _, labels, _ in families['sheet_editor_responses_total']['samples']}
+    assert {('/load-data', '200'), ('/load-data', '400'), ('unmatched', '404')} <= statuses
+    assert families['sheet_editor_parsed_rows_total']['samples'][0][2] >= 80
+    assert families['sheet_editor_snapshot_cache_entries']['type'] == 'gauge'
+
+
+def test_label_values_are_escaped():
+    counter = Counter('test_total', 'Test.', ('sheet',))
+    counter.inc(2, 'say "hi"\\\nbye')
+    histogram = Histogram('test_seconds', 'Test.', ('sheet',), (0.1, 1))
+    histogram.observe(0.5, 'a"b')
+    histogram.observe(7, 'a"b')
+    families = parse_exposition('\n'.join(counter.render() + histogram.render()) + '\n')
+    assert families['test_total']['samples'] == [('test_total', {'sheet': 'say \\"hi\\"\\\\\\nbye'}, 2.0)]
+    check_histogram('test_seconds', families['test_seconds']['samples'])
+    assert [value for name, _, value in families['test_seconds']['samples'] if name.endswith('_bucket')] == [0, 1, 2]
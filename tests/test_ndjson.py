@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+import app
+
+
+def load_json(client, **params):
+    response = client.get('/load-data', query_string=dict({'id': 'X', 'sheet': 'Sheet1'}, **params))
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def load_ndjson(client, **params):
+    """Reassembles a format=ndjson body into the JSON response's fields."""
+    response = client.get('/load-data', query_string=dict({'id': 'X', 'sheet': 'Sheet1', 'format': 'ndjson'}, **params))
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['type'] for line in lines[:1] + lines[-2:]] == ['header', 'notes', 'end'], lines
+    end = lines[-1]
+    rows, indices = [], []
+    for line in lines[1:-2]:
+        assert line['type'] == 'rows'
+        rows.extend(line['rows'])
+        indices.extend(line['data_row_sheet_indices'])
+    # Rows streamed straight from the API are unpadded; max_cols gives the width
+    width = len(params['cols'].split(',')) if 'cols' in params else end['max_cols']
+    rows = [row + [''] * (width - len(row)) for row in rows]
+    assert end['row_count'] == len(rows)
+    return dict(end, header=lines[0]['header'], rows=rows, data_row_sheet_indices=indices,
+                notes=lines[-2]['notes'], line_count=len(lines))
+
+
+PARAMS = [
+    {},
+    {'start_row': 5, 'end_row': 20},
+    {'cols': '0,3,7'},
+    {'reviewer': 'bob'},
+    {'hide_zero_sum': 1, 'sum_cols': '6'},
+    {'reviewer': 'alice', 'offset': 2, 'page_size': 4},
+]
+
+
+@pytest.mark.parametrize('params', PARAMS)
+def test_ndjson_matches_json_streamed_and_cached(client, params):
+    streamed = load_ndjson(client, **params) # Nothing cached: rows are sent as they are parsed
+    assert app.snapshot_cache.get(('X', 'Sheet1')) is not None # ...and the snapshot is cached at the end
+    cached = load_ndjson(client, **params)
+    expected = load_json(client, **params)
+    for field in ('header', 'rows', 'data_row_sheet_indices', 'notes', 'reviewers'):
+        assert streamed[field] == expected[field], field
+        assert cached[field] == expected[field], field
+    assert streamed['version'] == cached['version'] == expected['version']
+    for field in ('total_rows', 'next_offset'):
+        assert streamed.get(field) == cached.get(field) == expected.get(field), field
+
+
+def test_rows_are_split_across_lines(client, monkeypatch):
+    monkeypatch.setattr(app, 'NDJSON_ROWS_PER_LINE', 7)
+    response = load_ndjson(client)
+    assert len(response['rows']) == 40
+    assert response['line_count'] == 3 + 6 # header, notes, end and ceil(40 / 7) rows lines
+
+
+def test_failed_fetch_ends_with_an_error_line(client, monkeypatch):
+    monkeypatch.setattr(app.sheets_provider, 'get_service', lambda: None)
+    response = client.get('/load-data?id=X&sheet=Sheet1&format=ndjson')
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines == [{"type": "error", "error": "Server authentication error."}]
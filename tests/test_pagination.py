@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+import app
+
+
+def load(client, **params):
+    response = client.get('/load-data', query_string=dict({'id': 'X', 'sheet': 'Sheet1'}, **params))
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def pages(client, field, page_size, **params):
+    """Follows next_cursor (field='cursor', from 1) or next_offset (field='offset', from 0) to the end."""
+    result, position = [], 1 if field == 'cursor' else 0
+    while position is not None:
+        page = load(client, **{field: position, 'page_size': page_size}, **params)
+        result.append(page)
+        position = page[f'next_{field}']
+        assert len(result) <= 100
+    return result
+
+
+def joined(page_list, field):
+    return [item for page in page_list for item in page[field]]
+
+
+def sheet_row(a1):
+    return app.parse_a1_notation(a1)[1] + 1
+
+
+def assert_pages_partition(page_list, full):
+    assert joined(page_list, 'rows') == full['rows']
+    assert joined(page_list, 'data_row_sheet_indices') == full['data_row_sheet_indices']
+    merged_notes = {}
+    for page in page_list:
+        page_rows = set(page['data_row_sheet_indices'])
+        assert all(sheet_row(a1) in page_rows or sheet_row(a1) < app.FIRST_DATA_SHEET_ROW for a1 in page['notes'])
+        merged_notes.update(page['notes'])
+    assert merged_notes == full['notes']
+
+
+@pytest.mark.parametrize('page_size', [1, 7, 40, 500])
+def test_cursor_pages_cover_the_sheet_once(client, page_size):
+    full = load(client)
+    cursor_pages = pages(client, 'cursor', page_size)
+    assert_pages_partition(cursor_pages, full)
+    assert len(cursor_pages) == -(-40 // page_size)
+    assert all(page['total_rows'] == 40 for page in cursor_pages)
+
+
+@pytest.mark.parametrize('filters', [{}, {'reviewer': 'alice'}, {'hide_zero_sum': 1, 'sum_cols': '11'},
+                                     {'reviewer': 'bob', 'start_row': 11, 'end_row': 35}])
+def test_offset_pages_cover_the_filtered_view_once(client, filters):
+    full = load(client, **filters)
+    offset_pages = pages(client, 'offset', 4, **filters)
+    assert_pages_partition(offset_pages, full)
+    assert [page['offset'] for page in offset_pages] == list(range(0, max(len(full['rows']), 1), 4))
+    assert all(page['total_rows'] == len(full['rows']) for page in offset_pages)
+
+
+@pytest.mark.parametrize('cursor, page_size', [(1, 10), (11, 10), (35, 10), (40, 1), (41, 5)])
+def test_cursor_and_offset_pages_line_up(client, cursor, page_size):
+    load(client) # Cached, so the cursor page carries total_rows too
+    by_cursor = load(client, cursor=cursor, page_size=page_size)
+    by_offset = load(client, offset=cursor - 1, page_size=page_size)
+    for field in ('rows', 'data_row_sheet_indices', 'notes', 'total_rows'):
+        assert by_cursor[field] == by_offset[field], field
+    assert (by_cursor['next_cursor'] is None) == (by_offset['next_offset'] is None)
+    if by_cursor['next_cursor'] is not None:
+        assert by_cursor['next_cursor'] - 1 == by_offset['next_offset']
+
+
+def test_ndjson_offset_pages_match_json(client):
+    for offset in (0, 8):
+        body = client.get(f'/load-data?id=X&sheet=Sheet1&format=ndjson&reviewer=dave&offset={offset}&page_size=8')
+        lines = [json.loads(line) for line in body.get_data(as_text=True).splitlines()]
+        expected = load(client, reviewer='dave', offset=offset, page_size=8)
+        assert joined([line for line in lines if line['type'] == 'rows'], 'data_row_sheet_indices') == expected['data_row_sheet_indices']
+        assert {key: lines[-1][key] for key in ('offset', 'total_rows', 'next_offset')} == \
+               {key: expected[key] for key in ('offset', 'total_rows', 'next_offset')}
+
+
+def test_cursor_pages_before_anything_is_cached(client):
+    # Nothing cached: pages are fetched as windows, and without the data length the grid's
+    # rowCount (1000 here) bounds the paging, so the trailing pages are empty
+    cold = pages(client, 'cursor', 200, cols='0,3')
+    assert all(page['version'] is None for page in cold)
+    assert len(cold) == 5 and cold[-1]['rows'] == []
+    assert joined(cold, 'rows') == load(client, cols='0,3', refresh=1)['rows']
+
+
+@pytest.mark.parametrize('query', ['cursor=0', 'cursor=1&page_size=0', 'offset=-1', 'offset=0&page_size=-3',
+                                   'cursor=1&offset=0'])
+def test_bad_paging_parameters_are_rejected(client, query):
+    response = client.get(f'/load-data?id=X&sheet=Sheet1&{query}')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
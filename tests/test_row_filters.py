@@ -0,0 +1,95 @@
+import pytest
+
+import app
+from app import is_nonzero_sum_value, resolve_sum_columns, row_matches_filters
+
+
+def load(client, **params):
+    response = client.get('/load-data', query_string=dict({'id': 'X', 'sheet': 'Sheet1'}, **params))
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+@pytest.mark.parametrize('value, nonzero', [
+    ('', False), ('  ', False), ('0', False), ('0.0', False), ('-0', False), ('0,5', False),
+    ('1', True), ('0.5', True), ('-2', True), ('3 pts', True), ('abc', True), ('Infinity', True),
+])
+def test_is_nonzero_sum_value(value, nonzero):
+    assert is_nonzero_sum_value(value) is nonzero
+
+
+def test_resolve_sum_columns():
+    header = ['№', 'Name', '∑', 'Task', '∑']
+    assert resolve_sum_columns(header) == [2, 4]
+    assert resolve_sum_columns(header, [4, 1, 9]) == [4]
+    assert resolve_sum_columns(header, []) == []
+    assert resolve_sum_columns([]) == []
+
+
+def test_row_matches_filters():
+    row = ['1', 'Ann', 'ann', 'bob', '0', '2']
+    assert row_matches_filters(row)
+    assert row_matches_filters(row, reviewer='bob')
+    assert not row_matches_filters(row, reviewer='alice')
+    assert not row_matches_filters(['1', 'Ann'], reviewer='bob') # Too short to have a reviewer
+    assert row_matches_filters(row, sum_columns=[4, 5]) # Any nonzero sum keeps the row
+    assert not row_matches_filters(row, sum_columns=[4])
+    assert not row_matches_filters(row, sum_columns=[9]) # Missing cells count as blank
+    assert not row_matches_filters(row, reviewer='alice', sum_columns=[5])
+
+
+def expected_rows(full, reviewer=None, sum_columns=()):
+    return [(row, index) for row, index in zip(full['rows'], full['data_row_sheet_indices'])
+            if row_matches_filters(row, reviewer, sum_columns)]
+
+
+@pytest.mark.parametrize('params, reviewer, sum_cols', [
+    ({'reviewer': 'bob'}, 'bob', None),
+    ({'hide_zero_sum': 1}, None, None),
+    ({'hide_zero_sum': 'true', 'sum_cols': '11'}, None, [11]),
+    ({'hide_zero_sum': 1, 'sum_cols': '2,6'}, None, [2, 6]), # Column C isn't a '∑' column
+    ({'reviewer': 'dave', 'hide_zero_sum': 1}, 'dave', None),
+    ({'reviewer': 'carol', 'start_row': 10, 'end_row': 30}, 'carol', None),
+    ({'reviewer': 'nobody'}, 'nobody', None),
+])
+def test_filtered_response_matches_filtering_the_full_sheet(client, params, reviewer, sum_cols):
+    full = load(client)
+    sum_columns = resolve_sum_columns(full['header'], sum_cols) if 'hide_zero_sum' in params else ()
+    if 'start_row' in params:
+        window = slice(params['start_row'] - 1, params['end_row'])
+        full = dict(full, rows=full['rows'][window], data_row_sheet_indices=full['data_row_sheet_indices'][window])
+    expected = expected_rows(full, reviewer, sum_columns)
+    filtered = load(client, **params)
+    assert list(zip(filtered['rows'], filtered['data_row_sheet_indices'])) == expected
+    assert 0 < len(expected) < 40 or reviewer == 'nobody'
+    # Notes come only from the rows returned (and the rows above the data)
+    returned = set(filtered['data_row_sheet_indices'])
+    for a1 in filtered['notes']:
+        sheet_row = app.parse_a1_notation(a1)[1] + 1
+        assert sheet_row in returned or sheet_row < app.FIRST_DATA_SHEET_ROW
+    assert filtered['reviewers'] == full['reviewers'] # Every reviewer, for the filter menu
+
+
+def test_indexed_filters_agree_with_the_row_check(client, book):
+    load(client)
+    snapshot = app.snapshot_cache.get(('X', 'Sheet1'))
+    for reviewer in (None, 'alice', 'bob', 'nobody'):
+        for sum_columns in ((), (6,), (11,), (6, 11)):
+            expected = [position for position, row in enumerate(snapshot.rows)
+                        if row_matches_filters(row, reviewer, sum_columns)]
+            assert snapshot.filter_positions(reviewer, sum_columns, 0, len(snapshot.rows)) == expected
+            assert snapshot.filter_positions(reviewer, sum_columns, 5, 25) == [p for p in expected if 5 <= p < 25]
+
+
+def test_filters_see_edits(client):
+    before = load(client, hide_zero_sum=1, sum_cols='11')['data_row_sheet_indices']
+    banned_row = before[0]
+    response = client.post('/ban-cell', json={'id': 'X', 'a1': f'Sheet1!L{banned_row}'}) # Sets the '∑' cell to 0
+    assert response.status_code == 200, response.get_data(as_text=True)
+    after = load(client, hide_zero_sum=1, sum_cols='11')['data_row_sheet_indices']
+    assert after == before[1:]
+
+
+def test_bad_sum_cols_is_rejected(client):
+    response = client.get('/load-data?id=X&sheet=Sheet1&hide_zero_sum=1&sum_cols=x')
+    assert response.status_code == 400
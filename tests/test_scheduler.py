@@ -0,0 +1,162 @@
+import contextlib
+import threading
+import time
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import app
+from app import SheetsApiScheduler, TokenBucket
+
+
+def test_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=20, capacity=3)
+    assert all(bucket.acquire() < 0.01 for _ in range(3))
+    assert 0.03 < bucket.acquire() < 0.5 # One token every 50 ms
+    assert bucket.stats()['waits'] == 1
+
+
+def test_drained_bucket_waits_for_a_token():
+    bucket = TokenBucket(rate=20, capacity=5)
+    bucket.drain()
+    assert bucket.acquire() > 0.03
+
+
+@pytest.mark.parametrize('rate', [0, -1])
+def test_zero_rate_means_no_limit(rate):
+    bucket = TokenBucket(rate=rate, capacity=1)
+    bucket.drain()
+    assert [bucket.acquire() for _ in range(100)] == [0.0] * 100
+    SheetsApiScheduler(read_per_minute=0, write_per_minute=0).read_bucket.acquire()
+
+
+def http_error(status, retry_after=None):
+    headers = {'status': status}
+    if retry_after is not None:
+        headers['retry-after'] = retry_after
+    return HttpError(httplib2.Response(headers), b'{}')
+
+
+class ScriptedRequest:
+    """Raises the queued errors in turn, then returns 'ok'."""
+
+    def __init__(self, *errors, method='GET', uri='https://sheets/x'):
+        self.errors = list(errors)
+        self.method = method
+        self.methodId = 'sheets.spreadsheets.get'
+        self.uri = uri
+        self.calls = 0
+
+    def execute(self, http=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(app.http_pool, 'transport', contextlib.nullcontext)
+    monkeypatch.setattr(app.time, 'sleep', slept.append)
+    return slept
+
+
+def scheduler(**kwargs):
+    return SheetsApiScheduler(**dict({'read_per_minute': 0, 'write_per_minute': 0, 'max_retries': 3,
+                                      'backoff_base': 1, 'backoff_max': 8}, **kwargs))
+
+
+def test_retryable_errors_are_retried_with_backoff(sleeps):
+    api = scheduler()
+    request = ScriptedRequest(http_error(503), http_error(500))
+    assert api.execute(request) == 'ok'
+    assert request.calls == 3
+    assert len(sleeps) == 2 and 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 2
+    assert api.stats()['retries'] == 2
+
+
+def test_backoff_is_capped_and_honours_retry_after(monkeypatch):
+    api = scheduler(backoff_max=4)
+    monkeypatch.setattr(app.random, 'uniform', lambda low, high: high)
+    assert [api._backoff_delay(attempt, None) for attempt in range(5)] == [1, 2, 4, 4, 4]
+    assert api._backoff_delay(0, '7') == 7
+    assert api._backoff_delay(3, '1') == 4
+    assert api._backoff_delay(0, 'Wed, 21 Oct 2026 07:28:00 GMT') == 1
+
+
+def test_429_drains_the_bucket(sleeps):
+    api = scheduler(read_per_minute=600, burst=5)
+    request = ScriptedRequest(http_error(429, retry_after='0'))
+    assert api.execute(request) == 'ok'
+    assert api.read_bucket.stats()['waits'] == 1 # The retry waited for a fresh token
+
+
+def test_gives_up_after_max_retries(sleeps):
+    api = scheduler(max_retries=2)
+    request = ScriptedRequest(*[http_error(503)] * 5)
+    with pytest.raises(HttpError):
+        api.execute(request)
+    assert request.calls == 3
+    assert api.stats()['failures'] == 1
+
+
+def test_client_errors_are_not_retried(sleeps):
+    api = scheduler()
+    request = ScriptedRequest(http_error(404))
+    with pytest.raises(HttpError):
+        api.execute(request)
+    assert request.calls == 1 and sleeps == []
+
+
+class BlockingRequest(ScriptedRequest):
+    def __init__(self, *errors, **kwargs):
+        super().__init__(*errors, **kwargs)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def execute(self, http=None):
+        self.started.set()
+        self.release.wait(5)
+        return super().execute(http)
+
+
+def run_concurrently(api, requests):
+    results = [None] * len(requests)
+    def run(index):
+        try:
+            results[index] = api.execute(requests[index])
+        except Exception as e:
+            results[index] = e
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(len(requests))]
+    threads[0].start()
+    requests[0].started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while api.stats()['coalesced'] < len(requests) - 1 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    requests[0].release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_identical_reads_share_one_call(monkeypatch):
+    monkeypatch.setattr(app.http_pool, 'transport', contextlib.nullcontext)
+    api = scheduler()
+    requests = [BlockingRequest() for _ in range(5)]
+    assert run_concurrently(api, requests) == ['ok'] * 5
+    assert [request.calls for request in requests] == [1, 0, 0, 0, 0]
+    assert api.stats()['coalesced'] == 4 and api.stats()['inflight'] == 0
+
+
+def test_shared_read_failure_reaches_every_caller(monkeypatch):
+    monkeypatch.setattr(app.http_pool, 'transport', contextlib.nullcontext)
+    api = scheduler()
+    requests = [BlockingRequest(http_error(403))] + [BlockingRequest() for _ in range(3)]
+    results = run_concurrently(api, requests)
+    assert all(isinstance(result, HttpError) for result in results)
+    assert sum(request.calls for request in requests) == 1
+    assert api.execute(ScriptedRequest()) == 'ok' # The failed call isn't left in flight
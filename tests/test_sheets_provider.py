@@ -0,0 +1,126 @@
+import datetime
+import socket
+import threading
+import time
+
+import pytest
+
+import app
+from app import SheetsServiceProvider, _GuardedCredentials
+
+
+def utc_now():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class FakeCredentials:
+    """Just enough of google.oauth2 service account credentials for the provider."""
+
+    def __init__(self, token=None, expires_in=None, refresh_seconds=0.0, fail=False):
+        self.token = token
+        self.expiry = utc_now() + datetime.timedelta(seconds=expires_in) if expires_in is not None else None
+        self.refresh_seconds = refresh_seconds
+        self.fail = fail
+        self.refreshes = 0
+
+    @property
+    def valid(self):
+        return self.token is not None and self.expiry is not None and self.expiry > utc_now()
+
+    def refresh(self, request):
+        self.refreshes += 1
+        time.sleep(self.refresh_seconds)
+        if self.fail:
+            raise RuntimeError('token endpoint unavailable')
+        self.token = f'token-{self.refreshes}'
+        self.expiry = utc_now() + datetime.timedelta(hours=1)
+
+    def apply(self, headers):
+        headers['authorization'] = f'Bearer {self.token}'
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    def make(creds, **kwargs):
+        monkeypatch.setattr(app, 'load_credentials', lambda: creds)
+        return SheetsServiceProvider(**kwargs)
+    return make
+
+
+def run_threads(target, count):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+    def run(index):
+        barrier.wait()
+        results[index] = target()
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+
+def test_concurrent_callers_share_one_refresh(provider):
+    creds = FakeCredentials(refresh_seconds=0.2) # No token yet
+    sheets = provider(creds)
+    results = run_threads(sheets.get_credentials, 8)
+    assert creds.refreshes == 1
+    assert all(result is creds for result in results)
+    assert creds.token == 'token-1'
+    assert sheets.stats()['token_refreshes'] == 1
+
+
+def test_rejected_token_is_refreshed_once(provider):
+    creds = FakeCredentials(token='token-0', expires_in=3600, refresh_seconds=0.2)
+    sheets = provider(creds)
+    guarded = _GuardedCredentials(sheets.get_credentials(), sheets)
+    run_threads(lambda: guarded.refresh(None), 5) # Five requests got a 401 with token-0
+    assert creds.refreshes == 1 and creds.token == 'token-1'
+    sheets.refresh_token(creds, stale_token='token-0') # A late 401 for the old token
+    assert creds.refreshes == 1
+
+
+def test_token_near_expiry_is_refreshed_in_the_background(provider):
+    creds = FakeCredentials(token='token-0', expires_in=60, refresh_seconds=0.5)
+    sheets = provider(creds, refresh_margin_seconds=300)
+    started = time.monotonic()
+    assert sheets.get_credentials() is creds
+    assert time.monotonic() - started < 0.25 # Didn't wait for the refresh
+    deadline = time.monotonic() + 5
+    while creds.token != 'token-1':
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert creds.refreshes == 1
+
+
+def test_failed_refresh_backs_off(provider):
+    creds = FakeCredentials(fail=True)
+    sheets = provider(creds)
+    assert sheets.get_credentials() is creds # The request goes ahead and gets its own error
+    assert sheets.get_credentials() is creds
+    assert creds.refreshes == 1 # Not retried within 30 seconds
+    assert sheets.stats()['token_refresh_failures'] == 1
+
+
+def test_refresh_times_out_when_the_token_endpoint_hangs(provider):
+    pytest.importorskip('cryptography')
+    from google.oauth2 import service_account
+    from bench.fake_sheets import fake_credentials
+
+    silent = socket.socket()
+    silent.bind(('127.0.0.1', 0))
+    silent.listen(8) # Accepts connections, never answers
+    try:
+        token_uri = f'http://127.0.0.1:{silent.getsockname()[1]}/token'
+        creds = service_account.Credentials.from_service_account_info(fake_credentials(token_uri), scopes=app.SCOPES)
+        sheets = provider(creds, refresh_timeout=0.3)
+        started = time.monotonic()
+        results = run_threads(sheets.get_credentials, 3)
+        assert 0.3 <= time.monotonic() - started < 5 # One attempt, cut off by the timeout
+        assert all(result is creds for result in results)
+        assert not creds.valid
+        assert sheets.stats()['token_refresh_failures'] == 1
+        assert sheets.stats()['token_refreshes'] == 0
+    finally:
+        silent.close()
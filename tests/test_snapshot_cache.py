@@ -0,0 +1,227 @@
+import time
+
+import app
+from app import SheetSnapshot, SnapshotCache, build_delta_response
+
+HEADER = ['№', 'ФИО', 'Логин', 'проверяющий', 'Задача 1', 'Задача 2']
+
+
+def make_snapshot(rows=None, notes=None, header=HEADER):
+    if rows is None:
+        rows = [
+            ['1', 'Ann', 'ann', 'alice', '0', '0'],
+            ['2', 'Bob', 'bob', 'bob', '3', '0'],
+            ['3', 'Cid', 'cid', 'alice', '0', '5'],
+        ]
+    indices = list(range(app.FIRST_DATA_SHEET_ROW, app.FIRST_DATA_SHEET_ROW + len(rows)))
+    return SheetSnapshot(header, rows, dict(notes or {}), indices)
+
+
+# --- SnapshotCache ---
+
+def test_get_returns_stored_snapshot_and_counts_hits():
+    cache = SnapshotCache(ttl=60, max_entries=4, max_bytes=10 ** 6)
+    snapshot = make_snapshot()
+    assert cache.get(('X', 'Sheet1')) is None
+    assert cache.put(('X', 'Sheet1'), snapshot)
+    assert cache.get(('X', 'Sheet1')) is snapshot
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+    assert stats['bytes'] == snapshot.size_bytes
+
+
+def test_evicts_least_recently_used_entry_by_count():
+    cache = SnapshotCache(ttl=60, max_entries=2, max_bytes=10 ** 6)
+    cache.put('a', make_snapshot())
+    cache.put('b', make_snapshot())
+    cache.get('a') # 'b' is now the least recently used
+    cache.put('c', make_snapshot())
+    assert cache.keys() == ['a', 'c']
+    assert cache.stats()['evictions'] == 1
+
+
+def test_evicts_until_under_byte_limit():
+    snapshot = make_snapshot()
+    cache = SnapshotCache(ttl=60, max_entries=10, max_bytes=2 * snapshot.size_bytes)
+    for key in 'abc':
+        cache.put(key, make_snapshot())
+    assert cache.keys() == ['b', 'c']
+    assert cache.stats()['bytes'] <= cache.max_bytes
+
+
+def test_snapshot_larger_than_byte_limit_is_not_cached():
+    snapshot = make_snapshot()
+    cache = SnapshotCache(ttl=60, max_entries=10, max_bytes=snapshot.size_bytes - 1)
+    assert not cache.put('a', snapshot)
+    assert cache.get('a') is None
+
+
+def test_expired_entry_is_dropped():
+    cache = SnapshotCache(ttl=60, max_entries=4, max_bytes=10 ** 6)
+    snapshot = make_snapshot()
+    cache.put('a', snapshot)
+    snapshot.fetched_at = time.monotonic() - 61
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['expired'], stats['entries'], stats['bytes']) == (1, 0, 0)
+
+
+def test_write_bumps_generation_and_discards_older_fetch():
+    cache = SnapshotCache(ttl=60, max_entries=4, max_bytes=10 ** 6)
+    key = ('X', 'Sheet1')
+    generation = cache.generation(key)
+    cache.update(key, lambda snapshot: snapshot.with_value(2, 4, '0')) # Nothing cached yet
+    assert cache.generation(key) == generation + 1
+    assert not cache.put(key, make_snapshot(), generation)
+    assert cache.get(key) is None
+    assert cache.put(key, make_snapshot(), cache.generation(key))
+
+
+def test_update_applies_write_without_extending_ttl():
+    cache = SnapshotCache(ttl=60, max_entries=4, max_bytes=10 ** 6)
+    snapshot = make_snapshot()
+    snapshot.fetched_at -= 30
+    cache.put('a', snapshot)
+    cache.update('a', lambda cached: cached.with_note('Sheet1!B3', 'hi'))
+    updated = cache.get('a')
+    assert updated is not snapshot
+    assert updated.notes == {'Sheet1!B3': 'hi'}
+    assert updated.fetched_at == snapshot.fetched_at
+    assert cache.stats()['write_updates'] == 1
+
+
+def test_invalidate_drops_entry():
+    cache = SnapshotCache(ttl=60, max_entries=4, max_bytes=10 ** 6)
+    cache.put('a', make_snapshot())
+    cache.invalidate('a')
+    assert cache.get('a') is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_listeners_see_fetches_and_writes():
+    cache = SnapshotCache(ttl=60, max_entries=4, max_bytes=10 ** 6)
+    seen = []
+    cache.listeners.append(lambda key, snapshot, is_write: seen.append((key, snapshot is None, is_write)))
+    cache.put('a', make_snapshot())
+    cache.update('a', lambda snapshot: snapshot.with_note('Sheet1!A3', 'x'))
+    cache.invalidate('a')
+    assert seen == [('a', False, False), ('a', False, True), ('a', True, True)]
+
+
+def test_fingerprints_of_past_versions_are_remembered():
+    cache = SnapshotCache(ttl=60, max_entries=4, max_bytes=10 ** 6)
+    snapshot = make_snapshot()
+    cache.put('a', snapshot)
+    cache.update('a', lambda cached: cached.with_value(2, 4, '7'))
+    assert cache.fingerprint('a', snapshot.version) == snapshot.fingerprint()
+    assert cache.fingerprint('a', cache.get('a').version) == cache.get('a').fingerprint()
+    assert cache.fingerprint('a', -1) is None
+
+
+# --- SheetSnapshot copy-on-write writes ---
+
+def test_with_note_copies_and_leaves_original_untouched():
+    snapshot = make_snapshot(notes={'Sheet1!B4': 'old'})
+    updated = snapshot.with_note('Sheet1!C3', 'new')
+    assert snapshot.notes == {'Sheet1!B4': 'old'}
+    assert updated.notes == {'Sheet1!B4': 'old', 'Sheet1!C3': 'new'}
+    assert updated.version != snapshot.version
+    assert updated.notes_for_row(3) == [('Sheet1!C3', 'new')]
+    assert snapshot.notes_for_row(3) == []
+
+
+def test_with_note_empty_text_clears():
+    snapshot = make_snapshot(notes={'Sheet1!B4': 'old'})
+    assert snapshot.with_note('Sheet1!B4', '').notes == {}
+
+
+def test_with_value_copies_only_the_written_row():
+    snapshot = make_snapshot()
+    updated = snapshot.with_value(3, 4, '0') # Sheet row 4, column E
+    assert updated.rows[1][4] == '0'
+    assert snapshot.rows[1][4] == '3'
+    assert updated.rows[0] is snapshot.rows[0]
+    assert updated.rows[1] is not snapshot.rows[1]
+
+
+def test_with_value_outside_data_rows_or_columns_returns_none():
+    snapshot = make_snapshot()
+    assert snapshot.with_value(app.HEADER_SHEET_ROW - 1, 0, 'x') is None
+    assert snapshot.with_value(2, len(HEADER), 'x') is None
+
+
+def test_with_value_rebuilds_filter_indexes():
+    snapshot = make_snapshot()
+    assert snapshot.filter_positions(sum_columns=[4]) == [1]
+    updated = snapshot.with_value(2, 4, '9')
+    assert updated.filter_positions(sum_columns=[4]) == [0, 1]
+    assert snapshot.filter_positions(sum_columns=[4]) == [1]
+
+
+# --- changes_since ---
+
+def test_changes_since_unchanged_snapshot_is_empty():
+    snapshot = make_snapshot()
+    assert snapshot.changes_since(snapshot.fingerprint()) == ([], [])
+
+
+def test_changes_since_lists_written_rows():
+    snapshot = make_snapshot()
+    updated = snapshot.with_value(4, 5, '0').with_note('Sheet1!B3', 'n')
+    assert updated.changes_since(snapshot.fingerprint()) == ([0, 2], [])
+
+
+def test_changes_since_lists_added_and_removed_rows():
+    snapshot = make_snapshot()
+    grown = make_snapshot(snapshot.rows + [['4', 'Dee', 'dee', 'bob', '0', '0']])
+    assert grown.changes_since(snapshot.fingerprint()) == ([3], [])
+    shrunk = make_snapshot(snapshot.rows[:1])
+    assert shrunk.changes_since(snapshot.fingerprint()) == ([], [4, 5])
+
+
+def test_changes_since_header_change_requires_full_reload():
+    snapshot = make_snapshot()
+    renamed = make_snapshot(header=HEADER[:-1] + ['Задача 2*'])
+    assert renamed.changes_since(snapshot.fingerprint()) is None
+    noted = snapshot.with_note(f'Sheet1!A{app.HEADER_SHEET_ROW}', 'header note')
+    assert noted.changes_since(snapshot.fingerprint()) is None
+
+
+# --- build_delta_response ---
+
+def test_delta_sends_changed_rows_with_their_notes():
+    snapshot = make_snapshot(notes={'Sheet1!B5': 'keep'})
+    updated = snapshot.with_value(4, 4, '1').with_note('Sheet1!C3', 'new')
+    delta = build_delta_response(updated, snapshot.version, updated.changes_since(snapshot.fingerprint()), None, None)
+    assert delta['delta'] is True
+    assert delta['since'] == snapshot.version
+    assert delta['version'] == updated.version
+    assert delta['data_row_sheet_indices'] == [3, 5]
+    assert delta['rows'] == [updated.rows[0], updated.rows[2]]
+    assert delta['notes'] == {'Sheet1!C3': 'new', 'Sheet1!B5': 'keep'}
+    assert delta['removed_row_sheet_indices'] == []
+    assert delta['reviewers'] == ['alice', 'bob']
+
+
+def test_delta_reports_rows_that_stopped_matching_the_filters_as_removed():
+    snapshot = make_snapshot()
+    updated = snapshot.with_value(3, 4, '0') # Bob's only nonzero score
+    delta = build_delta_response(updated, snapshot.version, updated.changes_since(snapshot.fingerprint()),
+                                 None, None, reviewer='bob', sum_columns=[4, 5])
+    assert delta['rows'] == []
+    assert delta['removed_row_sheet_indices'] == [4]
+
+
+def test_delta_skips_rows_outside_the_window():
+    snapshot = make_snapshot()
+    updated = snapshot.with_value(2, 4, '1').with_value(4, 4, '1')
+    delta = build_delta_response(updated, snapshot.version, updated.changes_since(snapshot.fingerprint()), 2, 3)
+    assert delta['data_row_sheet_indices'] == [5]
+
+
+def test_delta_includes_removed_rows_inside_the_window():
+    snapshot = make_snapshot()
+    shrunk = make_snapshot(snapshot.rows[:1])
+    changes = shrunk.changes_since(snapshot.fingerprint())
+    assert build_delta_response(shrunk, snapshot.version, changes, None, None)['removed_row_sheet_indices'] == [4, 5]
+    assert build_delta_response(shrunk, snapshot.version, changes, 1, 2)['removed_row_sheet_indices'] == [4]
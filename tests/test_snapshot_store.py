@@ -0,0 +1,120 @@
+import gzip
+import json
+import os
+import sqlite3
+import time
+
+import pytest
+
+import app
+from app import SheetSnapshot, SnapshotStore
+
+KEY = ('X', 'Sheet1')
+
+
+def wait_for_saves(store, count):
+    deadline = time.monotonic() + 5
+    while store.stats()['saves'] < count:
+        assert time.monotonic() < deadline, store.stats()
+        time.sleep(0.01)
+
+
+def sample_snapshot():
+    return SheetSnapshot(['Name', 'Value'], [['a', '1'], ['b', '2']],
+                         {'Sheet1!B3': 'checked', 'Sheet1!A1': 'title note'}, [3, 4])
+
+
+def test_snapshot_round_trip(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    snapshot = sample_snapshot()
+    store.snapshot_stored(KEY, snapshot, is_write=False)
+    wait_for_saves(store, 1)
+
+    reopened = SnapshotStore(str(tmp_path)) # As after a restart
+    loaded = reopened.load_snapshot(KEY)
+    assert (loaded.header, loaded.rows, loaded.notes, loaded.data_row_sheet_indices) == (
+        snapshot.header, snapshot.rows, snapshot.notes, snapshot.data_row_sheet_indices)
+    assert loaded.version == snapshot.version
+    assert list(loaded.row_hashes) == list(snapshot.row_hashes)
+    assert reopened.load_snapshot(('X', 'Other')) is None
+
+    reopened.save_metadata('X', {'sheets': [{'properties': {'title': 'Sheet1'}}]})
+    metadata, age = reopened.load_metadata('X', max_age=60)
+    assert metadata['sheets'][0]['properties']['title'] == 'Sheet1' and age < 60
+
+
+def test_file_from_another_schema_version_is_cleared(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'snapshots.sqlite3'))
+    conn.execute('CREATE TABLE snapshots (spreadsheet_id TEXT, sheet_name TEXT, payload BLOB)')
+    conn.execute("INSERT INTO snapshots VALUES ('X', 'Sheet1', x'00')")
+    conn.execute('PRAGMA user_version = 99')
+    conn.commit()
+    conn.close()
+
+    store = SnapshotStore(str(tmp_path))
+    assert store.load_snapshot(KEY) is None
+    assert store.stats()['entries'] == 0
+    store.snapshot_stored(KEY, sample_snapshot(), is_write=False)
+    wait_for_saves(store, 1)
+    assert store.load_snapshot(KEY).rows == [['a', '1'], ['b', '2']]
+
+
+@pytest.mark.parametrize('payload', [
+    b'not gzip',
+    gzip.compress(b'{"header": []}'),
+    gzip.compress(json.dumps([[], [], {}]).encode()),
+])
+def test_unreadable_payload_is_discarded(tmp_path, payload):
+    store = SnapshotStore(str(tmp_path))
+    store._conn.execute('INSERT INTO snapshots VALUES (?, ?, 1, ?, ?, ?, ?)',
+                        (KEY[0], KEY[1], time.time(), time.time(), len(payload), payload))
+    assert store.load_snapshot(KEY) is None
+    assert store.stats()['entries'] == 0
+
+
+def test_corrupt_file_is_moved_aside(tmp_path):
+    path = tmp_path / 'snapshots.sqlite3'
+    path.write_bytes(b'this is not a database' * 100)
+    store = SnapshotStore(str(tmp_path))
+    assert store.load_snapshot(KEY) is None
+    assert [name for name in os.listdir(tmp_path) if '.corrupt-' in name]
+    store.snapshot_stored(KEY, sample_snapshot(), is_write=False)
+    wait_for_saves(store, 1)
+
+
+def lock_exclusively(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('PRAGMA locking_mode=EXCLUSIVE')
+    conn.execute('BEGIN EXCLUSIVE')
+    conn.execute('DELETE FROM metadata')
+    return conn
+
+
+def test_locked_file_falls_back_to_a_fetch(tmp_path, client, book, monkeypatch):
+    store = SnapshotStore(str(tmp_path))
+    store.snapshot_stored(KEY, sample_snapshot(), is_write=False)
+    wait_for_saves(store, 1)
+    monkeypatch.setattr(app, 'snapshot_store', store)
+    app.metadata_cache._entries.clear()
+    locker = sqlite3.connect(store.path, isolation_level=None)
+    locker.execute('BEGIN IMMEDIATE') # Another process holds the write lock
+    locker.execute('DELETE FROM metadata')
+    try:
+        response = client.get('/load-data?id=X&sheet=Sheet1')
+        assert response.status_code == 200
+        assert len(response.get_json()['rows']) == 40 # From the API, not the stored sample
+        assert store.stats()['errors'] >= 1
+        assert client.get('/stats').status_code == 200
+    finally:
+        locker.close()
+
+
+def test_locked_file_at_startup_leaves_the_app_without_a_store(tmp_path):
+    SnapshotStore(str(tmp_path))._conn.close() # Create the file
+    locker = lock_exclusively(str(tmp_path / 'snapshots.sqlite3'))
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            SnapshotStore(str(tmp_path))
+        assert (tmp_path / 'snapshots.sqlite3').exists() # Not mistaken for a corrupt file
+    finally:
+        locker.close()
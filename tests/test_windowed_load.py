@@ -0,0 +1,94 @@
+import pytest
+
+import app
+from app import column_runs, parse_column_selection
+
+
+def test_parse_column_selection():
+    assert parse_column_selection(None) is None
+    assert parse_column_selection('') is None
+    assert parse_column_selection(' , ,') is None
+    assert parse_column_selection('3,1, 1 ,2') == [1, 2, 3]
+    for bad in ('a', '-1', '1.5', '2-4'):
+        with pytest.raises(ValueError):
+            parse_column_selection(bad)
+
+
+def test_column_runs():
+    assert column_runs([]) == []
+    assert column_runs([4]) == [(4, 4)]
+    assert column_runs([0, 1, 2, 5]) == [(0, 2), (5, 5)]
+    assert column_runs([1, 3, 4, 6, 7, 8]) == [(1, 1), (3, 4), (6, 8)]
+
+
+def load(client, **params):
+    response = client.get('/load-data', query_string=dict({'id': 'X', 'sheet': 'Sheet1'}, **params))
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+@pytest.fixture
+def noted_book(book):
+    sheet = book.sheets['Sheet1']
+    sheet.notes[0][2] = 'note on the title row'
+    sheet.notes[1][7] = 'note on the header'
+    return book
+
+
+WINDOWS = [
+    {'start_row': 5, 'end_row': 20},
+    {'start_row': 5, 'end_row': 20, 'cols': '0,3,7,8,9'},
+    {'cols': '1,4'},
+    {'end_row': 3, 'cols': '11'},
+]
+
+
+@pytest.mark.parametrize('params', WINDOWS)
+def test_windowed_fetch_matches_the_projected_snapshot(client, noted_book, params):
+    windowed = load(client, **params) # Nothing cached yet: only the window is fetched
+    assert windowed['version'] is None
+    load(client) # Caches the whole sheet
+    projected = load(client, **params)
+    assert projected['version'] is not None
+    for field in ('header', 'rows', 'notes', 'data_row_sheet_indices', 'reviewers'):
+        assert windowed[field] == projected[field], field
+    assert windowed['notes'] # The comparison isn't vacuous
+
+
+def test_notes_are_limited_to_the_returned_rows_and_columns(client, noted_book):
+    load(client)
+    response = load(client, start_row=5, end_row=20, cols='0,3,7,8,9')
+    for a1 in response['notes']:
+        _, row_index, col_index = app.parse_a1_notation(a1)
+        assert row_index + 1 < 3 or (7 <= row_index + 1 <= 22 and col_index in (0, 3, 7, 8, 9))
+    assert response['notes']['Sheet1!C1'] == 'note on the title row'
+    assert response['notes']['Sheet1!H2'] == 'note on the header'
+
+
+def test_window_results_are_cached_until_a_write(client, book):
+    first = load(client, start_row=1, end_row=10)
+    calls = book.calls['spreadsheets.get']
+    assert load(client, start_row=1, end_row=10) == first
+    assert book.calls['spreadsheets.get'] == calls
+    assert app.window_cache.stats()['hits'] == 1
+
+    response = client.post('/save-note', json={'id': 'X', 'a1': 'Sheet1!B5', 'note': 'fresh'})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    after_write = load(client, start_row=1, end_row=10)
+    assert book.calls['spreadsheets.get'] > calls
+    assert after_write['notes']['Sheet1!B5'] == 'fresh'
+
+
+def test_refresh_bypasses_the_window_cache(client, book):
+    load(client, start_row=1, end_row=10)
+    calls = book.calls['spreadsheets.get']
+    load(client, start_row=1, end_row=10, refresh=1)
+    assert book.calls['spreadsheets.get'] > calls
+
+
+def test_window_fetched_across_a_write_is_not_cached(book):
+    window_key = ('X', 'Sheet1', 3, 12, None)
+    generation = app.snapshot_cache.generation(('X', 'Sheet1'))
+    app.snapshot_cache.bump_generation(('X', 'Sheet1')) # A write lands while the window is fetched
+    app.window_cache.put(window_key, generation, ([], [], {}, [], []))
+    assert app.window_cache.get(window_key) is None
@@ -0,0 +1,142 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import app
+from app import WriteBehindQueue
+
+
+class RecordingService:
+    """Stands in for the Sheets service: batchUpdate returns (kind, arguments) for execute to record."""
+
+    def __init__(self):
+        self._kind = 'note'
+
+    def spreadsheets(self):
+        self._kind = 'note'
+        return self
+
+    def values(self):
+        self._kind = 'value'
+        return self
+
+    def batchUpdate(self, **kwargs):
+        return self._kind, kwargs
+
+
+@pytest.fixture
+def sheets(monkeypatch):
+    """Records every request the queue sends; set sheets.fail to an HTTP status to fail them."""
+    class Sheets:
+        sent = []
+        fail = None
+
+    def execute(request):
+        if Sheets.fail:
+            raise HttpError(httplib2.Response({'status': Sheets.fail}), b'{}')
+        Sheets.sent.append(request)
+        return {}
+
+    monkeypatch.setattr(app.sheets_provider, 'get_service', RecordingService)
+    monkeypatch.setattr(app.sheets_scheduler, 'execute', execute)
+    monkeypatch.setattr(app, 'get_sheet_id', lambda service, spreadsheet_id, sheet_name: 7)
+    return Sheets
+
+
+@pytest.fixture
+def open_queue(tmp_path):
+    queues = []
+
+    def open_queue():
+        # The flusher thread never wakes up on its own; tests call flush()
+        queue = WriteBehindQueue(path=str(tmp_path / 'queue.sqlite3'), flush_interval=3600, max_attempts=3)
+        queues.append(queue)
+        return queue
+
+    yield open_queue
+    for queue in queues:
+        queue.stop()
+
+
+def statuses(queue, mutation_ids):
+    return [mutation['status'] for mutation in queue.status(mutation_ids)]
+
+
+def test_repeated_writes_to_a_cell_are_coalesced(sheets, open_queue):
+    queue = open_queue()
+    ids = [queue.enqueue('X', 'value', 'Sheet1!E4', '5'),
+           queue.enqueue('X', 'value', 'Sheet1!E5', '0'),
+           queue.enqueue('X', 'value', 'Sheet1!E4', '0')]
+    queue.flush()
+    assert len(sheets.sent) == 1
+    kind, request = sheets.sent[0]
+    assert kind == 'value'
+    assert request['body']['data'] == [{'range': 'Sheet1!E4', 'values': [['0']]},
+                                       {'range': 'Sheet1!E5', 'values': [['0']]}]
+    assert statuses(queue, ids) == ['committed'] * 3
+
+
+def test_notes_and_values_go_in_one_request_each(sheets, open_queue):
+    queue = open_queue()
+    queue.enqueue('X', 'note', 'Sheet1!B3', 'a')
+    queue.enqueue('X', 'note', 'Sheet1!B3', 'b')
+    queue.enqueue('X', 'value', 'Sheet1!E4', '0')
+    queue.enqueue('Y', 'note', 'Sheet1!C3', '')
+    queue.flush()
+    sent = {(kind, request['spreadsheetId']): request['body'] for kind, request in sheets.sent}
+    assert set(sent) == {('note', 'X'), ('value', 'X'), ('note', 'Y')}
+    assert sent[('note', 'X')]['requests'] == [app.note_update_request(7, 2, 1, 'b')]
+    assert sent[('note', 'Y')]['requests'] == [app.note_update_request(7, 2, 2, '')]
+
+
+def test_pending_writes_survive_a_restart_and_are_replayed(sheets, open_queue):
+    queue = open_queue()
+    sheets.fail = 503
+    ids = [queue.enqueue('X', 'value', 'Sheet1!E4', '0'), queue.enqueue('X', 'note', 'Sheet1!B3', 'kept')]
+    queue.flush() # Fails; both stay pending
+    queue.stop()
+
+    restarted = open_queue()
+    assert restarted.summary()['pending'] == 2
+    assert sorted(restarted.pending_writes(('X', 'Sheet1'), 0)) == [('note', 'Sheet1!B3', 'kept'), ('value', 'Sheet1!E4', '0')]
+    sheets.fail = None
+    restarted._conn.execute('UPDATE mutations SET next_attempt_at = 0') # Skip the retry backoff
+    restarted.flush()
+    assert statuses(restarted, ids) == ['committed', 'committed']
+    assert sorted(kind for kind, _ in sheets.sent) == ['note', 'value']
+
+
+def test_retryable_failures_fail_after_max_attempts(sheets, open_queue):
+    queue = open_queue()
+    sheets.fail = 503
+    mutation_id = queue.enqueue('X', 'value', 'Sheet1!E4', '0')
+    for _ in range(queue.max_attempts):
+        queue._conn.execute('UPDATE mutations SET next_attempt_at = 0')
+        queue.flush()
+    assert queue.status([mutation_id])[0]['status'] == 'failed'
+    assert queue.pending_writes(('X', 'Sheet1'), 0) == []
+
+
+def test_rejected_batch_is_retried_cell_by_cell(sheets, open_queue, monkeypatch):
+    queue = open_queue()
+    good, bad = queue.enqueue('X', 'value', 'Sheet1!E4', '0'), queue.enqueue('X', 'value', 'Sheet1!E5', '0')
+
+    def execute(request):
+        if any(update['range'] == 'Sheet1!E5' for update in request[1]['body']['data']):
+            raise HttpError(httplib2.Response({'status': 400}), b'{}')
+        sheets.sent.append(request)
+
+    monkeypatch.setattr(app.sheets_scheduler, 'execute', execute)
+    queue.flush()
+    assert statuses(queue, [good, bad]) == ['committed', 'failed']
+
+
+def test_flushed_writes_stay_visible_to_fetches_that_began_earlier(sheets, open_queue):
+    queue = open_queue()
+    key = ('X', 'Sheet1')
+    queue.enqueue('X', 'note', 'Sheet1!B3', 'n')
+    before_flush = app.snapshot_cache.generation(key)
+    queue.flush()
+    assert queue.pending_writes(key, before_flush) == [('note', 'Sheet1!B3', 'n')]
+    assert queue.pending_writes(key, app.snapshot_cache.generation(key)) == []
+    assert queue.pending_writes(key, before_flush) == [] # Forgotten once a later fetch saw it